@@ -1,10 +1,14 @@
-from typing import Dict, Any
+import json
+import os
+import unicodedata
+from typing import Dict, Any, Optional
 from pydantic import ValidationError
 from ..schemas.search import NormalizedQuery, SearchInput
 from ..utils.normalize import normalize_email, normalize_phone, normalize_name
-from ..core.llm import get_openai_client, build_json_schema_prompt
+from ..core.llm import get_async_openai_client, chat_completion, build_json_schema_prompt
 from ..core.logging import logger
-from ..core.config import settings
+from ..core.config import settings, Budget
+from ..core.memo import TTLCache, stable_hash
 import re
 
 
@@ -28,50 +32,94 @@ async def extract_normalized_query(payload: SearchInput) -> NormalizedQuery:
 		return NormalizedQuery(**fallback)
 
 
-async def extract_with_llm_fallback(payload: SearchInput) -> NormalizedQuery:
-	"""Optional LLM-aided extraction using OpenAI-compatible API if configured."""
-	client = get_openai_client()
-	if client is None:
+# Shared schema hint; part of the memo key so a prompt change invalidates old entries
+SCHEMA_HINT = (
+	"{"
+	"\"full_name\": string|null, \"email\": string|null, \"phone\": string|null, "
+	"\"username\": string|null, \"location\": string|null, \"context_text\": string|null"
+	"}"
+)
+
+_LLM_MEMO: Optional[TTLCache] = None
+
+
+def get_llm_memo() -> TTLCache:
+	global _LLM_MEMO
+	if _LLM_MEMO is None:
+		_LLM_MEMO = TTLCache(
+			max_entries=settings.llm_cache_max_entries,
+			ttl_s=settings.llm_cache_ttl_s,
+			persist_path=os.path.join(settings.http_cache_dir, "llm.sqlite3") if settings.llm_cache_persist else None,
+		)
+	return _LLM_MEMO
+
+
+def _normalize_context(text: str) -> str:
+	return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _has_planner_fields(base: Dict[str, Any]) -> bool:
+	"""True when the planner can already pick its tools without the LLM."""
+	return bool(base.get("email") or base.get("username") or (base.get("full_name") and base.get("location")))
+
+
+async def extract_with_llm_fallback(payload: SearchInput, budget: Optional[Budget] = None, diagnostics: Optional[Dict[str, Any]] = None) -> NormalizedQuery:
+	"""Optional LLM-aided extraction using OpenAI-compatible API if configured.
+
+	``diagnostics``, when given, receives ``llm`` (disabled, skipped,
+	cache_hit, called or fallback) and the memo cache stats.
+	"""
+	diag = diagnostics if diagnostics is not None else {}
+	if get_async_openai_client() is None:
 		# Regex fallback when LLM is not configured
-		base = (await extract_normalized_query(payload)).model_dump()
-		if payload.context_text and not base.get("full_name"):
-			ctx_guess = extract_from_context_regex(payload.context_text)
-			base.update({k: v for k, v in ctx_guess.items() if v})
-			return NormalizedQuery(**base)
-	# Build a minimal JSON schema hint
-	schema_hint = (
-		"{"
-		"\"full_name\": string|null, \"email\": string|null, \"phone\": string|null, "
-		"\"username\": string|null, \"location\": string|null, \"context_text\": string|null"
-		"}"
-	)
-	messages = build_json_schema_prompt(schema_hint, payload.context_text or "")
-	model_id = "meta-llama/Llama-3.2-3B-Instruct"
-	import json
-	last_err = None
-	for _ in range(2):
-		try:
+		diag["llm"] = "disabled"
+		return await _regex_fallback(payload)
+	base = (await extract_normalized_query(payload)).model_dump()
+	if not payload.context_text or _has_planner_fields(base):
+		diag["llm"] = "skipped"
+		return await _regex_fallback(payload)
+	messages = build_json_schema_prompt(SCHEMA_HINT, payload.context_text or "")
+	model_id = settings.llm_model
+	memo = get_llm_memo() if settings.llm_cache_enabled else None
+	memo_key = stable_hash({"m": model_id, "s": SCHEMA_HINT, "c": _normalize_context(payload.context_text)})
+	try:
+		proposed = await memo.get(memo_key) if memo else None
+		if proposed is not None:
+			diag["llm"] = "cache_hit"
+		else:
 			logger.info({"event": "llm_extractor_call", "model": model_id})
-			resp = client.chat.completions.create(model=model_id, messages=messages, temperature=0)
-			content = resp.choices[0].message.content or "{}"
+			# Transport errors are retried with backoff inside chat_completion
+			content = await chat_completion(messages, model=model_id, budget=budget, temperature=0) or "{}"
 			proposed = json.loads(content)
-			# Merge with utility-normalized fields (utility has precedence for strict formatting)
-			base = (await extract_normalized_query(payload)).model_dump()
-			# If LLM didn't return fields, try regex from context
-			if payload.context_text and not proposed.get("full_name"):
-				proposed.update(extract_from_context_regex(payload.context_text))
-			merged = {**proposed, **{k: v for k, v in base.items() if v is not None}}
-			logger.info({"event": "llm_extractor_success"})
-			return NormalizedQuery(**merged)
-		except Exception as e:
-			last_err = e
-			logger.info({"event": "llm_extractor_retry", "error": str(e)})
-			continue
-	# On repeated failure, fall back to utilities + regex
+			if not isinstance(proposed, dict):
+				raise ValueError("LLM did not return a JSON object")
+			diag["llm"] = "called"
+			if memo:
+				await memo.set(memo_key, proposed)
+		proposed = dict(proposed)
+		# If LLM didn't return fields, try regex from context
+		if payload.context_text and not proposed.get("full_name"):
+			proposed.update(extract_from_context_regex(payload.context_text))
+		# Merge with utility-normalized fields (utility has precedence for strict formatting)
+		merged = {**proposed, **{k: v for k, v in base.items() if v is not None}}
+		logger.info({"event": "llm_extractor_success"})
+		return NormalizedQuery(**merged)
+	except Exception as e:
+		logger.info({"event": "llm_extractor_error", "error": str(e)})
+	finally:
+		if memo:
+			diag["llm_cache"] = memo.snapshot()
+	# On failure, fall back to utilities + regex
 	logger.info({"event": "llm_extractor_fallback"})
+	diag["llm"] = "fallback"
+	return await _regex_fallback(payload)
+
+
+async def _regex_fallback(payload: SearchInput) -> NormalizedQuery:
 	base = (await extract_normalized_query(payload)).model_dump()
-	if payload.context_text:
-		base.update(extract_from_context_regex(payload.context_text))
+	if payload.context_text and not base.get("full_name"):
+		ctx_guess = extract_from_context_regex(payload.context_text)
+		base.update({k: v for k, v in ctx_guess.items() if v})
 	return NormalizedQuery(**base)
 
 
@@ -1,31 +1,228 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+import orjson
+from fastapi import APIRouter, HTTPException, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
 from ...schemas.search import SearchInput, SearchStartResponse, SearchStatusResponse
 from ...orchestrator.runner import start_search_job, get_job_status
+from ...orchestrator.batch import BatchProgress, BodySpool, run_batch, ndjson_lines, get_batch
 from ...schemas.search import ChooseCandidateRequest, AnswerInput
-from ...store.jobs import _JOBS, update_job
+from ...store.jobs import JobRecord, TERMINAL_STATUSES, get_job_record, update_job, job_version, wait_for_change
+from ...core.config import settings
 from ...schemas.common import JobStatus
+from ...store.events import get_stream
+from ...store.queue import Lane, QueueFull
 
 
 router = APIRouter()
 
 
+class _BatchResponse(StreamingResponse):
+    """Streams batch results while the request body is still being read.
+
+    It is the only consumer of receive(): the body goes into ``spool`` as it
+    arrives, independently of how fast results are written, and a client
+    disconnect (during or after the upload) stops the stream.
+    """
+
+    def __init__(self, content, spool: BodySpool, **kwargs) -> None:
+        super().__init__(content, **kwargs)
+        self.spool = spool
+
+    async def _read_body(self, receive: Receive) -> None:
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                self.spool.write(message.get("body", b""))
+                if not message.get("more_body", False):
+                    break
+            self.spool.finish()
+            while (await receive())["type"] != "http.disconnect":
+                pass
+        finally:
+            # No-op once the body is complete; otherwise the batch sees the upload cut short
+            self.spool.finish(ClientDisconnect())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        reader = asyncio.create_task(self._read_body(receive))
+        writer = asyncio.create_task(self.stream_response(send))
+        try:
+            await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Either the results are all out, or the client has gone
+            for task in (reader, writer):
+                task.cancel()
+            await asyncio.gather(reader, writer, return_exceptions=True)
+        if writer.done() and not writer.cancelled():
+            writer.result()
+        if self.background is not None:
+            await self.background()
+
+
 @router.post("/start", response_model=SearchStartResponse)
-async def start_search(payload: SearchInput) -> SearchStartResponse:
-    job_id = await start_search_job(payload)
+async def start_search(payload: SearchInput, priority: Lane = "interactive", fresh: bool = False) -> SearchStartResponse:
+    try:
+        job_id = await start_search_job(payload, lane=priority, fresh=fresh)
+    except QueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after_s)})
     return SearchStartResponse(job_id=job_id, status="queued")
 
 
+@router.post("/batch")
+async def start_batch(fresh: bool = False) -> StreamingResponse:
+    """NDJSON ``SearchInput`` records in; NDJSON results out, in completion order.
+
+    The batch id is returned in ``X-Batch-Id``; poll ``GET /search/batch/{id}``
+    for progress.
+    """
+    batch_id = uuid.uuid4().hex
+    # Filled by the response as the upload arrives; the batch reads records from it as slots free up
+    spool = BodySpool()
+
+    async def lines():
+        async for item in run_batch(batch_id, ndjson_lines(spool.chunks()), fresh=fresh):
+            yield orjson.dumps(item) + b"\n"
+
+    return _BatchResponse(lines(), spool, media_type="application/x-ndjson", headers={"X-Batch-Id": batch_id})
+
+
+@router.get("/batch/{batch_id}", response_model=BatchProgress)
+async def batch_status(batch_id: str) -> BatchProgress:
+    progress = get_batch(batch_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="batch not found")
+    return progress
+
+
+def _etag(job_id: str, version: int) -> str:
+    return f'"{job_id}.{version}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+# Serialized bodies of recently polled jobs, keyed by job id and reused while the version holds
+_BODIES: "OrderedDict[str, Tuple[int, bytes]]" = OrderedDict()
+_MAX_BODIES = 256
+
+
+def _status_body(job: JobRecord) -> bytes:
+    cached = _BODIES.get(job.job_id)
+    if cached is not None and cached[0] == job.version:
+        _BODIES.move_to_end(job.job_id)
+        return cached[1]
+    status = SearchStatusResponse(job_id=job.job_id, status=job.status, result=job.result, error=job.error, questions=job.questions)
+    body = status.model_dump_json().encode()
+    _BODIES[job.job_id] = (job.version, body)
+    if len(_BODIES) > _MAX_BODIES:
+        _BODIES.popitem(last=False)
+    return body
+
+
+async def _is_terminal(job_id: str) -> bool:
+    job = await get_job_record(job_id)
+    return job is None or job.status in TERMINAL_STATUSES
+
+
 @router.get("/{job_id}", response_model=SearchStatusResponse)
-async def get_status(job_id: str) -> SearchStatusResponse:
-    status = await get_job_status(job_id)
-    if status is None:
+async def get_status(
+    job_id: str,
+    wait: float = Query(0.0, ge=0.0, description="Long-poll: hold the request up to this many seconds for a change"),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    """Job status with ``ETag`` versioning.
+
+    With ``If-None-Match`` matching the current version the answer is ``304``;
+    with ``wait`` the request first parks until the job changes (from the
+    client's ETag, or from now for a running job) or the wait runs out.
+    """
+    version = await job_version(job_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    if wait > 0:
+        seen = _etag_matches(if_none_match, _etag(job_id, version))
+        if seen or (if_none_match is None and not await _is_terminal(job_id)):
+            version = await wait_for_change(job_id, version, min(wait, settings.job_wait_max_s))
+            if version is None:
+                raise HTTPException(status_code=404, detail="job not found")
+    etag = _etag(job_id, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    job = await get_job_record(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    headers["ETag"] = _etag(job_id, job.version)
+    return Response(content=_status_body(job), media_type="application/json", headers=headers)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _follow_store(job_id: str, heartbeat_s: float):
+    """SSE from job-store changes, for jobs whose events are published in another process."""
+    version = None
+    while True:
+        job = await get_job_record(job_id)
+        if job is None:
+            yield _sse("final", {"status": JobStatus.failed.value, "error": "job expired"})
+            return
+        if job.version != version:
+            version = job.version
+            status = JobStatus(job.status)
+            if status in TERMINAL_STATUSES:
+                yield _sse("final", jsonable_encoder({"status": status.value, "result": job.result, "questions": job.questions}))
+                return
+            yield _sse("status", {"status": status.value})
+        if await wait_for_change(job_id, version, heartbeat_s) == version:
+            yield ": keep-alive\n\n"
+
+
+@router.get("/{job_id}/stream")
+async def stream_status(job_id: str) -> StreamingResponse:
+    """Server-sent events: ``status``, per-connector ``partial``, merged ``snapshot`` and ``final``.
+
+    Jobs run by another process (Redis queue workers), or whose stream was
+    evicted, only get ``status`` and ``final`` events read from the job store.
+    """
+    if await get_job_record(job_id) is None:
         raise HTTPException(status_code=404, detail="job not found")
-    return status
+    stream = get_stream(job_id)
+
+    async def events():
+        if stream is None:
+            async for chunk in _follow_store(job_id, heartbeat_s=15.0):
+                yield chunk
+            return
+        async for ev in stream.subscribe(heartbeat_s=15.0):
+            if ev is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield _sse(ev["event"], ev["data"])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/{job_id}/choose-candidate", response_model=SearchStatusResponse)
 async def choose_candidate(job_id: str, selection: ChooseCandidateRequest) -> SearchStatusResponse:
-    job = _JOBS.get(job_id)
+    job = await get_job_record(job_id)
     if job is None:
         raise HTTPException(status_code=404, detail="job not found")
     if job.status != JobStatus.needs_disambiguation:
@@ -35,17 +232,18 @@ async def choose_candidate(job_id: str, selection: ChooseCandidateRequest) -> Se
     if selection.index < 0 or selection.index >= len(cands):
         raise HTTPException(status_code=400, detail="invalid candidate index")
     chosen = cands[selection.index]
-    # Rebuild a minimal profile from chosen candidate; aggregator will improve later
+    # Rebuild a minimal profile from chosen candidate; aggregator will improve later.
+    # New dicts throughout: the record's result is shared with other readers and the result cache.
     profile = result.get("profile", {})
-    profile.update({
+    profile = {
+        **profile,
         "names": [n for n in ([chosen.get("display_name")] if chosen.get("display_name") else [])],
         "emails": list({*profile.get("emails", []), *chosen.get("emails", [])}),
         "phones": list({*profile.get("phones", []), *chosen.get("phones", [])}),
         "usernames": list({*profile.get("usernames", []), *chosen.get("usernames", [])}),
         "locations": list({*profile.get("locations", []), *chosen.get("locations", [])}),
-    })
-    result["profile"] = profile
-    update_job(job_id, status=JobStatus.completed, result=result, questions=None)
+    }
+    await update_job(job_id, status=JobStatus.completed, result={**result, "profile": profile}, questions=None)
     return await get_job_status(job_id)
 
 
@@ -57,18 +255,18 @@ async def choose_candidate(job_id: str, selection: ChooseCandidateRequest) -> Se
 
 @router.post("/{job_id}/answer", response_model=SearchStatusResponse)
 async def answer(job_id: str, payload: AnswerInput) -> SearchStatusResponse:
-	job = _JOBS.get(job_id)
+	job = await get_job_record(job_id)
 	if job is None:
 		raise HTTPException(status_code=404, detail="job not found")
 	# Merge new hints into normalized_query and mark as queued to rerun in a fresh job in the future.
 	# For now, we just update the result's normalized_query for visibility.
+	# Copies, not in-place edits: the record's result is shared with other readers
 	res = job.result or {}
-	nq = res.get("normalized_query", {})
+	nq = dict(res.get("normalized_query", {}))
 	for k in ["full_name", "email", "phone", "username", "location", "context_text"]:
 		val = getattr(payload, k if k != "full_name" else "name", None)
 		if val:
 			nq[k] = val
-	res["normalized_query"] = nq
-	update_job(job_id, status=JobStatus.needs_disambiguation, result=res)
+	await update_job(job_id, status=JobStatus.needs_disambiguation, result={**res, "normalized_query": nq})
 	return await get_job_status(job_id)
 
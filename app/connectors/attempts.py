@@ -0,0 +1,153 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from ..core.config import settings
+from ..core.deadline import charge_scope, current_job, report_error, time_left
+from ..core.http import http_get
+
+# "sequential": one fallback at a time, stop at the first success.
+# "parallel": fire every fallback at once and keep the best-ranked success.
+# "budget": parallel only when the job has the wall time and API calls to spare.
+STRATEGIES = ("sequential", "parallel", "budget")
+
+
+def calls_left() -> Optional[int]:
+    job = current_job()
+    if job is None:
+        return None
+    return job.budget.max_api_calls - job.api_calls
+
+
+def choose_mode(strategy: str, n_attempts: int) -> str:
+    if strategy not in STRATEGIES:
+        raise ValueError(f"unknown attempt strategy {strategy!r}; expected one of {STRATEGIES}")
+    if strategy != "budget" or n_attempts < 2:
+        return "parallel" if strategy == "parallel" and n_attempts > 1 else "sequential"
+    left_s = time_left()
+    left_calls = calls_left()
+    if left_s is not None and left_s < settings.pdl_parallel_min_time_left_s:
+        return "sequential"
+    if left_calls is not None and left_calls < n_attempts:
+        return "sequential"
+    return "parallel"
+
+
+async def _attempt(
+    url: str,
+    params: Dict[str, Any],
+    headers: Dict[str, Any],
+    timeout: float,
+    accept: Callable[[Any], bool],
+) -> Optional[Any]:
+    resp = await http_get(url, params=params, headers=headers, timeout=timeout)
+    if resp.status_code == 404:
+        # PDL's "no match"
+        return None
+    resp.raise_for_status()
+    payload = resp.json()
+    return payload if accept(payload) else None
+
+
+def _report_failures(source: str, stats: Dict[str, Any]) -> None:
+    # An empty answer is only trustworthy when every attempt actually got one
+    if stats["failed"]:
+        report_error(source, f"{stats['failed']} of {stats['attempts']} attempts failed")
+
+
+async def run_attempts(
+    url: str,
+    attempts: Sequence[Dict[str, Any]],
+    accept: Callable[[Any], bool],
+    *,
+    source: str,
+    headers: Dict[str, Any],
+    timeout: float = 10.0,
+    strategy: Optional[str] = None,
+) -> Tuple[Optional[Any], Dict[str, Any]]:
+    """Run ranked fallback queries against ``url`` and return ``(payload, stats)``.
+
+    ``attempts`` are ordered best first; the payload is the one from the
+    lowest-ranked attempt that ``accept`` takes, whichever mode ran. Network
+    calls are charged to the job's ``max_api_calls`` by ``http_get``, so
+    speculative attempts cancelled after sending still count;
+    ``stats["api_calls"]`` is what this run charged (cache hits and attempts
+    cancelled before reaching the network are free). Failures are reported
+    under ``source``, the calling connector's name.
+    """
+    strategy = strategy or settings.pdl_attempt_strategy
+    mode = choose_mode(strategy, len(attempts))
+    stats: Dict[str, Any] = {
+        "strategy": strategy, "mode": mode, "attempts": len(attempts),
+        "launched": 0, "failed": 0, "cancelled": 0, "api_calls": 0, "winner": None,
+    }
+    run = _run_sequential if mode == "sequential" else _run_parallel
+    with charge_scope() as charged:
+        try:
+            payload = await run(url, attempts, accept, headers, timeout, stats)
+        finally:
+            stats["api_calls"] = charged["api_calls"]
+    if payload is None:
+        _report_failures(source, stats)
+    return payload, stats
+
+
+async def _run_sequential(
+    url: str,
+    attempts: Sequence[Dict[str, Any]],
+    accept: Callable[[Any], bool],
+    headers: Dict[str, Any],
+    timeout: float,
+    stats: Dict[str, Any],
+) -> Optional[Any]:
+    for i, params in enumerate(attempts):
+        stats["launched"] += 1
+        try:
+            payload = await _attempt(url, params, headers, timeout, accept)
+        except Exception:
+            stats["failed"] += 1
+            continue
+        if payload is not None:
+            stats["winner"] = i
+            return payload
+    return None
+
+
+async def _run_parallel(
+    url: str,
+    attempts: Sequence[Dict[str, Any]],
+    accept: Callable[[Any], bool],
+    headers: Dict[str, Any],
+    timeout: float,
+    stats: Dict[str, Any],
+) -> Optional[Any]:
+    tasks: List["asyncio.Task[Optional[Any]]"] = [
+        asyncio.create_task(_attempt(url, params, headers, timeout, accept)) for params in attempts
+    ]
+    stats["launched"] = len(tasks)
+    results: Dict[int, Optional[Any]] = {}
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                i = tasks.index(t)
+                if t.exception() is not None:
+                    stats["failed"] += 1
+                    results[i] = None
+                else:
+                    results[i] = t.result()
+            # A success wins once every better-ranked attempt has come back empty
+            for i in range(len(tasks)):
+                if i not in results:
+                    break
+                if results[i] is not None:
+                    stats["winner"] = i
+                    return results[i]
+        return None
+    finally:
+        losers = [t for t in tasks if not t.done()]
+        for t in losers:
+            # http_get shields the upstream request, so it still completes and fills the cache
+            t.cancel()
+        stats["cancelled"] = len(losers)
+        if losers:
+            await asyncio.gather(*losers, return_exceptions=True)
@@ -21,6 +21,10 @@ class BaseConnector(ABC):
         """
         raise NotImplementedError
 
+    async def invoke(self, query: NormalizedQuery) -> Dict[str, Any]:
+        """Uniform entry point used by the orchestrator."""
+        return await self.fetch(query)
+
 
 def make_result(
     evidences: List[EvidenceItem] | None = None,
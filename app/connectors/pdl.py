@@ -1,10 +1,14 @@
 from typing import Dict, Any, List
+import httpx
 from ..core.http import http_get
 from ..schemas.search import NormalizedQuery
 from ..schemas.profile import EvidenceItem, IdentityCandidate, Provenance
 from ..schemas.common import SourceMethod
 from ..core.config import settings
+from ..core.deadline import report_error
 from .base import BaseConnector, make_result
+from .pdl_bulk import close_enrich_batcher, enrich
+from .pdl_decode import build_candidate, decode_person
 
 
 class PeopleDataLabsConnector(BaseConnector):
@@ -46,72 +50,46 @@ class PeopleDataLabsConnector(BaseConnector):
             params["username"] = query.username
         if query.location:
             params["location"] = query.location
+        if query.profile_url:
+            params["profile"] = query.profile_url
 
         try:
-            logger_headers = {k: ("***" if k.lower() == "x-api-key" else v) for k, v in (headers or {}).items()}
-            resp = await http_get(url, params=params, headers=headers, timeout=10.0)
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception:
+            if settings.pdl_bulk_enabled:
+                data = await enrich(params, headers)
+                if data.get("status") != 200:
+                    # 404 is PDL's "no match"; anything else is a failed lookup
+                    if data.get("status") != 404:
+                        report_error(self.name, f"bulk item status {data.get('status')}")
+                    return make_result()
+            else:
+                resp = await http_get(url, params=params, headers=headers, timeout=10.0)
+                resp.raise_for_status()
+                data = resp.json()
+        except Exception as exc:
             # On failure, return empty so aggregator handles gracefully
+            if not (isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 404):
+                report_error(self.name, str(exc) or type(exc).__name__)
             return make_result()
 
         prov = Provenance(source_name=self.name, method=SourceMethod.api, url=None)
         evidences: List[EvidenceItem] = []
         candidates: List[IdentityCandidate] = []
 
-        # Parse a few common fields defensively
-        person = data.get("data") or data
-        emails = []
-        if isinstance(person.get("emails"), list):
-            emails = [e.get("address") if isinstance(e, dict) else e for e in person["emails"]]
-            emails = [e for e in emails if isinstance(e, str)]
-        phones = []
-        if isinstance(person.get("phone_numbers"), list):
-            phones = [p.get("number") if isinstance(p, dict) else p for p in person["phone_numbers"]]
-            phones = [p for p in phones if isinstance(p, str)]
-        full_name = person.get("full_name") or query.full_name
-        location = None
-        if isinstance(person.get("location_general"), dict):
-            location = person["location_general"].get("display")
-
-        links = []
-        if isinstance(person.get("links"), list):
-            for l in person["links"]:
-                if isinstance(l, dict) and isinstance(l.get("url"), str):
-                    links.append(l["url"])
-
-        employment = []
-        if isinstance(person.get("employment"), list):
-            for emp in person["employment"]:
-                if isinstance(emp, dict):
-                    employment.append({
-                        "title": emp.get("title"),
-                        "organization": emp.get("name") or emp.get("company") or emp.get("employer"),
-                        "start": emp.get("start_date"),
-                        "end": emp.get("end_date"),
-                    })
-
-        education = []
-        if isinstance(person.get("education"), list):
-            for edu in person["education"]:
-                if isinstance(edu, dict):
-                    education.append({
-                        "school": edu.get("school"),
-                        "degree": edu.get("degree"),
-                        "start": edu.get("start_date"),
-                        "end": edu.get("end_date"),
-                    })
+        person = (data.get("data") or data) if isinstance(data, dict) else None
+        if not isinstance(person, dict):
+            return make_result()
+        rec = decode_person(person)
+        full_name = rec.full_name or query.full_name
 
-        if emails or phones or full_name:
+        if rec.emails or rec.phones or full_name:
             candidates.append(
-                IdentityCandidate(
+                build_candidate(
                     display_name=full_name,
-                    emails=emails or ([query.email] if query.email else []),
-                    phones=phones or ([query.phone] if query.phone else []),
+                    emails=rec.emails or ([query.email] if query.email else []),
+                    phones=rec.phones or ([query.phone] if query.phone else []),
                     usernames=[query.username] if query.username else [],
-                    locations=[location] if location else ([query.location] if query.location else []),
-                    links=links,
+                    locations=[rec.location] if rec.location else ([query.location] if query.location else []),
+                    links=rec.links,
                     score=0.5,
                     top_evidence=[
                         EvidenceItem(field="full_name", value=full_name, confidence=0.7, provenance=prov)
@@ -120,12 +98,14 @@ class PeopleDataLabsConnector(BaseConnector):
             )
 
         # Attach structured fields as evidences for traceability
-        for url in links:
-            evidences.append(EvidenceItem(field="link", value=url, confidence=0.5, provenance=prov))
-        for emp in employment:
+        for link in rec.links:
+            evidences.append(EvidenceItem(field="link", value=str(link), confidence=0.5, provenance=prov))
+        for emp in rec.employment:
             evidences.append(EvidenceItem(field="employment", value=emp, confidence=0.5, provenance=prov))
-        for edu in education:
+        for edu in rec.education:
             evidences.append(EvidenceItem(field="education", value=edu, confidence=0.5, provenance=prov))
 
         return make_result(evidences=evidences, candidates=candidates)
 
+    async def aclose(self) -> None:
+        await close_enrich_batcher()
@@ -0,0 +1,231 @@
+import asyncio
+import contextvars
+import json
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import httpx
+from ..core.cache import get_async_cache
+from ..core.config import settings
+from ..core.deadline import charge_api_call, time_left
+from ..core.http import CachePolicy, cache_entry, cache_key, cache_policy_for, http_post, register_cache_policy
+from ..core.logging import logger
+from ..core.memo import stable_hash
+from ..store.replay import replay
+
+BULK_URL = "https://api.peopledatalabs.com/v5/person/bulk"
+ENRICH_URL = "https://api.peopledatalabs.com/v5/person/enrich"
+
+register_cache_policy(
+    ENRICH_URL,
+    CachePolicy(
+        negative_ttl_s=settings.http_cache_negative_ttl_s,
+        stale_while_revalidate_s=settings.http_cache_swr_s,
+    ),
+)
+
+# (params, future, enqueued_at)
+_Pending = Tuple[Dict[str, Any], "asyncio.Future[Dict[str, Any]]", float]
+SendFunc = Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]
+
+
+async def post_bulk(requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Send one PDL bulk enrich call; returns one ``{"status", "data"|"error"}`` item per request."""
+    body = {"requests": [{"params": params, "metadata": {"i": i}} for i, params in enumerate(requests)]}
+    resp = await http_post(BULK_URL, json_body=body, headers={"X-API-Key": settings.pdl_api_key}, timeout=settings.pdl_bulk_timeout_s)
+    resp.raise_for_status()
+    items = resp.json()
+    if not isinstance(items, list):
+        raise ValueError("unexpected PDL bulk response")
+    # Responses come back in request order; metadata is echoed when present, so prefer it
+    routed: List[Dict[str, Any]] = [{"status": 404} for _ in requests]
+    for pos, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        meta = item.get("metadata")
+        i = meta.get("i") if isinstance(meta, dict) and isinstance(meta.get("i"), int) else pos
+        if 0 <= i < len(routed):
+            routed[i] = item
+    return routed
+
+
+class EnrichBatcher:
+    """Coalesces enrich requests from concurrent jobs into PDL bulk calls.
+
+    A request waits at most ``window_s`` for others to join it; a batch is
+    sent as soon as it holds ``max_batch`` distinct parameter sets.
+    Identical parameters in one window share a single slot. Each caller gets
+    its own response item back, and a failed bulk call fails every caller in
+    that batch.
+    """
+
+    def __init__(self, send: SendFunc = post_bulk, *, max_batch: int = 100, window_s: float = 0.02) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.send = send
+        self.max_batch = max(1, max_batch)
+        self.window_s = window_s
+        self._pending: Dict[str, List[_Pending]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending: set = set()
+        self._sizes: Deque[int] = deque(maxlen=1000)
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self.stats: Dict[str, int] = {"requests": 0, "batches": 0, "deduplicated": 0, "failed_batches": 0}
+
+    async def enrich(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        fut: "asyncio.Future[Dict[str, Any]]" = self._loop.create_future()
+        # A caller that gave up (deadline, cancellation) no longer awaits fut; mark a
+        # failed batch's exception as retrieved so it is not logged as never retrieved
+        fut.add_done_callback(_retrieve)
+        key = stable_hash(params)
+        waiters = self._pending.setdefault(key, [])
+        if waiters:
+            self.stats["deduplicated"] += 1
+        waiters.append((params, fut, time.monotonic()))
+        self.stats["requests"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.window_s, self._flush)
+        # The batch keeps going for the others if this caller's deadline passes
+        left = time_left()
+        if left is None:
+            return await asyncio.shield(fut)
+        return await asyncio.wait_for(asyncio.shield(fut), timeout=max(0.0, left))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = self._loop.create_task(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: Dict[str, List[_Pending]]) -> None:
+        groups = list(batch.values())
+        self.stats["batches"] += 1
+        self._sizes.append(len(groups))
+        try:
+            items = await self.send([group[0][0] for group in groups])
+        except Exception as exc:
+            self.stats["failed_batches"] += 1
+            logger.warning({"event": "pdl_bulk_failed", "size": len(groups), "error": str(exc)})
+            for group in groups:
+                for _, fut, _ in group:
+                    if not fut.done():
+                        fut.set_exception(exc)
+            return
+        now = time.monotonic()
+        for group, item in zip(groups, items):
+            for _, fut, enqueued_at in group:
+                self._latencies.append(now - enqueued_at)
+                if not fut.done():
+                    fut.set_result(item)
+
+    async def aclose(self) -> None:
+        """Send whatever is still waiting and let in-flight batches finish."""
+        self._flush()
+        if self._sending and self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*list(self._sending), return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        sizes = list(self._sizes)
+        lat = sorted(self._latencies)
+        return {
+            **self.stats,
+            # Round trips (and rate-limit tokens) avoided versus one enrich call per request
+            "calls_saved": self.stats["requests"] - self.stats["batches"],
+            "batch_size_avg": round(sum(sizes) / len(sizes), 2) if sizes else 0,
+            "batch_size_max": max(sizes) if sizes else 0,
+            "latency_p50_ms": int(lat[len(lat) // 2] * 1000) if lat else 0,
+            "latency_p95_ms": int(lat[min(len(lat) - 1, int(0.95 * len(lat)))] * 1000) if lat else 0,
+            "pending": sum(len(g) for g in self._pending.values()),
+        }
+
+
+async def enrich(params: Dict[str, Any], headers: Dict[str, Any]) -> Dict[str, Any]:
+    """One enrich lookup: the HTTP response cache first, then the shared batcher.
+
+    Entries use the key ``http_get`` gives the single enrich call, so both
+    paths share them. In replay mode nothing is sent; a miss falls back to
+    ``store.replay`` and otherwise reads as PDL's "no match".
+    """
+    key = cache_key("GET", ENRICH_URL, params, headers)
+    cache = get_async_cache() if settings.http_cache_enabled else None
+    if cache is not None:
+        hit = await cache.get(key)
+        if hit is not None:
+            if hit.get("stale") and not settings.replay_mode:
+                # Serve the stale copy now and refresh it in the background (not charged to the job)
+                _start_refresh(key, params)
+            item = json.loads(hit["content"]) if hit.get("content") else {}
+            item["status"] = hit["status"]
+            return item
+    if settings.replay_mode:
+        recorded = replay(f"pdl_enrich:{key}")
+        return recorded if recorded is not None else {"status": 404}
+    # Shares a bulk call with other jobs but still counts as one call for this job
+    charge_api_call()
+    return await _enrich_and_store(key, params)
+
+
+async def _enrich_and_store(key: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    item = await get_enrich_batcher().enrich(params)
+    if settings.http_cache_enabled and item.get("status") in (200, 404):
+        body = {k: v for k, v in item.items() if k != "metadata"}
+        entry = cache_entry(httpx.Response(item["status"], json=body), cache_policy_for(ENRICH_URL))
+        if entry is not None:
+            get_async_cache().put(key, entry)
+    return item
+
+
+# Background refreshes of stale entries, one per key at a time
+_REFRESHING: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+
+def _start_refresh(key: str, params: Dict[str, Any]) -> None:
+    loop = asyncio.get_running_loop()
+    task = _REFRESHING.get(key)
+    if task is not None and task.get_loop() is loop:
+        return
+    # A fresh context: the refresh must not inherit (and be cut short by) the caller's deadline
+    task = loop.create_task(_enrich_and_store(key, params), context=contextvars.Context())
+    _REFRESHING[key] = task
+    task.add_done_callback(lambda t, k=key: _refresh_done(k, t))
+
+
+def _refresh_done(key: str, task: "asyncio.Task[Dict[str, Any]]") -> None:
+    if _REFRESHING.get(key) is task:
+        del _REFRESHING[key]
+    _retrieve(task)
+
+
+def _retrieve(fut: "asyncio.Future[Any]") -> None:
+    if not fut.cancelled():
+        fut.exception()
+
+
+_BATCHER: Optional[EnrichBatcher] = None
+
+
+def get_enrich_batcher() -> EnrichBatcher:
+    global _BATCHER
+    if _BATCHER is None or _BATCHER._loop is not asyncio.get_running_loop():
+        _BATCHER = EnrichBatcher(max_batch=settings.pdl_bulk_max_batch, window_s=settings.pdl_bulk_window_ms / 1000.0)
+    return _BATCHER
+
+
+def pdl_bulk_stats() -> Dict[str, Any]:
+    return _BATCHER.snapshot() if _BATCHER is not None else {}
+
+
+async def close_enrich_batcher() -> None:
+    global _BATCHER
+    loop = asyncio.get_running_loop()
+    refreshing = [t for t in _REFRESHING.values() if t.get_loop() is loop]
+    if refreshing:
+        await asyncio.gather(*refreshing, return_exceptions=True)
+    batcher, _BATCHER = _BATCHER, None
+    if batcher is not None:
+        await batcher.aclose()
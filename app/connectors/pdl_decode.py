@@ -0,0 +1,182 @@
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from pydantic import EmailStr, HttpUrl, TypeAdapter, ValidationError
+from ..schemas.profile import EvidenceItem, IdentityCandidate
+
+# Shared by the enrich, identify and search connectors. Each PDL person dict
+# is read once against the field specs below; emails and links are validated
+# here (memoized, so repeats across records are free) which lets candidates be
+# built with model_construct instead of validating every record again.
+
+_EMAIL = TypeAdapter(EmailStr)
+_URL = TypeAdapter(HttpUrl)
+
+
+class PersonRecord(NamedTuple):
+    full_name: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    emails: List[str]
+    phones: List[str]
+    # location_general.display; identify also falls back to location_name
+    location: Optional[str]
+    location_name: Optional[str]
+    links: List[HttpUrl]
+    employment: List[Dict[str, Any]]
+    education: List[Dict[str, Any]]
+
+
+# Plain ASCII dot-atom local parts come back from validation unchanged, so only the
+# (IDNA) domain check is costly, and domains repeat far more than addresses
+_ATOM_LOCAL = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*")
+
+
+def _validate_email(value: str) -> Optional[str]:
+    try:
+        return _EMAIL.validate_python(value)
+    except ValidationError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def _email_domain(domain: str) -> Optional[str]:
+    email = _validate_email("x@" + domain)
+    return email[2:] if email is not None else None
+
+
+@lru_cache(maxsize=8192)
+def valid_email(value: str) -> Optional[str]:
+    """``value`` as EmailStr would normalize it, or None if it is not a valid address."""
+    local, sep, domain = value.rpartition("@")
+    if not (sep and len(local) <= 64 and _ATOM_LOCAL.fullmatch(local)):
+        return _validate_email(value)
+    host = _email_domain(domain)
+    if host is None:
+        return None
+    email = f"{local}@{host}"
+    return email if len(email) <= 254 else None
+
+
+@lru_cache(maxsize=8192)
+def valid_url(value: str) -> Optional[HttpUrl]:
+    # PDL usually omits the scheme ("linkedin.com/in/jdoe")
+    if "://" not in value:
+        value = "https://" + value
+    try:
+        return _URL.validate_python(value)
+    except ValidationError:
+        return None
+
+
+def _text(v: Any) -> Optional[str]:
+    return v if isinstance(v, str) and v else None
+
+
+def _emails(v: Any) -> List[str]:
+    out = []
+    for e in v:
+        addr = e.get("address") if isinstance(e, dict) else e
+        if isinstance(addr, str) and addr:
+            email = valid_email(addr)
+            if email is not None:
+                out.append(email)
+    return out
+
+
+def _phones(v: Any) -> List[str]:
+    out = []
+    for p in v:
+        number = p.get("number") if isinstance(p, dict) else p
+        if isinstance(number, str) and number:
+            out.append(number)
+    return out
+
+
+def _display(v: Any) -> Optional[str]:
+    return _text(v.get("display"))
+
+
+def _links(v: Any) -> List[HttpUrl]:
+    out = []
+    for link in v:
+        if isinstance(link, dict) and isinstance(link.get("url"), str):
+            url = valid_url(link["url"])
+            if url is not None:
+                out.append(url)
+    return out
+
+
+def _employment(v: Any) -> List[Dict[str, Any]]:
+    return [
+        {
+            "title": emp.get("title"),
+            "organization": emp.get("name") or emp.get("company") or emp.get("employer"),
+            "start": emp.get("start_date"),
+            "end": emp.get("end_date"),
+        }
+        for emp in v if isinstance(emp, dict)
+    ]
+
+
+def _education(v: Any) -> List[Dict[str, Any]]:
+    return [
+        {"school": edu.get("school"), "degree": edu.get("degree"), "start": edu.get("start_date"), "end": edu.get("end_date")}
+        for edu in v if isinstance(edu, dict)
+    ]
+
+
+# (PDL key, PersonRecord slot, expected type, extractor); a value of any other type leaves the default
+_SPECS: Tuple[Tuple[str, int, type, Callable[[Any], Any]], ...] = tuple(
+    (key, PersonRecord._fields.index(slot), kind, fn)
+    for key, slot, kind, fn in (
+        ("full_name", "full_name", str, _text),
+        ("first_name", "first_name", str, _text),
+        ("last_name", "last_name", str, _text),
+        ("emails", "emails", list, _emails),
+        ("phone_numbers", "phones", list, _phones),
+        ("location_general", "location", dict, _display),
+        ("location_name", "location_name", str, _text),
+        ("links", "links", list, _links),
+        ("employment", "employment", list, _employment),
+        ("education", "education", list, _education),
+    )
+)
+
+
+def decode_person(person: Dict[str, Any]) -> PersonRecord:
+    slots: List[Any] = [None, None, None, [], [], None, None, [], [], []]
+    get = person.get
+    for key, slot, kind, fn in _SPECS:
+        v = get(key)
+        if type(v) is kind:
+            slots[slot] = fn(v)
+    return PersonRecord(*slots)
+
+
+def decode_people(docs: Iterable[Any]) -> List[PersonRecord]:
+    return [decode_person(doc) for doc in docs if isinstance(doc, dict)]
+
+
+def build_candidate(
+    *,
+    display_name: Optional[str],
+    emails: List[str],
+    phones: List[str],
+    usernames: List[str],
+    locations: List[str],
+    links: List[HttpUrl],
+    score: float,
+    top_evidence: List[EvidenceItem],
+) -> IdentityCandidate:
+    """IdentityCandidate without re-validation; values must come from ``decode_person`` or a validated query."""
+    return IdentityCandidate.model_construct(
+        display_name=display_name,
+        emails=emails,
+        phones=phones,
+        usernames=usernames,
+        locations=locations,
+        links=links,
+        score=score,
+        top_evidence=top_evidence,
+    )
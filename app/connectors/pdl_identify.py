@@ -3,7 +3,21 @@ from ..schemas.search import NormalizedQuery
 from ..schemas.profile import EvidenceItem, IdentityCandidate, Provenance
 from ..schemas.common import SourceMethod
 from ..core.config import settings
-from ..core.http import http_get
+from ..core.deadline import report_stats
+from ..core.http import register_cache_policy, CachePolicy
+from .attempts import run_attempts
+from .base import BaseConnector
+from .pdl_decode import build_candidate, decode_people
+
+
+register_cache_policy(
+    "https://api.peopledatalabs.com/v5/person/identify",
+    CachePolicy(
+        negative_ttl_s=settings.http_cache_negative_ttl_s,
+        empty_key="matches",
+        stale_while_revalidate_s=settings.http_cache_swr_s,
+    ),
+)
 
 
 def _split_name(full_name: str) -> Tuple[str, str]:
@@ -15,7 +29,12 @@ def _split_name(full_name: str) -> Tuple[str, str]:
     return parts[0], parts[-1]
 
 
-class PeopleDataLabsIdentifyConnector:
+def _is_match(payload: Any) -> bool:
+    # Identify returns matches (array) and sometimes top-level person
+    return isinstance(payload, dict) and bool(payload.get("matches") or payload.get("data") or payload.get("full_name"))
+
+
+class PeopleDataLabsIdentifyConnector(BaseConnector):
     name = "people_data_labs_identify"
 
     async def fetch(self, query: NormalizedQuery) -> Dict[str, Any]:
@@ -41,19 +60,8 @@ class PeopleDataLabsIdentifyConnector:
         if first and query.location:
             attempts.append({"first_name": first, "region": query.location})
 
-        data = None
-        for params in attempts:
-            try:
-                resp = await http_get(url, params=params, headers=headers, timeout=10.0, disable_cache=True)
-                if resp.status_code != 200:
-                    continue
-                payload = resp.json()
-                # Identify returns matches (array) and sometimes top-level person
-                if isinstance(payload, dict) and (payload.get("matches") or payload.get("data") or payload.get("full_name")):
-                    data = payload
-                    break
-            except Exception:
-                continue
+        data, stats = await run_attempts(url, attempts, _is_match, source=self.name, headers=headers, timeout=10.0)
+        report_stats(self.name, stats)
         if data is None:
             return {"evidences": [], "candidates": []}
 
@@ -70,46 +78,23 @@ class PeopleDataLabsIdentifyConnector:
         if not isinstance(docs, list):
             return {"evidences": evidences, "candidates": candidates}
 
-        for person in docs:
-            if not isinstance(person, dict):
-                continue
-            full_name = person.get("full_name") or f"{person.get('first_name','')} {person.get('last_name','')}".strip()
-            emails = []
-            if isinstance(person.get("emails"), list):
-                emails = [e.get("address") if isinstance(e, dict) else e for e in person["emails"] if e]
-                emails = [e for e in emails if isinstance(e, str)]
-            phones = []
-            if isinstance(person.get("phone_numbers"), list):
-                phones = [p.get("number") if isinstance(p, dict) else p for p in person["phone_numbers"] if p]
-                phones = [p for p in phones if isinstance(p, str)]
-            location = None
-            if isinstance(person.get("location_general"), dict):
-                location = person["location_general"].get("display")
-            elif isinstance(person.get("location_name"), str):
-                location = person.get("location_name")
-
-            links = []
-            if isinstance(person.get("links"), list):
-                for l in person["links"]:
-                    if isinstance(l, dict) and isinstance(l.get("url"), str):
-                        links.append(l["url"])
-
-            cand = IdentityCandidate(
-                display_name=full_name or query.full_name,
-                emails=emails,
-                phones=phones,
+        for rec in decode_people(docs):
+            full_name = rec.full_name or f"{rec.first_name or ''} {rec.last_name or ''}".strip() or query.full_name
+            location = rec.location or rec.location_name
+            candidates.append(build_candidate(
+                display_name=full_name,
+                emails=rec.emails,
+                phones=rec.phones,
                 usernames=[],
                 locations=[location] if location else ([query.location] if query.location else []),
-                links=links,
+                links=rec.links,
                 score=0.45,
                 top_evidence=[
-                    EvidenceItem(field="full_name", value=full_name or query.full_name, confidence=0.65, provenance=prov)
-                ] if (full_name or query.full_name) else [],
-            )
-            candidates.append(cand)
-
-            for url_val in links:
-                evidences.append(EvidenceItem(field="link", value=url_val, confidence=0.5, provenance=prov))
+                    EvidenceItem(field="full_name", value=full_name, confidence=0.65, provenance=prov)
+                ] if full_name else [],
+            ))
+            for link in rec.links:
+                evidences.append(EvidenceItem(field="link", value=str(link), confidence=0.5, provenance=prov))
 
         return {"evidences": evidences, "candidates": candidates}
 
@@ -3,10 +3,28 @@ from ..schemas.search import NormalizedQuery
 from ..schemas.profile import EvidenceItem, IdentityCandidate, Provenance
 from ..schemas.common import SourceMethod
 from ..core.config import settings
-from ..core.http import http_get
+from ..core.deadline import report_stats
+from ..core.http import register_cache_policy, CachePolicy
+from .attempts import run_attempts
+from .base import BaseConnector
+from .pdl_decode import build_candidate, decode_people
 
 
-class PeopleDataLabsSearchConnector:
+register_cache_policy(
+    "https://api.peopledatalabs.com/v5/person/search",
+    CachePolicy(
+        negative_ttl_s=settings.http_cache_negative_ttl_s,
+        empty_key="data",
+        stale_while_revalidate_s=settings.http_cache_swr_s,
+    ),
+)
+
+
+def _has_data(payload: Any) -> bool:
+    return isinstance(payload, dict) and bool(payload.get("data"))
+
+
+class PeopleDataLabsSearchConnector(BaseConnector):
     name = "people_data_labs_search"
 
     async def fetch(self, query: NormalizedQuery) -> Dict[str, Any]:
@@ -33,18 +51,8 @@ class PeopleDataLabsSearchConnector:
             q = f"full_name:\"{first}\" AND location_name:\"{query.location}\""
             attempts.append({"query": q, "size": 5})
 
-        data = None
-        for params in attempts:
-            try:
-                resp = await http_get(url, params=params, headers=headers, timeout=10.0, disable_cache=True)
-                if resp.status_code != 200:
-                    continue
-                payload = resp.json()
-                if payload and isinstance(payload, dict) and payload.get("data"):
-                    data = payload
-                    break
-            except Exception:
-                continue
+        data, stats = await run_attempts(url, attempts, _has_data, source=self.name, headers=headers, timeout=10.0)
+        report_stats(self.name, stats)
         if data is None:
             return {"evidences": [], "candidates": []}
 
@@ -56,44 +64,21 @@ class PeopleDataLabsSearchConnector:
         if not isinstance(docs, list):
             return {"evidences": evidences, "candidates": candidates}
 
-        for doc in docs[:5]:
-            if not isinstance(doc, dict):
-                continue
-            full_name = doc.get("full_name")
-            emails = []
-            if isinstance(doc.get("emails"), list):
-                emails = [e.get("address") if isinstance(e, dict) else e for e in doc["emails"] if e]
-                emails = [e for e in emails if isinstance(e, str)]
-            phones = []
-            if isinstance(doc.get("phone_numbers"), list):
-                phones = [p.get("number") if isinstance(p, dict) else p for p in doc["phone_numbers"] if p]
-                phones = [p for p in phones if isinstance(p, str)]
-            location = None
-            if isinstance(doc.get("location_general"), dict):
-                location = doc["location_general"].get("display")
-            links = []
-            if isinstance(doc.get("links"), list):
-                for l in doc["links"]:
-                    if isinstance(l, dict) and isinstance(l.get("url"), str):
-                        links.append(l["url"])
-
-            cand = IdentityCandidate(
-                display_name=full_name,
-                emails=emails,
-                phones=phones,
+        for rec in decode_people(docs[:5]):
+            candidates.append(build_candidate(
+                display_name=rec.full_name,
+                emails=rec.emails,
+                phones=rec.phones,
                 usernames=[],
-                locations=[location] if location else [],
-                links=links,
+                locations=[rec.location] if rec.location else [],
+                links=rec.links,
                 score=0.4,
                 top_evidence=[
-                    EvidenceItem(field="full_name", value=full_name, confidence=0.6, provenance=prov)
-                ] if full_name else [],
-            )
-            candidates.append(cand)
-
-        for c in candidates:
-            for url_candidate in c.links:
-                evidences.append(EvidenceItem(field="link", value=url_candidate, confidence=0.4, provenance=prov))
+                    EvidenceItem(field="full_name", value=rec.full_name, confidence=0.6, provenance=prov)
+                ] if rec.full_name else [],
+            ))
+            for link in rec.links:
+                evidences.append(EvidenceItem(field="link", value=str(link), confidence=0.4, provenance=prov))
 
         return {"evidences": evidences, "candidates": candidates}
 
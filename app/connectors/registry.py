@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import importlib
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel
+from ..core.config import settings
+from ..schemas.search import NormalizedQuery
+
+
+class ConnectorSpec(BaseModel):
+    """Registry metadata for one connector.
+
+    ``target`` is a ``"module:Class"`` path relative to ``app``; the module is
+    only imported the first time an enabled connector is requested. A query is
+    accepted when any of ``required_fields`` is set (or the list is empty).
+    """
+
+    name: str
+    target: str
+    cost_usd: float = 0.0
+    expected_latency_ms: int = 1000
+    required_fields: List[str] = []
+    enabled: bool = True
+
+    def is_enabled(self) -> bool:
+        return settings.connectors_enabled.get(self.name, self.enabled)
+
+    def accepts(self, query: NormalizedQuery) -> bool:
+        return not self.required_fields or any(getattr(query, f, None) for f in self.required_fields)
+
+
+_SPECS: Dict[str, ConnectorSpec] = {}
+# Process-lifetime instances, created on first use
+_INSTANCES: Dict[str, Any] = {}
+
+
+def register_connector(spec: ConnectorSpec) -> None:
+    _SPECS[spec.name] = spec
+    _INSTANCES.pop(spec.name, None)
+
+
+def get_spec(name: str) -> Optional[ConnectorSpec]:
+    return _SPECS.get(name)
+
+
+def get_connector(name: str):
+    """Return the shared instance for ``name``, or None if unknown or disabled."""
+    spec = _SPECS.get(name)
+    if spec is None or not spec.is_enabled():
+        return None
+    instance = _INSTANCES.get(name)
+    if instance is None:
+        module_path, _, attr = spec.target.partition(":")
+        module = importlib.import_module(module_path, package=__package__.rpartition(".")[0])
+        instance = getattr(module, attr)()
+        _INSTANCES[name] = instance
+    return instance
+
+
+def enabled_connectors() -> List[str]:
+    return [name for name, spec in _SPECS.items() if spec.is_enabled()]
+
+
+def connector_cost(name: str) -> float:
+    spec = _SPECS.get(name)
+    if spec is None:
+        return 0.0
+    return settings.connector_costs_usd.get(name, spec.cost_usd)
+
+
+async def close_connectors() -> None:
+    instances = list(_INSTANCES.values())
+    _INSTANCES.clear()
+    for instance in instances:
+        aclose = getattr(instance, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                pass
+
+
+# Built-in connectors. Costs are per-call estimates; override with settings.connector_costs_usd.
+register_connector(ConnectorSpec(
+    name="pdl", target=".connectors.pdl:PeopleDataLabsConnector",
+    cost_usd=0.01, expected_latency_ms=800, required_fields=["email", "phone", "full_name", "username", "profile_url"],
+))
+register_connector(ConnectorSpec(
+    name="pdl_identify", target=".connectors.pdl_identify:PeopleDataLabsIdentifyConnector",
+    cost_usd=0.01, expected_latency_ms=900, required_fields=["full_name", "location"],
+))
+register_connector(ConnectorSpec(
+    name="pdl_search", target=".connectors.pdl_search:PeopleDataLabsSearchConnector",
+    cost_usd=0.01, expected_latency_ms=1200, required_fields=["full_name", "location"],
+))
+register_connector(ConnectorSpec(
+    name="duckduckgo", target=".connectors.search_engine:DuckDuckGoConnector",
+    expected_latency_ms=5000, required_fields=["full_name", "location", "context_text"],
+))
+register_connector(ConnectorSpec(
+    name="github", target=".scraper.github:GitHubScraper",
+    expected_latency_ms=400, required_fields=["username"],
+))
+register_connector(ConnectorSpec(
+    name="clearbit", target=".connectors.clearbit:ClearbitConnector",
+    expected_latency_ms=500, required_fields=["username"], enabled=False,
+))
@@ -1,6 +1,10 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import os
+import threading
+import time
 try:
     from ddgs import DDGS  # prefer new package
 except Exception:
@@ -8,11 +12,67 @@ except Exception:
 from ..schemas.search import NormalizedQuery
 from ..schemas.profile import EvidenceItem, IdentityCandidate, Provenance
 from ..schemas.common import SourceMethod
+from ..core.config import settings
+from ..core.deadline import clamp_timeout, report_error, report_partial, report_stats, DeadlineExceeded
+from ..core.memo import TTLCache
+from ..store.replay import replay
+from .base import BaseConnector
 
 
-class DuckDuckGoConnector:
+_QUERY_CACHE: Optional[TTLCache] = None
+
+
+def get_query_cache() -> TTLCache:
+    """Raw DDGS results keyed by ``"<max_results>:<query>"``.
+
+    In replay mode entries never expire, so a cache recorded once (with
+    ``ddg_cache_persist``) can be replayed offline indefinitely.
+    """
+    global _QUERY_CACHE
+    if _QUERY_CACHE is None:
+        _QUERY_CACHE = TTLCache(
+            max_entries=settings.ddg_cache_max_entries,
+            ttl_s=10 * 365 * 86400 if settings.replay_mode else settings.ddg_cache_ttl_s,
+            persist_path=os.path.join(settings.http_cache_dir, "ddg.sqlite3") if settings.ddg_cache_persist else None,
+        )
+    return _QUERY_CACHE
+
+
+class DuckDuckGoConnector(BaseConnector):
     name = "duckduckgo"
 
+    def __init__(self) -> None:
+        # Queries run on a dedicated pool; each worker thread keeps one DDGS session for its lifetime
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._sessions: List[Any] = []
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, settings.ddg_thread_pool_size), thread_name_prefix="ddg")
+        return self._executor
+
+    def _session(self) -> Any:
+        ddgs = getattr(self._local, "ddgs", None)
+        if ddgs is None:
+            ddgs = self._local.ddgs = DDGS()
+            self._sessions.append(ddgs)
+        return ddgs
+
+    def _search(self, q: str, max_results: int) -> List[Dict[str, Any]]:
+        return list(self._session().text(q, max_results=max_results))
+
+    async def aclose(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for ddgs in self._sessions:
+            try:
+                ddgs.__exit__(None, None, None)
+            except Exception:
+                pass
+        self._sessions.clear()
+
     async def fetch(self, query: NormalizedQuery) -> Dict[str, Any]:
         if not query.full_name and not query.location and not query.context_text:
             return {"evidences": [], "candidates": []}
@@ -67,89 +127,179 @@ class DuckDuckGoConnector:
             queries.append(("very_relaxed", "general", f'{name_phrase}'))
 
         results: List[Dict[str, Any]] = []
-        ddg_queries_run = 0
-
-        async def run_query(q: str, label: str, max_results: int = 4, timeout_s: float = 2.5) -> List[Dict[str, Any]]:
-            def _fetch() -> List[Dict[str, Any]]:
-                out: List[Dict[str, Any]] = []
-                with DDGS() as ddgs:
-                    for r in ddgs.text(q, max_results=max_results):
-                        out.append(r)
-                return out
+        per_query: List[Dict[str, Any]] = []
+
+        async def run_query(q: str, max_results: int) -> Tuple[List[Dict[str, Any]], str]:
+            key = f"{max_results}:{q}"
+            cache = get_query_cache() if settings.ddg_cache_enabled else None
+            if cache is not None:
+                hit = await cache.get(key)
+                if hit is not None:
+                    return hit, "cached"
+            if settings.replay_mode:
+                # Offline: never reach DuckDuckGo; fall back to anything recorded via store.replay
+                recorded = replay(f"ddg:{key}")
+                return (recorded, "replayed") if recorded is not None else ([], "replay_miss")
+            loop = asyncio.get_running_loop()
+            picked_up = loop.create_future()
+
+            def work() -> List[Dict[str, Any]]:
+                loop.call_soon_threadsafe(lambda: picked_up.done() or picked_up.set_result(None))
+                return self._search(q, max_results)
+
+            fut = loop.run_in_executor(self._pool(), work)
+            # The pool is shared by every job: time spent queued for a thread is bounded by
+            # the step/job deadline, not charged to this query's own timeout
             try:
-                res = await asyncio.wait_for(asyncio.to_thread(_fetch), timeout=timeout_s)
-            except Exception:
-                return []
-            for r in res:
-                r["_label"] = label
-            return res
-
-        # Global time budget ~7.5s
-        total = 0
-        for tier, label, q in queries[:10]:
-            part = await run_query(q, label, max_results=4, timeout_s=2.5)
-            results.extend(part)
-            total += 1
-            ddg_queries_run += 1
-            if len(results) >= 24 or total >= 8:
-                break
-
-        name_tokens = [t.lower() for t in name.split() if t]
-        loc_tokens = [lv.lower() for lv in loc_variants]
-
-        def text_has_tokens(text: str, tokens: List[str]) -> bool:
-            tl = (text or "").lower()
-            return all(tok in tl for tok in tokens) if tokens else True
-
-        def text_has_any(text: str, tokens: List[str]) -> bool:
-            tl = (text or "").lower()
-            return any(tok in tl for tok in tokens) if tokens else True
-
-        filtered: Dict[str, Dict[str, Any]] = {}
-        for r in results:
-            url = r.get("href") or r.get("url")
-            title = r.get("title") or r.get("heading") or ""
-            snippet = r.get("body") or r.get("snippet") or ""
-            if not url:
-                continue
-            host = urlparse(url).netloc.lower()
-            if any(bd in host for bd in block_domains):
-                continue
-            # For strict passes require all tokens, otherwise any token
-            # We infer pass strictness from URL label already embedded earlier is lost here; approximate by domain priority
-            strict = domain_priority(host) <= 2  # linkedin/github/twitter treated as strict
-            name_ok = (text_has_tokens(title, name_tokens) or text_has_tokens(snippet, name_tokens) or text_has_tokens(url, name_tokens)) if strict else (text_has_any(title, name_tokens) or text_has_any(snippet, name_tokens) or text_has_any(url, name_tokens))
-            if name_tokens and not name_ok:
-                continue
-            loc_hit = any(lt in (title+" "+snippet+" "+url).lower() for lt in loc_tokens) if loc_tokens else True
-            score = 0.2 + (0.4 if loc_hit else 0) + max(0, 0.6 - domain_priority(host) * 0.05)
-
-            key = canonical_url(url)
-            if key in filtered and filtered[key]["_score"] >= score:
-                continue
-            filtered[key] = {"url": key, "title": title, "snippet": snippet, "host": host, "_score": score}
-
-        ranked = sorted(filtered.values(), key=lambda x: (-x["_score"]))[:5]
-
-        prov = Provenance(source_name=self.name, method=SourceMethod.scrape, url=None)
-        candidates: List[IdentityCandidate] = []
-        evidences: List[EvidenceItem] = []
-        for item in ranked:
-            url = item["url"]
-            title = item["title"]
-            snippet = item["snippet"]
-            cand = IdentityCandidate(
-                display_name=name or title,
-                usernames=[],
-                locations=[loc] if loc else [],
-                links=[url],
-                score=float(item["_score"]),
-                top_evidence=[EvidenceItem(field="link", value=url, confidence=0.6, provenance=prov, snippet=snippet)],
-            )
-            candidates.append(cand)
-            evidences.append(EvidenceItem(field="search_result", value={"title": title, "url": url}, confidence=0.45, provenance=prov, snippet=snippet))
-
-        # Expose simple stats for diagnostics
-        self.last_stats = {"queries": ddg_queries_run, "hits": len(ranked)}
-        return {"evidences": evidences, "candidates": candidates}
+                await asyncio.wait({picked_up, fut}, return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                # Drops the query if no thread has started it yet
+                fut.cancel()
+                raise
+            finally:
+                picked_up.cancel()
+            res = await asyncio.wait_for(fut, timeout=clamp_timeout(settings.ddg_query_timeout_s))
+            if cache is not None:
+                await cache.set(key, res)
+            return res, "ok"
+
+        def build_result(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+            name_tokens = [t.lower() for t in name.split() if t]
+            loc_tokens = [lv.lower() for lv in loc_variants]
+
+            def text_has_tokens(text: str, tokens: List[str]) -> bool:
+                tl = (text or "").lower()
+                return all(tok in tl for tok in tokens) if tokens else True
+
+            def text_has_any(text: str, tokens: List[str]) -> bool:
+                tl = (text or "").lower()
+                return any(tok in tl for tok in tokens) if tokens else True
+
+            filtered: Dict[str, Dict[str, Any]] = {}
+            for r in results:
+                url = r.get("href") or r.get("url")
+                title = r.get("title") or r.get("heading") or ""
+                snippet = r.get("body") or r.get("snippet") or ""
+                if not url:
+                    continue
+                host = urlparse(url).netloc.lower()
+                if any(bd in host for bd in block_domains):
+                    continue
+                # For strict passes require all tokens, otherwise any token
+                # We infer pass strictness from URL label already embedded earlier is lost here; approximate by domain priority
+                strict = domain_priority(host) <= 2  # linkedin/github/twitter treated as strict
+                name_ok = (text_has_tokens(title, name_tokens) or text_has_tokens(snippet, name_tokens) or text_has_tokens(url, name_tokens)) if strict else (text_has_any(title, name_tokens) or text_has_any(snippet, name_tokens) or text_has_any(url, name_tokens))
+                if name_tokens and not name_ok:
+                    continue
+                loc_hit = any(lt in (title+" "+snippet+" "+url).lower() for lt in loc_tokens) if loc_tokens else True
+                score = 0.2 + (0.4 if loc_hit else 0) + max(0, 0.6 - domain_priority(host) * 0.05)
+
+                key = canonical_url(url)
+                if key in filtered and filtered[key]["_score"] >= score:
+                    continue
+                filtered[key] = {"url": key, "title": title, "snippet": snippet, "host": host, "_score": score}
+
+            ranked = sorted(filtered.values(), key=lambda x: (-x["_score"]))[:5]
+
+            prov = Provenance(source_name=self.name, method=SourceMethod.scrape, url=None)
+            candidates: List[IdentityCandidate] = []
+            evidences: List[EvidenceItem] = []
+            for item in ranked:
+                url = item["url"]
+                title = item["title"]
+                snippet = item["snippet"]
+                cand = IdentityCandidate(
+                    display_name=name or title,
+                    usernames=[],
+                    locations=[loc] if loc else [],
+                    links=[url],
+                    score=float(item["_score"]),
+                    top_evidence=[EvidenceItem(field="link", value=url, confidence=0.6, provenance=prov, snippet=snippet)],
+                )
+                candidates.append(cand)
+                evidences.append(EvidenceItem(field="search_result", value={"title": title, "url": url}, confidence=0.45, provenance=prov, snippet=snippet))
+            return {"evidences": evidences, "candidates": candidates}
+
+        # At most 8 queries, settings.ddg_max_concurrency at a time, strict tier first. Once enough
+        # high-scoring hits are in, queries from looser tiers that have not finished are cancelled.
+        planned = queries[:8]
+        slots = asyncio.Semaphore(max(1, settings.ddg_max_concurrency))
+        early_stop: Optional[str] = None
+
+        async def one(tier: str, label: str, q: str) -> Tuple[str, List[Dict[str, Any]]]:
+            stat: Dict[str, Any] = {"tier": tier, "label": label, "query": q, "status": "cancelled", "results": 0, "latency_ms": 0}
+            per_query.append(stat)
+            async with slots:
+                try:
+                    clamp_timeout(settings.ddg_query_timeout_s)
+                except DeadlineExceeded:
+                    stat["status"] = "deadline"
+                    return tier, []
+                t0 = time.perf_counter()
+                try:
+                    part, stat["status"] = await run_query(q, max_results=4)
+                except DeadlineExceeded:
+                    part, stat["status"] = [], "deadline"
+                except asyncio.TimeoutError:
+                    part, stat["status"] = [], "timeout"
+                except asyncio.CancelledError:
+                    stat["latency_ms"] = int((time.perf_counter() - t0) * 1000)
+                    raise
+                except Exception:
+                    part, stat["status"] = [], "error"
+                stat["latency_ms"] = int((time.perf_counter() - t0) * 1000)
+            # Copies: cached result lists are shared between jobs
+            part = [{**r, "_label": label} for r in part]
+            stat["results"] = len(part)
+            return tier, part
+
+        tasks = {asyncio.create_task(one(tier, label, q)): tier for tier, label, q in planned}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                new_hits = strict_hits = False
+                for t in done:
+                    if t.cancelled():
+                        continue
+                    tier, part = t.result()
+                    if part:
+                        results.extend(part)
+                        new_hits = True
+                        strict_hits = strict_hits or tier == "strict"
+                if not new_hits:
+                    continue
+                current = build_result(results)
+                # Keep what we have in case the step is cut off mid-way
+                report_partial(current)
+                if len(results) >= 24:
+                    early_stop = "enough_results"
+                    stop = set(pending)
+                elif strict_hits and sum(1 for c in current["candidates"] if c.score >= settings.ddg_early_stop_score) >= settings.ddg_early_stop_hits:
+                    early_stop = "strict_hits"
+                    stop = {t for t in pending if tasks[t] != "strict"}
+                else:
+                    continue
+                for t in stop:
+                    t.cancel()
+                await asyncio.gather(*stop, return_exceptions=True)
+                pending -= stop
+        finally:
+            for t in pending:
+                t.cancel()
 
+        result = build_result(results)
+        failed = [q for q in per_query if q["status"] in ("error", "timeout")]
+        if failed:
+            report_error(self.name, f"{len(failed)} of {len(per_query)} queries failed")
+        # Per-job diagnostics go to the step, not the instance: it is shared by every job
+        report_stats(self.name, {
+            "queries": sum(1 for q in per_query if q["status"] not in ("cancelled", "deadline")),
+            "cached": sum(1 for q in per_query if q["status"] in ("cached", "replayed")),
+            "hits": len(result["candidates"]),
+            "cancelled": sum(1 for q in per_query if q["status"] == "cancelled"),
+            "early_stop": early_stop,
+            "per_query": per_query,
+            "cache": get_query_cache().snapshot() if settings.ddg_cache_enabled else None,
+        })
+        return result
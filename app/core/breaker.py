@@ -0,0 +1,145 @@
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Deque, Tuple
+from urllib.parse import urlparse
+from .config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a host whose breaker is open."""
+
+    def __init__(self, host: str, retry_in_s: float) -> None:
+        super().__init__(f"circuit open for {host}; retry in {retry_in_s:.1f}s")
+        self.host = host
+        self.retry_in_s = retry_in_s
+
+
+class CircuitBreaker:
+    """Sliding-window breaker with closed, open and half-open states.
+
+    The breaker opens when, over the last ``window_s`` seconds and at least
+    ``min_requests`` calls, the failure rate reaches ``error_rate`` or the
+    share of calls slower than ``slow_call_s`` reaches ``slow_rate``. After
+    ``open_s`` it lets ``half_open_probes`` calls through; one success closes
+    it again and one failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        host: str,
+        *,
+        window_s: float = 30.0,
+        min_requests: int = 5,
+        error_rate: float = 0.5,
+        slow_call_s: float = 5.0,
+        slow_rate: float = 0.8,
+        open_s: float = 15.0,
+        half_open_probes: int = 1,
+    ) -> None:
+        self.host = host
+        self.window_s = window_s
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_s = open_s
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self.stats: Dict[str, int] = {"rejected": 0, "opened": 0}
+
+    def before_call(self) -> None:
+        now = time.monotonic()
+        if self.state == self.OPEN:
+            if now - self._opened_at < self.open_s:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.host, self.open_s - (now - self._opened_at))
+            self.state = self.HALF_OPEN
+            self._probes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_probes:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.host, 0.0)
+            self._probes += 1
+
+    def record(self, ok: bool, latency_s: float) -> None:
+        now = time.monotonic()
+        if self.state == self.HALF_OPEN:
+            if ok and latency_s < self.slow_call_s:
+                self.state = self.CLOSED
+                self._calls.clear()
+            else:
+                self._open(now)
+            return
+        self._calls.append((now, ok, latency_s))
+        self._trim(now)
+        if self.state == self.CLOSED and len(self._calls) >= self.min_requests:
+            total = len(self._calls)
+            failures = sum(1 for _, good, _ in self._calls if not good)
+            slow = sum(1 for _, _, lat in self._calls if lat >= self.slow_call_s)
+            if failures / total >= self.error_rate or slow / total >= self.slow_rate:
+                self._open(now)
+
+    def latency_percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        self._trim(time.monotonic())
+        lats = sorted(lat for _, ok, lat in self._calls if ok)
+        if len(lats) < max(1, min_samples):
+            return None
+        idx = min(len(lats) - 1, int(pct * len(lats)))
+        return lats[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = len(self._calls)
+        failures = sum(1 for _, ok, _ in self._calls if not ok)
+        return {
+            "state": self.state,
+            "calls": total,
+            "error_rate": round(failures / total, 3) if total else 0.0,
+            "p95_s": self.latency_percentile(0.95),
+            **self.stats,
+        }
+
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.stats["opened"] += 1
+
+    def _trim(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_s:
+            self._calls.popleft()
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(url: str) -> Optional[CircuitBreaker]:
+    if not settings.breaker_enabled:
+        return None
+    host = (urlparse(url).hostname or "").lower()
+    if not host:
+        return None
+    breaker = _BREAKERS.get(host)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            host,
+            window_s=settings.breaker_window_s,
+            min_requests=settings.breaker_min_requests,
+            error_rate=settings.breaker_error_rate,
+            slow_call_s=settings.breaker_slow_call_s,
+            slow_rate=settings.breaker_slow_rate,
+            open_s=settings.breaker_open_s,
+            half_open_probes=settings.breaker_half_open_probes,
+        )
+        _BREAKERS[host] = breaker
+    return breaker
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {host: b.snapshot() for host, b in _BREAKERS.items()}
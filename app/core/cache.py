@@ -0,0 +1,506 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+import orjson
+from .config import settings
+try:
+    import zstandard
+except Exception:  # optional: fall back to zlib
+    zstandard = None
+
+
+# Stored bodies are the raw upstream bytes behind a 4-byte header:
+# b"HC" + format version + codec. Rows without the header are v0 JSON text.
+_MAGIC = b"HC"
+FORMAT_VERSION = 1
+_CODECS = {"none": 0, "zlib": 1, "zstd": 2}
+_MIN_COMPRESS_BYTES = 256
+
+
+def encode_body(raw: Optional[bytes], codec: str = "zstd", level: int = 3) -> Optional[bytes]:
+    if raw is None:
+        return None
+    if codec == "zstd" and zstandard is None:
+        codec = "zlib"
+    if len(raw) < _MIN_COMPRESS_BYTES:
+        codec = "none"
+    if codec == "zstd":
+        data = zstandard.ZstdCompressor(level=level).compress(raw)
+    elif codec == "zlib":
+        data = zlib.compress(raw, level)
+    else:
+        codec, data = "none", raw
+    return _MAGIC + bytes((FORMAT_VERSION, _CODECS[codec])) + data
+
+
+def decode_body(blob: Any) -> Optional[bytes]:
+    if blob is None:
+        return None
+    if isinstance(blob, str):
+        return blob.encode("utf-8")
+    blob = bytes(blob)
+    if blob[:2] != _MAGIC:
+        return blob
+    version, codec, data = blob[2], blob[3], blob[4:]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported cache format version {version}")
+    if codec == _CODECS["zstd"]:
+        if zstandard is None:
+            raise ValueError("zstandard is required to read this cache entry")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == _CODECS["zlib"]:
+        return zlib.decompress(data)
+    return data
+
+
+def _entry_content(entry: Dict[str, Any]) -> Optional[bytes]:
+    if "content" in entry:
+        return entry["content"]
+    if entry.get("json") is not None:
+        return orjson.dumps(entry["json"])
+    return None
+
+
+class ResponseCache:
+    """Bounded response cache: SQLite (WAL) store with an in-memory LRU hot tier.
+
+    Entries are ``{"status": int, "content": bytes}`` where ``content`` is the
+    raw response body, stored compressed (see ``encode_body``). Entries
+    expire ``ttl_s`` seconds after they were written unless the entry
+    carries its own ``ttl_s``. An entry with ``stale_s`` is still returned
+    (flagged ``"stale": True``) for that long after expiry. When the store
+    grows past ``max_bytes`` the least recently used rows are evicted; hot
+    tier reads count as uses and are written to disk with the next batch.
+    """
+
+    def __init__(self, path: str, *, ttl_s: float, max_bytes: int, hot_max_entries: int = 512, codec: str = "zstd", level: int = 3) -> None:
+        self.path = path
+        self.codec = codec
+        self.level = level
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.hot_max_entries = hot_max_entries
+        self._hot: "OrderedDict[str, Tuple[float, float, Dict[str, Any]]]" = OrderedDict()
+        # The hot tier has its own lock so event-loop lookups never wait on SQLite
+        self._hot_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # Hot hits not yet reflected in accessed_at on disk: key -> read time
+        self._touched: Dict[str, float] = {}
+        self._closed = False
+        # Counters are bumped from both the hot and the disk path
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "hot_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "legacy_migrated": 0}
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(entries)").fetchall()}
+        if cols and "stale_s" not in cols:
+            # Older layout without per-entry expiry; it is only a cache, so start over
+            self._db.execute("DROP TABLE entries")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, status INTEGER NOT NULL, body BLOB, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL, ttl_s REAL, stale_s REAL NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed_at)")
+        row = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        self._total_bytes = int(row[0])
+        # One-JSON-file-per-key entries from the old cache are imported once, in the
+        # background; until that finishes a miss imports its own key
+        self._legacy_dir = d if d and _has_legacy_files(d) else None
+        if self._legacy_dir:
+            threading.Thread(target=self.migrate_legacy, name="cache-legacy", daemon=True).start()
+
+    def get_hot(self, key: str) -> Optional[Dict[str, Any]]:
+        """Memory-only lookup, safe to call from the event loop."""
+        now = time.time()
+        with self._hot_lock:
+            hot = self._hot.get(key)
+            if hot is None:
+                return None
+            expires_at, stale_until, entry = hot
+            if now >= stale_until:
+                self._hot.pop(key, None)
+                return None
+            self._hot.move_to_end(key)
+            self._touched[key] = now
+        self._count("hits", "hot_hits")
+        return self._flag_stale(entry, now >= expires_at)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.get_hot(key)
+        if entry is not None:
+            return entry
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, body, created_at, ttl_s, stale_s FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None and self._legacy_dir:
+                row = self._import_legacy(key)
+            if row is None:
+                self._count("misses")
+                return None
+            status, body, created_at, ttl_s, stale_s = row
+            expires_at = created_at + (ttl_s if ttl_s is not None else self.ttl_s)
+            stale_until = expires_at + stale_s
+            if now >= stale_until:
+                self._delete(key)
+                self._count("expired", "misses")
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count("hits")
+        entry = {"status": status, "content": decode_body(body)}
+        self._remember(key, expires_at, stale_until, entry)
+        return self._flag_stale(entry, now >= expires_at)
+
+    def set(self, key: str, entry: Dict[str, Any]) -> None:
+        self.set_many([(key, entry)])
+
+    def set_many(self, items: List[Tuple[str, Dict[str, Any]]]) -> None:
+        now = time.time()
+        rows = []
+        for key, entry in items:
+            body = encode_body(_entry_content(entry), self.codec, self.level)
+            ttl_s = entry.get("ttl_s")
+            stale_s = float(entry.get("stale_s") or 0.0)
+            rows.append((key, int(entry.get("status", 200)), body, len(key) + (len(body) if body else 0), ttl_s, stale_s))
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._write_touches()
+                for key, status, body, size, ttl_s, stale_s in rows:
+                    old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO entries (key, status, body, size, created_at, accessed_at, ttl_s, stale_s) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, status, body, size, now, now, ttl_s, stale_s),
+                    )
+                    self._total_bytes += size - (old[0] if old else 0)
+                if self._total_bytes > self.max_bytes:
+                    self._evict(now)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                row = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+                self._total_bytes = int(row[0])
+                raise
+        for key, entry in items:
+            self.remember(key, entry, now)
+
+    def remember(self, key: str, entry: Dict[str, Any], written_at: Optional[float] = None) -> None:
+        """Put an entry in the hot tier only (used for writes still queued for disk)."""
+        expires_at, stale_until = self._expiry(entry, written_at if written_at is not None else time.time())
+        self._remember(key, expires_at, stale_until, {"status": entry.get("status", 200), "content": _entry_content(entry)})
+
+    def lookup_pending(self, key: str, entry: Dict[str, Any], written_at: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        expires_at, stale_until = self._expiry(entry, written_at)
+        if now >= stale_until:
+            return None
+        return self._flag_stale({"status": entry.get("status", 200), "content": _entry_content(entry)}, now >= expires_at)
+
+    def migrate_legacy(self) -> int:
+        """Import every old ``<key>.json`` file; returns the number imported.
+
+        Runs once when the cache is opened. The lock is taken per file so
+        lookups are not held up behind the whole directory.
+        """
+        if not self._legacy_dir:
+            return 0
+        count = 0
+        try:
+            with os.scandir(self._legacy_dir) as it:
+                names = [e.name for e in it if e.name.endswith(".json")]
+        except OSError:
+            names = []
+        for name in names:
+            with self._lock:
+                if self._closed:
+                    return count
+                if self._import_legacy(name[: -len(".json")]) is not None:
+                    count += 1
+        self._legacy_dir = None
+        return count
+
+    def _import_legacy(self, key: str) -> Optional[Tuple[int, bytes, float, Optional[float], float]]:
+        path = os.path.join(self._legacy_dir or "", key + ".json")
+        try:
+            created_at = os.path.getmtime(path)
+            with open(path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            os.remove(path)
+        except Exception:
+            return None
+        if time.time() - created_at >= self.ttl_s:
+            return None
+        body = encode_body(_entry_content(cached), self.codec, self.level)
+        size = len(key) + (len(body) if body else 0)
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (key, status, body, size, created_at, accessed_at, ttl_s, stale_s) "
+            "VALUES (?, ?, ?, ?, ?, ?, NULL, 0)",
+            (key, int(cached.get("status", 200)), body, size, created_at, created_at),
+        )
+        self._total_bytes += size
+        self._count("legacy_migrated")
+        return int(cached.get("status", 200)), body, created_at, None, 0.0
+
+    def _expiry(self, entry: Dict[str, Any], written_at: float) -> Tuple[float, float]:
+        ttl_s = entry.get("ttl_s")
+        expires_at = written_at + (ttl_s if ttl_s is not None else self.ttl_s)
+        return expires_at, expires_at + float(entry.get("stale_s") or 0.0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._total_bytes = 0
+        with self._hot_lock:
+            self._hot.clear()
+
+    def size_bytes(self) -> int:
+        return self._total_bytes
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            try:
+                self._write_touches()
+            except sqlite3.Error:
+                pass
+            self._db.close()
+        with self._hot_lock:
+            self._hot.clear()
+
+    def _count(self, *names: str) -> None:
+        with self._stats_lock:
+            for name in names:
+                self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _flag_stale(self, entry: Dict[str, Any], stale: bool) -> Dict[str, Any]:
+        if not stale:
+            return entry
+        self._count("stale_hits")
+        return {**entry, "stale": True}
+
+    def _write_touches(self) -> None:
+        # Caller holds _lock; hot hits are batched so LRU eviction sees the most-read keys as recent
+        with self._hot_lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            self._db.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", [(t, k) for k, t in touched.items()])
+
+    def _remember(self, key: str, expires_at: float, stale_until: float, entry: Dict[str, Any]) -> None:
+        with self._hot_lock:
+            self._hot[key] = (expires_at, stale_until, entry)
+            self._hot.move_to_end(key)
+            while len(self._hot) > self.hot_max_entries:
+                self._hot.popitem(last=False)
+
+    def _forget(self, key: str) -> None:
+        with self._hot_lock:
+            self._hot.pop(key, None)
+
+    def _delete(self, key: str) -> None:
+        row = self._db.execute("DELETE FROM entries WHERE key = ? RETURNING size", (key,)).fetchone()
+        if row:
+            self._total_bytes -= row[0]
+        self._forget(key)
+
+    def _evict(self, now: float) -> None:
+        # Expired rows go first, then least recently used until we are under 90% of the cap
+        expired = self._db.execute(
+            "DELETE FROM entries WHERE created_at + COALESCE(ttl_s, ?) + stale_s <= ? RETURNING key, size",
+            (self.ttl_s, now),
+        ).fetchall()
+        for key, size in expired:
+            self._total_bytes -= size
+            self._forget(key)
+            self._count("evictions")
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            rows = self._db.execute(
+                "SELECT key, size FROM entries ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self._forget(key)
+                self._count("evictions")
+                if self._total_bytes <= target:
+                    break
+
+
+def _has_legacy_files(d: str) -> bool:
+    try:
+        with os.scandir(d) as it:
+            return any(e.name.endswith(".json") for e in it)
+    except OSError:
+        return False
+
+
+class AsyncResponseCache:
+    """Event-loop facade over ResponseCache.
+
+    Hot-tier hits are served inline, disk reads run on a dedicated I/O
+    executor, and writes go through a write-behind buffer that coalesces
+    repeated keys and is flushed to SQLite in batches by a background task.
+    When the buffer is full the oldest pending write is dropped.
+    """
+
+    def __init__(self, cache: ResponseCache, *, io_threads: int = 2, max_pending: int = 1000, batch_size: int = 100, flush_interval_s: float = 0.5) -> None:
+        self.cache = cache
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix="cache-io")
+        self._pending: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._writer: Optional["asyncio.Task[None]"] = None
+        self._loop = asyncio.get_running_loop()
+        self.stats: Dict[str, int] = {"writes_queued": 0, "writes_coalesced": 0, "writes_dropped": 0, "batches": 0}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.cache.get_hot(key)
+        if entry is not None:
+            return entry
+        pending = self._pending.get(key)
+        if pending is not None:
+            return self.cache.lookup_pending(key, pending[1], pending[0])
+        return await self._loop.run_in_executor(self._executor, self.cache.get, key)
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        if key in self._pending:
+            self.stats["writes_coalesced"] += 1
+            self._pending.move_to_end(key)
+        now = time.time()
+        self._pending[key] = (now, entry)
+        self.cache.remember(key, entry, now)
+        self.stats["writes_queued"] += 1
+        self._schedule()
+
+    def adopt(self, pending: "OrderedDict[str, Tuple[float, Dict[str, Any]]]") -> None:
+        """Queue writes handed over by ``detach``; newer puts for the same key win."""
+        for key, item in pending.items():
+            if key not in self._pending:
+                self._pending[key] = item
+                self.stats["writes_queued"] += 1
+        self._schedule()
+
+    def detach(self) -> "OrderedDict[str, Tuple[float, Dict[str, Any]]]":
+        """Stop a facade whose loop is no longer current and return its unwritten puts.
+
+        The loop may already be closed, so nothing is awaited: the writer is
+        cancelled if its loop can still run it, and the executor is shut down
+        without waiting (a batch already on it still completes).
+        """
+        pending, self._pending = self._pending, OrderedDict()
+        if self._writer is not None and not self._writer.done() and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._writer.cancel)
+        self._executor.shutdown(wait=False)
+        return pending
+
+    def _schedule(self) -> None:
+        while len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+            self.stats["writes_dropped"] += 1
+        if not self._pending:
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = self._loop.create_task(self._run_writer())
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run_writer(self) -> None:
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._write_batch()
+
+    async def _write_batch(self) -> None:
+        while self._pending:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                key, (_, entry) = self._pending.popitem(last=False)
+                batch.append((key, entry))
+            try:
+                await self._loop.run_in_executor(self._executor, self.cache.set_many, batch)
+                self.stats["batches"] += 1
+            except Exception:
+                self.stats["writes_dropped"] += len(batch)
+
+    async def flush(self) -> None:
+        await self._write_batch()
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+        self._executor.shutdown(wait=True)
+
+
+_CACHE: Optional[ResponseCache] = None
+_ASYNC_CACHE: Optional[AsyncResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = ResponseCache(
+            os.path.join(settings.http_cache_dir, "responses.sqlite3"),
+            ttl_s=settings.http_cache_ttl_s,
+            max_bytes=settings.http_cache_max_bytes,
+            hot_max_entries=settings.http_cache_hot_entries,
+            codec=settings.http_cache_compression,
+            level=settings.http_cache_compression_level,
+        )
+    return _CACHE
+
+
+def get_async_cache() -> AsyncResponseCache:
+    global _ASYNC_CACHE
+    if _ASYNC_CACHE is None or _ASYNC_CACHE._loop is not asyncio.get_running_loop():
+        previous = _ASYNC_CACHE
+        _ASYNC_CACHE = AsyncResponseCache(
+            get_response_cache(),
+            io_threads=settings.http_cache_io_threads,
+            max_pending=settings.http_cache_max_pending_writes,
+            batch_size=settings.http_cache_write_batch,
+            flush_interval_s=settings.http_cache_flush_interval_s,
+        )
+        if previous is not None:
+            # The old facade's loop is gone: take over its queued writes and release its threads
+            _ASYNC_CACHE.adopt(previous.detach())
+    return _ASYNC_CACHE
+
+
+def cache_stats() -> Dict[str, int]:
+    stats = dict(_CACHE.stats) if _CACHE is not None else {}
+    if _ASYNC_CACHE is not None:
+        stats.update(_ASYNC_CACHE.stats)
+    return stats
+
+
+async def close_response_cache() -> None:
+    global _CACHE, _ASYNC_CACHE
+    if _ASYNC_CACHE is not None:
+        await _ASYNC_CACHE.close()
+        _ASYNC_CACHE = None
+    if _CACHE is not None:
+        _CACHE.close()
+        _CACHE = None
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Optional, Dict
 
 
 class Settings(BaseSettings):
@@ -17,9 +17,109 @@ class Settings(BaseSettings):
     http_cache_enabled: bool = True
     http_cache_dir: str = "backend/.cache"
     http_cache_ttl_s: int = 86400
+    http_cache_max_bytes: int = 256 * 1024 * 1024
+    http_cache_hot_entries: int = 512
+    # "zstd" (needs zstandard, else zlib), "zlib" or "none"
+    http_cache_compression: str = "zstd"
+    http_cache_compression_level: int = 3
+    http_cache_io_threads: int = 2
+    http_cache_max_pending_writes: int = 1000
+    http_cache_write_batch: int = 100
+    http_cache_flush_interval_s: float = 0.5
+    # Per-endpoint policies: TTL for 404/empty results and stale-while-revalidate window
+    http_cache_negative_ttl_s: int = 600
+    http_cache_swr_s: int = 3600
     proxy_url: Optional[str] = None
     rate_limit_rps_pdl: float = 2.0
     rate_limit_rps_github: float = 2.0
+    rate_limit_burst: float = 2.0
+    rate_limit_recovery_s: float = 30.0
+    # Extra per-hostname limits, e.g. {"api.example.com": 5.0}
+    rate_limit_hosts: Dict[str, float] = {}
+    # Shared HTTP client pool
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_s: float = 30.0
+    http2_enabled: bool = True
+    # Hedged GETs: race a second request once the host's latency percentile is exceeded
+    http_hedge_enabled: bool = False
+    http_hedge_percentile: float = 0.95
+    http_hedge_min_delay_s: float = 0.05
+    http_hedge_min_samples: int = 20
+    # Per-host circuit breaker
+    breaker_enabled: bool = True
+    breaker_window_s: float = 30.0
+    breaker_min_requests: int = 5
+    breaker_error_rate: float = 0.5
+    breaker_slow_call_s: float = 5.0
+    breaker_slow_rate: float = 0.8
+    breaker_open_s: float = 15.0
+    breaker_half_open_probes: int = 1
+    # LLM extraction
+    llm_model: str = "meta-llama/Llama-3.2-3B-Instruct"
+    llm_max_concurrency: int = 8
+    llm_max_retries: int = 2
+    llm_backoff_base_s: float = 0.5
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_s: int = 7 * 86400
+    llm_cache_max_entries: int = 10000
+    llm_cache_persist: bool = False
+    # Whole-result cache keyed on the normalized query and enabled connectors (?fresh=true bypasses)
+    result_cache_enabled: bool = True
+    result_cache_ttl_s: int = 3600
+    result_cache_max_entries: int = 5000
+    result_cache_persist: bool = False
+    # DuckDuckGo: concurrent queries per job, per-query timeout (from when a thread picks the
+    # query up), and early stop once this many strict-tier candidates reach the score threshold.
+    # ddg_thread_pool_size threads (one reused session each) serve every job in the process.
+    ddg_max_concurrency: int = 4
+    ddg_thread_pool_size: int = 32
+    ddg_query_timeout_s: float = 2.5
+    ddg_early_stop_hits: int = 3
+    ddg_early_stop_score: float = 0.8
+    # Raw DDGS results per (query, max_results); replay_mode serves only from here and store.replay
+    ddg_cache_enabled: bool = True
+    ddg_cache_ttl_s: int = 6 * 3600
+    ddg_cache_max_entries: int = 5000
+    ddg_cache_persist: bool = False
+    # PDL identify/search fallback queries: "sequential", "parallel" (speculative, best-ranked success wins)
+    # or "budget" (parallel only with at least this much wall time and an API call per attempt left)
+    pdl_attempt_strategy: str = "budget"
+    pdl_parallel_min_time_left_s: float = 5.0
+    # Enrich calls from concurrent jobs are coalesced into /v5/person/bulk requests (PDL caps a batch at 100)
+    pdl_bulk_enabled: bool = True
+    pdl_bulk_max_batch: int = 100
+    pdl_bulk_window_ms: float = 20.0
+    pdl_bulk_timeout_s: float = 15.0
+    # Connector registry overrides, keyed by tool name (e.g. {"clearbit": true})
+    connectors_enabled: Dict[str, bool] = {}
+    connector_costs_usd: Dict[str, float] = {}
+    # In-process job scheduler: worker count and per-lane queue capacity
+    job_workers: int = 8
+    job_queue_max_interactive: int = 100
+    job_queue_max_bulk: int = 1000
+    # Job records: "memory" (per process), "sqlite" (per host) or "redis" (shared; required by use_redis_queue)
+    job_store: str = "memory"
+    job_ttl_s: int = 86400
+    job_store_max_bytes: int = 128 * 1024 * 1024
+    job_store_path: str = "backend/.cache/jobs.sqlite3"
+    # Threads running SQLite/Redis job-store calls off the event loop
+    job_store_io_threads: int = 4
+    # GET /search/{id}?wait= long-poll cap, and how often shared stores are re-checked while waiting
+    job_wait_max_s: float = 30.0
+    job_wait_poll_s: float = 0.5
+    # POST /search/batch: jobs running at once per batch, and how many distinct queries are remembered for dedup
+    batch_max_in_flight: int = 16
+    batch_dedup_window: int = 100000
+    # The upload is read ahead of the batch into a spool kept in memory up to batch_spool_bytes
+    # (then on disk); batch_max_line_bytes is the longest NDJSON record accepted
+    batch_spool_bytes: int = 8 * 1024 * 1024
+    batch_max_line_bytes: int = 1024 * 1024
+    # Redis job queue (use_redis_queue): lease length, deliveries before dead-lettering, worker drain
+    redis_queue_prefix: str = "pds:jobs"
+    redis_queue_visibility_s: float = 30.0
+    redis_queue_max_attempts: int = 3
+    job_drain_timeout_s: float = 30.0
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
@@ -30,4 +130,5 @@ class Budget(BaseModel):
     max_wall_time_ms: int = 60000
     max_api_calls: int = 10
     max_llm_tokens: int = 20000
+    llm_call_timeout_ms: int = 15000
 
@@ -0,0 +1,142 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Iterator
+from .config import Budget
+
+
+class DeadlineExceeded(Exception):
+    """The job or step deadline passed before the call could start."""
+
+
+class BudgetExceeded(Exception):
+    """The job has used up its ``max_api_calls``."""
+
+
+class JobBudget:
+    """Runtime view of a ``Budget``: an absolute deadline plus an API-call counter."""
+
+    def __init__(self, budget: Budget) -> None:
+        self.budget = budget
+        self.deadline = time.monotonic() + budget.max_wall_time_ms / 1000.0
+        self.api_calls = 0
+
+    def time_left(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def charge_api_call(self, n: int = 1) -> None:
+        if self.api_calls + n > self.budget.max_api_calls:
+            raise BudgetExceeded(f"max_api_calls={self.budget.max_api_calls} reached")
+        self.api_calls += n
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_wall_time_ms": self.budget.max_wall_time_ms,
+            "time_left_ms": int(max(0.0, self.time_left()) * 1000),
+            "max_api_calls": self.budget.max_api_calls,
+            "api_calls": self.api_calls,
+        }
+
+
+# Context variables are copied into tasks at creation time, so a deadline set
+# around a step reaches every http_get (and single-flight task) it starts.
+_JOB: ContextVar[Optional[JobBudget]] = ContextVar("job_budget", default=None)
+_STEP_DEADLINE: ContextVar[Optional[float]] = ContextVar("step_deadline", default=None)
+_PARTIAL: ContextVar[Optional[Dict[str, Any]]] = ContextVar("step_partial", default=None)
+_CHARGED: ContextVar[Optional[Dict[str, int]]] = ContextVar("charged_calls", default=None)
+
+
+@contextmanager
+def job_scope(budget: Budget) -> Iterator[JobBudget]:
+    job = JobBudget(budget)
+    token = _JOB.set(job)
+    try:
+        yield job
+    finally:
+        _JOB.reset(token)
+
+
+@contextmanager
+def step_scope(timeout_s: float, holder: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Bound everything inside to ``timeout_s`` and collect ``report_partial`` results in ``holder``."""
+    holder = holder if holder is not None else {}
+    deadline = time.monotonic() + timeout_s
+    outer = current_deadline()
+    t1 = _STEP_DEADLINE.set(min(deadline, outer) if outer is not None else deadline)
+    t2 = _PARTIAL.set(holder)
+    try:
+        yield holder
+    finally:
+        _PARTIAL.reset(t2)
+        _STEP_DEADLINE.reset(t1)
+
+
+@contextmanager
+def charge_scope() -> Iterator[Dict[str, int]]:
+    """Count the API calls charged inside the block, including by tasks it starts.
+
+    Unlike a before/after difference on the job's counter, this leaves out
+    calls charged by other steps of the same job running concurrently.
+    """
+    charged = {"api_calls": 0}
+    token = _CHARGED.set(charged)
+    try:
+        yield charged
+    finally:
+        _CHARGED.reset(token)
+
+
+def current_job() -> Optional[JobBudget]:
+    return _JOB.get()
+
+
+def current_deadline() -> Optional[float]:
+    job = _JOB.get()
+    step = _STEP_DEADLINE.get()
+    candidates = [d for d in (job.deadline if job else None, step) if d is not None]
+    return min(candidates) if candidates else None
+
+
+def time_left() -> Optional[float]:
+    deadline = current_deadline()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def clamp_timeout(timeout: float) -> float:
+    """Shrink ``timeout`` to the remaining deadline; raise if nothing is left."""
+    left = time_left()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+    return min(timeout, left)
+
+
+def charge_api_call(n: int = 1) -> None:
+    job = _JOB.get()
+    if job is not None:
+        job.charge_api_call(n)
+    charged = _CHARGED.get()
+    if charged is not None:
+        charged["api_calls"] += n
+
+
+def report_partial(result: Dict[str, Any]) -> None:
+    """Record the best result so far for the current step, kept if the step is cut off."""
+    holder = _PARTIAL.get()
+    if holder is not None:
+        holder["result"] = result
+
+
+def report_error(source: str, error: str) -> None:
+    """Record that the current step's result may be incomplete (connector error, non-OK status)."""
+    holder = _PARTIAL.get()
+    if holder is not None:
+        holder.setdefault("errors", []).append({"source": source, "error": error})
+
+
+def report_stats(source: str, stats: Dict[str, Any]) -> None:
+    """Attach connector diagnostics to the current step; they end up in the job's metrics."""
+    holder = _PARTIAL.get()
+    if holder is not None:
+        holder.setdefault("stats", {})[source] = stats
@@ -1,73 +1,307 @@
 import hashlib
 import json
-import os
 import time
-from typing import Optional, Dict, Any
+import weakref
+from typing import Optional, Dict, Any, List
 import httpx
+from pydantic import BaseModel
 from .config import settings
+from .cache import get_async_cache, cache_stats, close_response_cache
+from .ratelimit import TokenBucket, get_limiter, parse_retry_after, limiter_stats
+from .breaker import CircuitBreaker, get_breaker, breaker_stats
+from .deadline import clamp_timeout, charge_api_call, time_left
 import asyncio
 
 
-def _cache_key(method: str, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, Any]]):
+def cache_key(method: str, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, Any]]) -> str:
+    """Response cache key for a request; callers that fill the cache themselves must use the same one."""
     raw = json.dumps({"m": method, "u": url, "p": params or {}, "h": headers or {}}, sort_keys=True)
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-async def http_get(url: str, *, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, Any]] = None, timeout: float = 10.0, disable_cache: bool = False) -> httpx.Response:
-    # Basic per-host rate limiting based on config
-    host_tag = None
-    rps = None
-    if "peopledatalabs.com" in url:
-        host_tag = "pdl"
-        rps = settings.rate_limit_rps_pdl
-    elif "api.github.com" in url:
-        host_tag = "github"
-        rps = settings.rate_limit_rps_github
-    if host_tag and rps and rps > 0:
-        await _respect_rate_limit(host_tag, rps)
-    if settings.http_cache_enabled and not disable_cache:
-        os.makedirs(settings.http_cache_dir, exist_ok=True)
-        key = _cache_key("GET", url, params, headers)
-        path = os.path.join(settings.http_cache_dir, key + ".json")
-        if os.path.exists(path):
-            if (time.time() - os.path.getmtime(path)) < settings.http_cache_ttl_s:
-                with open(path, "r", encoding="utf-8") as f:
-                    cached = json.load(f)
-                r = httpx.Response(status_code=cached["status"], request=httpx.Request("GET", url), json=cached.get("json"))
-                return r
-
-    proxies = {"all": settings.proxy_url} if settings.proxy_url else None
-    async with httpx.AsyncClient(timeout=timeout, proxies=proxies) as client:
-        r = await client.get(url, params=params, headers=headers)
-
-    if settings.http_cache_enabled and not disable_cache and r.status_code == 200:
-        key = _cache_key("GET", url, params, headers)
-        path = os.path.join(settings.http_cache_dir, key + ".json")
+class CachePolicy(BaseModel):
+    """Per-endpoint caching rules for http_get.
+
+    ``ttl_s=None`` means ``settings.http_cache_ttl_s``. Negative results (a
+    status in ``negative_statuses``, or a 200 whose ``empty_key`` field is
+    empty) are only cached when ``negative_ttl_s`` is set. Expired entries are
+    served for up to ``stale_while_revalidate_s`` while a background refresh
+    runs.
+    """
+
+    ttl_s: Optional[float] = None
+    negative_ttl_s: float = 0.0
+    negative_statuses: List[int] = [404]
+    empty_key: Optional[str] = None
+    stale_while_revalidate_s: float = 0.0
+
+
+DEFAULT_CACHE_POLICY = CachePolicy()
+_POLICIES: Dict[str, CachePolicy] = {}
+
+
+def register_cache_policy(url_prefix: str, policy: CachePolicy) -> None:
+    _POLICIES[url_prefix] = policy
+
+
+def cache_policy_for(url: str) -> CachePolicy:
+    best = None
+    for prefix in _POLICIES:
+        if url.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return _POLICIES[best] if best is not None else DEFAULT_CACHE_POLICY
+
+
+def cache_entry(r: httpx.Response, policy: CachePolicy) -> Optional[Dict[str, Any]]:
+    """The cache entry to store for ``r`` under ``policy``, or None if it must not be cached."""
+    negative = r.status_code in policy.negative_statuses
+    if r.status_code == 200 and policy.empty_key:
         try:
+            payload = r.json()
+        except Exception:
             payload = None
-            try:
-                payload = r.json()
-            except Exception:
-                payload = None
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump({"status": r.status_code, "json": payload}, f)
+        if isinstance(payload, dict) and not payload.get(policy.empty_key):
+            negative = True
+    if negative:
+        if policy.negative_ttl_s <= 0:
+            return None
+        ttl_s = policy.negative_ttl_s
+    elif r.status_code == 200:
+        ttl_s = policy.ttl_s
+    else:
+        return None
+    # Keep the raw body so a hit does not pay for a decode/re-encode round trip
+    return {"status": r.status_code, "content": r.content, "ttl_s": ttl_s, "stale_s": policy.stale_while_revalidate_s}
+
+
+async def http_get(url: str, *, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, Any]] = None, timeout: float = 10.0, disable_cache: bool = False) -> httpx.Response:
+    key = cache_key("GET", url, params, headers)
+    use_cache = settings.http_cache_enabled and not disable_cache
+    policy = cache_policy_for(url)
+    if use_cache:
+        cached = await get_async_cache().get(key)
+        if cached is not None:
+            stale = bool(cached.get("stale"))
+            if stale:
+                # Serve the stale copy now and refresh it in the background (not charged to the job)
+                _start_flight(url, key, params, headers, timeout, use_cache, policy)
+            return httpx.Response(
+                status_code=cached["status"],
+                request=httpx.Request("GET", url),
+                content=cached.get("content") or b"",
+                headers={"content-type": "application/json", "x-cache": "stale" if stale else "hit"},
+            )
+
+    # Network path: counted against max_api_calls and refused once the deadline has passed
+    clamp_timeout(timeout)
+    if key not in _INFLIGHT:
+        charge_api_call()
+    # The shared request keeps the host's own timeout: a leader close to its deadline must not
+    # fail followers with more budget, nor report its deadline to the breaker as a host failure.
+    # Each caller's deadline bounds only its own wait; the wait is shielded so that giving up
+    # (or being cancelled) does not abort the request for the others.
+    task = _start_flight(url, key, params, headers, timeout, use_cache, policy)
+    left = time_left()
+    if left is None:
+        return await asyncio.shield(task)
+    return await asyncio.wait_for(asyncio.shield(task), timeout=max(0.0, left))
+
+
+async def http_post(url: str, *, json_body: Any, headers: Optional[Dict[str, Any]] = None, timeout: float = 10.0) -> httpx.Response:
+    """POST through the shared client, host breaker and rate limiter (never cached or coalesced).
+
+    Callers charge the job's API calls themselves: one POST may serve several jobs.
+    """
+    breaker = get_breaker(url)
+    if breaker is not None:
+        breaker.before_call()
+    limiter = get_limiter(url)
+    if limiter is not None:
+        await limiter.acquire()
+    client = get_http_client()
+    start = time.perf_counter()
+    try:
+        r = await client.post(url, json=json_body, headers=headers, timeout=timeout)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        if breaker is not None:
+            breaker.record(False, time.perf_counter() - start)
+        raise
+    if breaker is not None:
+        breaker.record(r.status_code < 500, time.perf_counter() - start)
+    if limiter is not None and (r.status_code == 429 or "retry-after" in r.headers):
+        limiter.penalize(parse_retry_after(r.headers.get("retry-after")))
+    return r
+
+
+def _start_flight(url: str, key: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, Any]], timeout: float, use_cache: bool, policy: CachePolicy) -> "asyncio.Task[httpx.Response]":
+    # Single-flight: identical concurrent GETs share one upstream request
+    loop = asyncio.get_running_loop()
+    task = _INFLIGHT.get(key)
+    if task is None or task.get_loop() is not loop:
+        task = loop.create_task(_fetch(url, key, params, headers, timeout, use_cache, policy))
+        _INFLIGHT[key] = task
+        task.add_done_callback(lambda t, k=key: _flight_done(k, t))
+        FLIGHT_STATS["leaders"] += 1
+    else:
+        FLIGHT_STATS["coalesced"] += 1
+    return task
+
+
+async def _fetch(url: str, key: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, Any]], timeout: float, use_cache: bool, policy: CachePolicy) -> httpx.Response:
+    # Fail fast while the host's breaker is open
+    breaker = get_breaker(url)
+    if breaker is not None:
+        breaker.before_call()
+    # Per-host token bucket; 429/Retry-After responses slow the host down
+    limiter = get_limiter(url)
+    if limiter is not None:
+        await limiter.acquire()
+
+    r = await _send_hedged(url, params, headers, timeout, breaker, limiter)
+    if limiter is not None and (r.status_code == 429 or "retry-after" in r.headers):
+        limiter.penalize(parse_retry_after(r.headers.get("retry-after")))
+
+    if use_cache:
+        try:
+            entry = cache_entry(r, policy)
+            if entry is not None:
+                get_async_cache().put(key, entry)
         except Exception:
             pass
     return r
 
 
-# --- simple rate limiter ---
-_LAST_CALL: Dict[str, float] = {}
+async def _send(url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, Any]], timeout: float, breaker: Optional[CircuitBreaker]) -> httpx.Response:
+    client = get_http_client()
+    start = time.perf_counter()
+    try:
+        r = await client.get(url, params=params, headers=headers, timeout=timeout)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        if breaker is not None:
+            breaker.record(False, time.perf_counter() - start)
+        raise
+    if breaker is not None:
+        breaker.record(r.status_code < 500, time.perf_counter() - start)
+    return r
+
+
+async def _send_hedged(url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, Any]], timeout: float, breaker: Optional[CircuitBreaker], limiter: Optional[TokenBucket]) -> httpx.Response:
+    delay = None
+    if settings.http_hedge_enabled and breaker is not None:
+        p = breaker.latency_percentile(settings.http_hedge_percentile, settings.http_hedge_min_samples)
+        if p is not None:
+            delay = max(settings.http_hedge_min_delay_s, p)
+    if delay is None:
+        return await _send(url, params, headers, timeout, breaker)
+
+    # Hedge: if the first attempt outlives the latency percentile, race a second one
+    primary = asyncio.ensure_future(_send(url, params, headers, timeout, breaker))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done or (limiter is not None and limiter.tokens() < 1.0):
+        return await primary
+    if limiter is not None:
+        await limiter.acquire()
+    HEDGE_STATS["hedged"] += 1
+    hedge = asyncio.ensure_future(_send(url, params, headers, timeout, breaker))
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if t is hedge:
+                        HEDGE_STATS["hedge_won"] += 1
+                    return t.result()
+        # Both failed; surface the primary's error
+        return primary.result()
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+# --- single-flight ---
+_INFLIGHT: Dict[str, "asyncio.Task[httpx.Response]"] = {}
+FLIGHT_STATS: Dict[str, int] = {"leaders": 0, "coalesced": 0}
+HEDGE_STATS: Dict[str, int] = {"hedged": 0, "hedge_won": 0}
+
+
+def _flight_done(key: str, task: "asyncio.Task[httpx.Response]") -> None:
+    if _INFLIGHT.get(key) is task:
+        del _INFLIGHT[key]
+    # Mark the exception as retrieved in case every caller was cancelled
+    if not task.cancelled():
+        task.exception()
+
+
+def http_stats() -> Dict[str, Any]:
+    return {
+        "cache": cache_stats(),
+        "single_flight": dict(FLIGHT_STATS),
+        "rate_limits": limiter_stats(),
+        "hedging": dict(HEDGE_STATS),
+        "breakers": breaker_stats(),
+    }
+
 
+# --- shared client pool ---
+_CLIENTS: Dict[Optional[str], httpx.AsyncClient] = {}
+# Loop each pooled client was first used on; its connections belong to that loop
+_CLIENT_LOOPS: "weakref.WeakKeyDictionary[httpx.AsyncClient, asyncio.AbstractEventLoop]" = weakref.WeakKeyDictionary()
 
-async def _respect_rate_limit(tag: str, rps: float) -> None:
-    min_interval = 1.0 / float(rps)
-    now = time.monotonic()
-    last = _LAST_CALL.get(tag)
-    if last is not None:
-        elapsed = now - last
-        wait = min_interval - elapsed
-        if wait > 0:
-            await asyncio.sleep(wait)
-    _LAST_CALL[tag] = time.monotonic()
 
+def _http2_available() -> bool:
+    if not settings.http2_enabled:
+        return False
+    try:
+        import h2  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def _build_client(proxy_url: Optional[str]) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_s,
+    )
+    return httpx.AsyncClient(limits=limits, http2=_http2_available(), proxy=proxy_url)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client for the configured proxy.
+
+    Clients are normally opened in the app lifespan; outside of it (scripts,
+    tests) one is created lazily on first use. A client is rebuilt when the
+    running loop changes (e.g. between ``asyncio.run`` calls), since its
+    pooled connections cannot be used from another loop.
+    """
+    key = settings.proxy_url
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(key)
+    if client is not None and _CLIENT_LOOPS.setdefault(client, loop) is not loop:
+        client = None
+    if client is None or client.is_closed:
+        client = _build_client(key)
+        _CLIENTS[key] = client
+        _CLIENT_LOOPS[client] = loop
+    return client
+
+
+async def open_http_clients() -> None:
+    get_http_client()
+
+
+async def close_http_clients() -> None:
+    await close_response_cache()
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception:
+            pass
@@ -1,14 +1,112 @@
+import asyncio
+import random
 from typing import List, Dict, Any, Optional
-from openai import OpenAI
-from .config import settings
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+from .config import settings, Budget
+from .deadline import clamp_timeout
 
 
-def get_openai_client() -> Optional[OpenAI]:
-    base = settings.openai_base_url
-    # If neither base nor key is set, return None (LLM disabled)
-    if not base and not settings.openai_api_key:
+# --- shared async client ---
+_ASYNC_CLIENT: Optional[AsyncOpenAI] = None
+_SEMAPHORE: Optional[asyncio.Semaphore] = None
+_LOOP: Optional[asyncio.AbstractEventLoop] = None
+# Clients replaced on a loop change, closing in the background
+_CLOSING: set = set()
+
+
+def get_async_openai_client() -> Optional[AsyncOpenAI]:
+    """Process-wide AsyncOpenAI client, or None when no LLM is configured."""
+    global _ASYNC_CLIENT, _SEMAPHORE, _LOOP
+    if not settings.openai_base_url and not settings.openai_api_key:
         return None
-    return OpenAI(base_url=base, api_key=(settings.openai_api_key or "EMPTY"))
+    loop = asyncio.get_running_loop()
+    if _ASYNC_CLIENT is None or _LOOP is not loop:
+        if _ASYNC_CLIENT is not None:
+            # Release the old client's connection pool instead of leaking it
+            task = loop.create_task(_close_quietly(_ASYNC_CLIENT))
+            _CLOSING.add(task)
+            task.add_done_callback(_CLOSING.discard)
+        # Pooled connections and the semaphore are bound to the loop that created them
+        _ASYNC_CLIENT = AsyncOpenAI(
+            base_url=settings.openai_base_url,
+            api_key=(settings.openai_api_key or "EMPTY"),
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=settings.llm_max_concurrency, max_keepalive_connections=settings.llm_max_concurrency),
+            ),
+        )
+        _SEMAPHORE = asyncio.Semaphore(settings.llm_max_concurrency)
+        _LOOP = loop
+    return _ASYNC_CLIENT
+
+
+async def _close_quietly(client: AsyncOpenAI) -> None:
+    try:
+        await client.close()
+    except Exception:
+        pass
+
+
+async def close_llm_client() -> None:
+    global _ASYNC_CLIENT, _SEMAPHORE, _LOOP
+    client = _ASYNC_CLIENT
+    _ASYNC_CLIENT, _SEMAPHORE, _LOOP = None, None, None
+    if client is not None:
+        await _close_quietly(client)
+    if _CLOSING:
+        await asyncio.gather(*list(_CLOSING), return_exceptions=True)
+
+
+def _retryable(exc: Exception) -> bool:
+    if isinstance(exc, (APITimeoutError, APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+async def chat_completion(
+    messages: List[Dict[str, Any]],
+    *,
+    model: Optional[str] = None,
+    budget: Optional[Budget] = None,
+    temperature: float = 0,
+) -> Optional[str]:
+    """Run one chat completion without blocking the event loop.
+
+    At most ``settings.llm_max_concurrency`` calls are in flight per process;
+    each attempt is capped by ``budget.llm_call_timeout_ms`` (and the job
+    deadline) and retryable
+    errors back off exponentially with jitter (the semaphore is released
+    while sleeping). Returns None when no LLM is configured.
+    """
+    client = get_async_openai_client()
+    if client is None:
+        return None
+    semaphore = _SEMAPHORE
+    attempt = 0
+    while True:
+        # Never outlive the job deadline, if one is set
+        timeout_s = clamp_timeout((budget or Budget()).llm_call_timeout_ms / 1000.0)
+        try:
+            async with semaphore:
+                resp = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model or settings.llm_model,
+                        messages=messages,
+                        temperature=temperature,
+                        timeout=timeout_s,
+                    ),
+                    timeout=timeout_s,
+                )
+            return resp.choices[0].message.content
+        except Exception as exc:
+            if attempt >= settings.llm_max_retries or not _retryable(exc):
+                raise
+        delay = settings.llm_backoff_base_s * (2 ** attempt)
+        await asyncio.sleep(delay + random.uniform(0, delay / 2))
+        attempt += 1
 
 
 def build_json_schema_prompt(schema_hint: str, user_text: str) -> List[Dict[str, Any]]:
@@ -20,4 +118,3 @@ def build_json_schema_prompt(schema_hint: str, user_text: str) -> List[Dict[str,
         {"role": "system", "content": system},
         {"role": "user", "content": user},
     ]
-
@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+import orjson
+from .cache import ResponseCache
+
+
+def stable_hash(value: Any) -> str:
+    """sha256 of a canonical (sorted-key) JSON encoding of ``value``."""
+    return hashlib.sha256(orjson.dumps(value, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class TTLCache:
+    """In-memory LRU with per-entry TTL, optionally backed by a SQLite ResponseCache.
+
+    Values must be JSON-serializable when ``persist_path`` is set; disk
+    lookups and writes run in a worker thread.
+    """
+
+    def __init__(self, *, max_entries: int, ttl_s: float, persist_path: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._disk = ResponseCache(persist_path, ttl_s=ttl_s, max_bytes=max_bytes, hot_max_entries=0) if persist_path else None
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_local(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.get_local(key)
+        if value is None and self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key)
+            if entry is not None and entry.get("content") is not None:
+                value = orjson.loads(entry["content"])
+                self._put_local(key, value)
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._put_local(key, value)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, {"status": 200, "content": orjson.dumps(value)})
+
+    def _put_local(self, key: str, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl_s, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._data),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
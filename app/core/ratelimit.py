@@ -0,0 +1,140 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
+from .config import settings
+
+
+class TokenBucket:
+    """Async token bucket with FIFO waiters and 429 back-off.
+
+    ``penalize`` halves the effective rate (down to ``min_factor``) and can pause
+    the bucket until a ``Retry-After`` deadline; the rate then doubles back
+    towards the configured value every ``recovery_s`` seconds.
+    """
+
+    def __init__(self, rate: float, burst: float, *, min_factor: float = 0.125, recovery_s: float = 30.0) -> None:
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.min_factor = min_factor
+        self.recovery_s = recovery_s
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._factor = 1.0
+        self._penalized_at = 0.0
+        self._blocked_until = 0.0
+        # asyncio.Lock hands itself to waiters in FIFO order, so the queue is fair
+        self._lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _refill(self, now: float) -> None:
+        if self._factor < 1.0 and self.recovery_s > 0:
+            steps = int((now - self._penalized_at) / self.recovery_s)
+            if steps > 0:
+                self._factor = min(1.0, self._factor * (2 ** steps))
+                self._penalized_at += steps * self.recovery_s
+        elapsed = max(0.0, now - self._updated)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.effective_rate)
+        self._updated = now
+
+    @property
+    def effective_rate(self) -> float:
+        return self.rate * self._factor
+
+    def tokens(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        return self._tokens
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.effective_rate)
+
+    def penalize(self, retry_after_s: Optional[float] = None) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        self._factor = max(self.min_factor, self._factor / 2.0)
+        self._penalized_at = now
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after_s and retry_after_s > 0:
+            self._blocked_until = max(self._blocked_until, now + retry_after_s)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        tokens = self.tokens()
+        return {
+            "rate": self.rate,
+            "effective_rate": self.effective_rate,
+            "burst": self.burst,
+            "tokens": round(tokens, 3),
+            "blocked_for_s": round(max(0.0, self._blocked_until - now), 3),
+        }
+
+
+_LIMITERS: Dict[str, TokenBucket] = {}
+
+
+def _host_limits(host: str) -> Optional[Tuple[float, float]]:
+    if host in settings.rate_limit_hosts:
+        return settings.rate_limit_hosts[host], settings.rate_limit_burst
+    if host == "peopledatalabs.com" or host.endswith(".peopledatalabs.com"):
+        return settings.rate_limit_rps_pdl, settings.rate_limit_burst
+    if host == "api.github.com":
+        return settings.rate_limit_rps_github, settings.rate_limit_burst
+    return None
+
+
+def get_limiter(url: str) -> Optional[TokenBucket]:
+    host = (urlparse(url).hostname or "").lower()
+    if not host:
+        return None
+    limits = _host_limits(host)
+    if limits is None or not limits[0] or limits[0] <= 0:
+        return None
+    loop = asyncio.get_running_loop()
+    bucket = _LIMITERS.get(host)
+    if bucket is not None and bucket._loop is not loop:
+        # A bucket's lock cannot be shared across event loops (e.g. between test runs)
+        bucket = None
+    if bucket is None:
+        bucket = TokenBucket(limits[0], limits[1], recovery_s=settings.rate_limit_recovery_s)
+        bucket._loop = loop
+        _LIMITERS[host] = bucket
+    return bucket
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except Exception:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def tokens_remaining(host: str) -> Optional[float]:
+    bucket = _LIMITERS.get(host.lower())
+    return bucket.tokens() if bucket else None
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {host: bucket.snapshot() for host, bucket in _LIMITERS.items()}
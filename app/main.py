@@ -1,10 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings
 from .core.logging import setup_logging, logger
+from .core.http import open_http_clients, close_http_clients, http_stats
+from .core.llm import close_llm_client
+from .connectors.registry import close_connectors
+from .connectors.pdl_bulk import pdl_bulk_stats
+from .store.queue import close_job_queue, queue_stats
+from .store.jobs import close_job_store, job_store_snapshot, require_shared_job_store
 from .api.routers.search import router as search_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    require_shared_job_store()
+    await open_http_clients()
+    try:
+        yield
+    finally:
+        await close_job_queue()
+        # Connectors may flush pending work (PDL bulk enrich) through the shared client
+        await close_connectors()
+        await close_http_clients()
+        await close_llm_client()
+        close_job_store()
+
+
 def create_app() -> FastAPI:
     setup_logging("INFO")
     app = FastAPI(
@@ -12,6 +34,7 @@ def create_app() -> FastAPI:
         version="0.1.0",
         docs_url="/docs",
         redoc_url="/redoc",
+        lifespan=lifespan,
     )
 
     app.add_middleware(
@@ -27,6 +50,10 @@ def create_app() -> FastAPI:
         logger.info({"event": "healthz"})
         return {"status": "ok"}
 
+    @app.get("/metrics")
+    async def metrics():
+        return {"job_queue": await queue_stats(), "job_store": await job_store_snapshot(), "http": http_stats(), "pdl_bulk": pdl_bulk_stats()}
+
     app.include_router(search_router, prefix="/search", tags=["search"])
     return app
 
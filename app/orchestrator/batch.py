@@ -0,0 +1,225 @@
+import asyncio
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from ..agent.extractor import extract_normalized_query
+from ..core.config import settings
+from ..core.logging import logger
+from ..core.memo import stable_hash
+from ..schemas.common import JobStatus
+from ..schemas.search import SearchInput, SearchStatusResponse
+from ..store.jobs import JobRecord, wait_for_terminal
+from ..store.queue import QueueFull
+from .runner import start_search_job
+
+
+class BatchProgress(BaseModel):
+    batch_id: str
+    received: int = 0
+    invalid: int = 0
+    unique: int = 0
+    deduplicated: int = 0
+    completed: int = 0
+    failed: int = 0
+    emitted: int = 0
+    done: bool = False
+    started_at: float = 0.0
+    finished_at: Optional[float] = None
+
+
+_BATCHES: "OrderedDict[str, BatchProgress]" = OrderedDict()
+_MAX_BATCHES = 1000
+
+
+def open_batch(batch_id: str) -> BatchProgress:
+    progress = BatchProgress(batch_id=batch_id, started_at=time.time())
+    _BATCHES[batch_id] = progress
+    while len(_BATCHES) > _MAX_BATCHES:
+        _BATCHES.popitem(last=False)
+    return progress
+
+
+def get_batch(batch_id: str) -> Optional[BatchProgress]:
+    return _BATCHES.get(batch_id)
+
+
+class BodySpool:
+    """A request body buffered ahead of the batch that consumes it.
+
+    The upload is written here as fast as the client sends it, whatever the
+    batch is doing, so a client that sends its whole body before reading any
+    results cannot stall against a batch waiting to write them. Up to
+    ``batch_spool_bytes`` stay in memory, the rest goes to a temp file.
+    ``chunks()`` yields what has arrived and waits for more until ``finish``.
+    """
+
+    def __init__(self, read_size: int = 64 * 1024) -> None:
+        self.read_size = read_size
+        self._file = tempfile.SpooledTemporaryFile(max_size=settings.batch_spool_bytes)
+        self._written = 0
+        self._read = 0
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._more = asyncio.Event()
+
+    def write(self, data: bytes) -> None:
+        if data:
+            self._file.seek(self._written)
+            self._file.write(data)
+            self._written += len(data)
+            self._more.set()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """No more data; ``error`` (a client disconnect) is raised to the reader once it catches up."""
+        if self._done:
+            return
+        self._done = True
+        self._error = error
+        self._more.set()
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                if self._read < self._written:
+                    self._file.seek(self._read)
+                    data = self._file.read(min(self.read_size, self._written - self._read))
+                    self._read += len(data)
+                    yield data
+                elif self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                else:
+                    self._more.clear()
+                    await self._more.wait()
+        finally:
+            self._file.close()
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a body into non-blank lines as it arrives, holding at most one partial line."""
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(buf[start:end])
+            start = end + 1
+            if line.strip():
+                yield line.decode("utf-8")
+        del buf[:start]
+        if len(buf) > settings.batch_max_line_bytes:
+            raise ValueError(f"NDJSON line longer than {settings.batch_max_line_bytes} bytes")
+    if buf.strip():
+        yield bytes(buf).decode("utf-8")
+
+
+def _result_line(index: int, job: Optional[JobRecord], job_id: str, duplicate_of: Optional[int] = None) -> Dict[str, Any]:
+    if job is None:
+        line: Dict[str, Any] = {"index": index, "job_id": job_id, "status": JobStatus.failed.value, "error": "job expired"}
+    else:
+        status = SearchStatusResponse(job_id=job_id, status=job.status, result=job.result, error=job.error, questions=job.questions)
+        line = {"index": index, **status.model_dump(mode="json")}
+    if duplicate_of is not None:
+        line["duplicate_of"] = duplicate_of
+    return line
+
+
+async def _submit(payload: SearchInput, fresh: bool) -> str:
+    # Batches use the bulk lane and wait for room instead of failing
+    while True:
+        try:
+            return await start_search_job(payload, lane="bulk", fresh=fresh)
+        except QueueFull as exc:
+            await asyncio.sleep(exc.retry_after_s)
+
+
+async def run_batch(batch_id: str, lines: AsyncIterator[str], fresh: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """Run every ``SearchInput`` line as a bulk job and yield results in completion order.
+
+    Records that normalize to the same query share one job; their lines
+    carry ``duplicate_of`` with the index of the first one. The key comes
+    from the deterministic normalizers only: the LLM-aided extraction runs
+    once per job inside the job itself, not serially here for every line. At most
+    ``batch_max_in_flight`` jobs run at once and input is read only as slots
+    free up, so memory stays bounded by the window rather than the batch.
+    """
+    progress = open_batch(batch_id)
+    out: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=settings.batch_max_in_flight * 2)
+    slots = asyncio.Semaphore(settings.batch_max_in_flight)
+    # normalized-query hash -> (job id, first index); job id -> indexes of pending duplicates
+    seen: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+    pending_dups: Dict[str, List[int]] = {}
+    followers: set = set()
+
+    async def follow(job_id: str, index: int) -> None:
+        try:
+            job = await wait_for_terminal(job_id)
+            ok = job is not None and job.status != JobStatus.failed
+            progress.completed += 1 if ok else 0
+            progress.failed += 0 if ok else 1
+            await out.put(_result_line(index, job, job_id))
+            for dup in pending_dups.pop(job_id, []):
+                await out.put(_result_line(dup, job, job_id, duplicate_of=index))
+        finally:
+            slots.release()
+
+    async def produce() -> None:
+        try:
+            index = -1
+            async for raw in lines:
+                index += 1
+                progress.received += 1
+                try:
+                    payload = SearchInput.model_validate_json(raw)
+                except ValidationError as exc:
+                    progress.invalid += 1
+                    await out.put({"index": index, "error": f"invalid SearchInput: {exc.errors()[0].get('msg')}"})
+                    continue
+                nq = await extract_normalized_query(payload)
+                key = stable_hash(nq.model_dump(mode="json"))
+                first = seen.get(key)
+                if first is not None:
+                    progress.deduplicated += 1
+                    job_id, first_index = first
+                    if job_id in pending_dups:
+                        pending_dups[job_id].append(index)
+                    else:
+                        await out.put(_result_line(index, await wait_for_terminal(job_id), job_id, duplicate_of=first_index))
+                    continue
+                await slots.acquire()
+                job_id = await _submit(payload, fresh)
+                progress.unique += 1
+                seen[key] = (job_id, index)
+                if len(seen) > settings.batch_dedup_window:
+                    seen.popitem(last=False)
+                pending_dups[job_id] = []
+                task = asyncio.create_task(follow(job_id, index))
+                followers.add(task)
+                task.add_done_callback(followers.discard)
+            await asyncio.gather(*list(followers))
+        except Exception as exc:
+            logger.exception({"event": "batch_failed", "batch_id": batch_id, "error": str(exc)})
+            await out.put({"error": f"batch aborted: {exc}"})
+        finally:
+            await out.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await out.get()
+            if item is None:
+                break
+            progress.emitted += 1
+            yield item
+    finally:
+        producer.cancel()
+        for task in list(followers):
+            task.cancel()
+        progress.done = True
+        progress.finished_at = time.time()
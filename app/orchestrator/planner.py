@@ -1,33 +1,73 @@
 from typing import List, Dict, Any
 from ..schemas.search import NormalizedQuery
 
+# What each tool can surface for follow-up steps (fields of NormalizedQuery)
+PRODUCES: Dict[str, List[str]] = {
+    "pdl": ["email", "username", "profile_url"],
+    "pdl_identify": ["email", "profile_url"],
+    "pdl_search": ["email", "profile_url"],
+    "duckduckgo": ["username", "profile_url"],
+    "github": [],
+}
+
+
+def _node(tool: str, timeout_ms: int, consumes: List[str], node_id: str = "") -> Dict[str, Any]:
+    return {
+        "id": node_id or tool,
+        "tool": tool,
+        "timeout_ms": timeout_ms,
+        "consumes": consumes,
+        "produces": PRODUCES.get(tool, []),
+    }
+
 
 def plan_tools(query: NormalizedQuery, budget_ms: int) -> List[Dict[str, Any]]:
+    """Plan a DAG of connector steps.
+
+    Each node lists the query fields it ``consumes`` and the ones its results
+    may ``produce``. Nodes whose inputs are already in the query start right
+    away; follow-up nodes wait until an earlier step discovers their input.
+    """
     steps: List[Dict[str, Any]] = []
     time_left = budget_ms
     # Simple rules: email -> PDL enrich; username -> GitHub; name+location -> PDL search
     # Context-only (no name/email/phone/username/location): try search engine first
     if not (query.full_name or query.email or query.phone or query.username or query.location):
-        steps.append({"tool": "duckduckgo", "timeout_ms": min(6000, time_left)})
+        steps.append(_node("duckduckgo", min(6000, time_left), ["context_text"]))
         time_left -= steps[-1]["timeout_ms"]
+        _add_follow_ups(steps, query, time_left)
         return steps
     if query.email:
-        steps.append({"tool": "pdl", "timeout_ms": min(5000, time_left)})
+        steps.append(_node("pdl", min(5000, time_left), ["email"]))
         time_left -= steps[-1]["timeout_ms"]
     elif query.full_name and query.location and time_left > 0:
-        steps.append({"tool": "pdl_identify", "timeout_ms": min(5000, time_left)})
+        steps.append(_node("pdl_identify", min(5000, time_left), ["full_name", "location"]))
         time_left -= steps[-1]["timeout_ms"]
         if time_left > 0:
-            steps.append({"tool": "pdl_search", "timeout_ms": min(5000, time_left)})
+            steps.append(_node("pdl_search", min(5000, time_left), ["full_name", "location"]))
             time_left -= steps[-1]["timeout_ms"]
         if time_left > 0:
-            steps.append({"tool": "duckduckgo", "timeout_ms": min(5000, time_left)})
+            steps.append(_node("duckduckgo", min(5000, time_left), ["full_name", "location"]))
             time_left -= steps[-1]["timeout_ms"]
     if query.username and time_left > 0:
-        steps.append({"tool": "github", "timeout_ms": min(4000, time_left)})
+        steps.append(_node("github", min(4000, time_left), ["username"]))
         time_left -= steps[-1]["timeout_ms"]
     if not steps and time_left > 0:
-        steps.append({"tool": "pdl", "timeout_ms": min(5000, time_left)})
+        steps.append(_node("pdl", min(5000, time_left), []))
         time_left -= steps[-1]["timeout_ms"]
+    _add_follow_ups(steps, query, time_left)
     return steps
 
+
+def _add_follow_ups(steps: List[Dict[str, Any]], query: NormalizedQuery, time_left: int) -> None:
+    # Only worth planning when an earlier step can produce the missing input
+    produced = {f for s in steps for f in s["produces"]}
+    if not query.username and "username" in produced and time_left > 0:
+        steps.append(_node("github", min(4000, time_left), ["username"], "github:username"))
+        time_left -= steps[-1]["timeout_ms"]
+    if not query.email and "email" in produced and time_left > 0:
+        steps.append(_node("pdl", min(5000, time_left), ["email"], "pdl:email"))
+        time_left -= steps[-1]["timeout_ms"]
+    if not query.email and "profile_url" in produced and time_left > 0:
+        steps.append(_node("pdl", min(5000, time_left), ["profile_url"], "pdl:profile"))
+        time_left -= steps[-1]["timeout_ms"]
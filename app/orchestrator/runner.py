@@ -1,163 +1,334 @@
+import os
 import uuid
 import asyncio
 import time
-from typing import Optional, Dict, Any
-from ..schemas.search import SearchInput, SearchStatusResponse
+import orjson
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from urllib.parse import urlparse
+from ..schemas.search import SearchInput, SearchStatusResponse, NormalizedQuery
 from ..schemas.common import JobStatus
-from ..store.jobs import create_job, get_job, update_job
-from ..store.queue import enqueue_background
+from ..store.jobs import create_job, delete_job, get_job, update_job
+from ..store.queue import enqueue_background, Lane, QueueFull
 from ..agent.extractor import extract_with_llm_fallback as extract_normalized_query
-from ..connectors.pdl import PeopleDataLabsConnector
-from ..connectors.pdl_search import PeopleDataLabsSearchConnector
-from ..connectors.pdl_identify import PeopleDataLabsIdentifyConnector
-from ..connectors.clearbit import ClearbitConnector
-from ..scraper.github import GitHubScraper
 from ..aggregator.merge import merge_results
 from ..judge.validator import judge_result
 from ..core.logging import logger
+from ..store.events import open_stream, get_stream, publish_event, close_stream, discard_stream
+from fastapi.encoders import jsonable_encoder
 from ..orchestrator.planner import plan_tools
-from ..connectors.search_engine import DuckDuckGoConnector
+from ..connectors.registry import get_spec, get_connector, connector_cost, enabled_connectors
+from ..core.breaker import breaker_stats
+from ..core.config import Budget, settings
+from ..core.memo import TTLCache, stable_hash
+from ..core.deadline import JobBudget, job_scope, step_scope
 
 
-async def start_search_job(payload: SearchInput) -> str:
+async def start_search_job(payload: SearchInput, lane: Lane = "interactive", fresh: bool = False) -> str:
     job_id = uuid.uuid4().hex
-    create_job(job_id, status=JobStatus.queued, result=None, error=None)
-    logger.info({"event": "job_created", "job_id": job_id})
-    # Fire-and-forget background task to simulate orchestration
-    enqueue_background(_run_job, job_id, payload)
+    # The record must exist before a worker (possibly in another process) can claim the
+    # job, or its first update would be lost and create() could later reset it.
+    await create_job(job_id, status=JobStatus.queued, result=None, error=None)
+    # Events are only published by the process running the job; with the Redis queue
+    # that is a worker, so readers here follow the job store instead
+    if not settings.use_redis_queue:
+        open_stream(job_id)
+    try:
+        await enqueue_background(_run_job, job_id, payload, lane=lane, fresh=fresh)
+    except QueueFull:
+        discard_stream(job_id)
+        await delete_job(job_id)
+        raise
+    logger.info({"event": "job_created", "job_id": job_id, "lane": lane})
     return job_id
 
 
 async def get_job_status(job_id: str) -> Optional[SearchStatusResponse]:
-    return get_job(job_id)
+    return await get_job(job_id)
+
+
+_RESERVED_GITHUB_PATHS = {"orgs", "topics", "features", "about", "settings", "marketplace", "sponsors", "login", "search"}
+
+
+def _discover(result: Dict[str, Any]) -> Dict[str, str]:
+    """Pull follow-up inputs (username, email, profile_url) out of a connector result."""
+    found: Dict[str, str] = {}
+    cands = sorted(result.get("candidates", []), key=lambda c: getattr(c, "score", 0.0), reverse=True)
+    for c in cands:
+        if c.emails and "email" not in found:
+            found["email"] = str(c.emails[0])
+        if c.usernames and "username" not in found:
+            found["username"] = c.usernames[0]
+        for link in c.links:
+            p = urlparse(str(link))
+            host = (p.hostname or "").lower()
+            parts = [x for x in p.path.split("/") if x]
+            if host.endswith("github.com") and len(parts) == 1 and parts[0].lower() not in _RESERVED_GITHUB_PATHS:
+                found.setdefault("username", parts[0])
+            elif host.endswith("linkedin.com") and len(parts) >= 2 and parts[0] == "in":
+                found.setdefault("profile_url", f"https://www.linkedin.com/in/{parts[1]}")
+    return found
+
+
+async def _run_step(call: Callable[[], Awaitable[Dict[str, Any]]], timeout_s: float, holder: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one connector call under its own deadline.
+
+    On timeout the connector is cancelled and the last ``report_partial``
+    result (if any) is returned; ``holder["cut_off"]`` records why.
+    """
+    with step_scope(timeout_s, holder):
+        try:
+            return await asyncio.wait_for(call(), timeout=timeout_s)
+        except asyncio.TimeoutError:
+            holder["cut_off"] = "step_timeout"
+            return holder.get("result") or {}
+
+
+def _publish_progress(job_id: str, tool: str, result: Dict[str, Any], results_so_far: List[Dict[str, Any]]) -> None:
+    if get_stream(job_id) is None:
+        return
+    publish_event(job_id, "partial", {
+        "tool": tool,
+        "evidences": jsonable_encoder(result.get("evidences", [])),
+        "candidates": jsonable_encoder(result.get("candidates", [])),
+    })
+    publish_event(job_id, "snapshot", jsonable_encoder(merge_results(results_so_far)))
 
 
-async def _run_job(job_id: str, payload: SearchInput) -> None:
+_RESULT_CACHE: Optional[TTLCache] = None
+
+
+def get_result_cache() -> TTLCache:
+    global _RESULT_CACHE
+    if _RESULT_CACHE is None:
+        _RESULT_CACHE = TTLCache(
+            max_entries=settings.result_cache_max_entries,
+            ttl_s=settings.result_cache_ttl_s,
+            persist_path=os.path.join(settings.http_cache_dir, "results.sqlite3") if settings.result_cache_persist else None,
+        )
+    return _RESULT_CACHE
+
+
+def _result_cache_key(nq: NormalizedQuery) -> str:
+    # The connector set is part of the key: enabling a source must not serve results computed without it
+    return stable_hash({"query": nq.model_dump(mode="json"), "connectors": sorted(enabled_connectors())})
+
+
+async def _finish(job_id: str, status: JobStatus, result: Dict[str, Any], questions: Optional[List[str]]) -> None:
+    logger.info({"event": f"job_{status.value}", "job_id": job_id, "latency_ms": result["metrics"]["latency_ms"]})
+    await update_job(job_id, status=status, result=result, error=None, questions=questions)
+    publish_event(job_id, "final", {"status": status.value, "result": jsonable_encoder(result), "questions": questions})
+
+
+async def _run_job(job_id: str, payload: SearchInput, budget: Optional[Budget] = None, fresh: bool = False) -> None:
     start = time.perf_counter()
+    budget = budget or Budget()
     try:
-        update_job(job_id, status=JobStatus.running)
-        logger.info({"event": "job_running", "job_id": job_id})
-        # Simulate planning/execution time
-        await asyncio.sleep(0.1)
-
-        nq = await extract_normalized_query(payload)
-        normalized_query: Dict[str, Any] = nq.model_dump()
-
-        # Planner determines tool sequence under budget
-        steps = plan_tools(nq, budget_ms=20000)
-        tool_map = {
-            "pdl": PeopleDataLabsConnector(),
-            "clearbit": ClearbitConnector(),
-            "github": GitHubScraper(),
-            "pdl_search": PeopleDataLabsSearchConnector(),
-            "duckduckgo": DuckDuckGoConnector(),
-            "pdl_identify": PeopleDataLabsIdentifyConnector(),
-        }
-        tasks = []
-        used_tools = []
-        for s in steps:
-            tool = tool_map.get(s["tool"]) if s else None
-            if not tool:
+        with job_scope(budget) as job_budget:
+            await _execute_job(job_id, payload, job_budget, start, fresh)
+    except Exception as exc:  # pragma: no cover - defensive
+        logger.exception({"event": "job_failed", "job_id": job_id, "error": str(exc)})
+        await update_job(job_id, status=JobStatus.failed, error=str(exc))
+        publish_event(job_id, "final", {"status": JobStatus.failed.value, "error": str(exc)})
+    finally:
+        close_stream(job_id)
+
+
+async def _execute_job(job_id: str, payload: SearchInput, job_budget: JobBudget, start: float, fresh: bool = False) -> None:
+    await update_job(job_id, status=JobStatus.running)
+    publish_event(job_id, "status", {"status": JobStatus.running.value})
+    logger.info({"event": "job_running", "job_id": job_id})
+
+    extract_diag: Dict[str, Any] = {}
+    nq = await extract_normalized_query(payload, budget=job_budget.budget, diagnostics=extract_diag)
+    normalized_query: Dict[str, Any] = nq.model_dump()
+
+    cache_diag: Dict[str, Any] = {"status": "disabled"}
+    cache_key = None
+    if settings.result_cache_enabled:
+        cache = get_result_cache()
+        cache_key = _result_cache_key(nq)
+        cache_diag["status"] = "bypass" if fresh else "miss"
+        cached = None if fresh else await cache.get(cache_key)
+        if cached is not None:
+            # Copy so later edits to this job (choose-candidate, answer) cannot reach the cache
+            result = orjson.loads(orjson.dumps(cached["result"]))
+            metrics = result["metrics"]
+            metrics["diagnostics"]["result_cache"] = {"status": "hit", "cached_latency_ms": metrics["latency_ms"], **cache.snapshot()}
+            metrics.update(latency_ms=int((time.perf_counter() - start) * 1000), tools_used=[], api_cost_usd=0.0)
+            await _finish(job_id, JobStatus(cached["status"]), result, cached["questions"])
+            return
+
+    # Simulate planning/execution time
+    await asyncio.sleep(0.1)
+
+    # Planner determines tool sequence under whatever wall time is left
+    steps = plan_tools(nq, budget_ms=max(0, int(job_budget.time_left() * 1000)))
+    # DAG execution: a node starts once every field it consumes is known, either from
+    # the query or discovered by an earlier step; each runs under its planner timeout
+    known: Dict[str, Any] = {k: v for k, v in normalized_query.items() if v}
+    waiting = list(steps)
+    launched: Dict["asyncio.Task[Dict[str, Any]]", Dict[str, Any]] = {}
+    seen_calls = set()
+    used_tools: List[str] = []
+    skipped: List[Dict[str, Any]] = []
+    clean_results: List[Dict[str, Any]] = []
+    cut_off: List[Dict[str, Any]] = []
+    # Connector errors and non-OK upstream answers: the step's result may be incomplete
+    failures: List[Dict[str, Any]] = []
+
+    def record_failures(task: "asyncio.Task[Dict[str, Any]]", holder: Dict[str, Any]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            exc = task.exception()
+            failures.append({"tool": holder["tool"], "id": holder["id"], "source": holder["tool"], "error": str(exc) or type(exc).__name__})
+        for err in holder.get("errors", []):
+            failures.append({"tool": holder["tool"], "id": holder["id"], **err})
+
+    def launch_ready() -> None:
+        for node in list(waiting):
+            if not all(f in known for f in node.get("consumes", [])):
+                continue
+            waiting.remove(node)
+            node_query = nq.model_copy(update={f: known[f] for f in node.get("consumes", []) if f in NormalizedQuery.model_fields})
+            spec = get_spec(node["tool"])
+            if spec is None or not spec.accepts(node_query):
+                continue
+            # Follow-ups are optional: do not start one that cannot finish in the remaining budget
+            if node["id"] != node["tool"] and job_budget.time_left() * 1000 < spec.expected_latency_ms:
+                skipped.append({"id": node["id"], "reason": "budget", "missing": []})
                 continue
-            if s["tool"] == "github":
-                tasks.append(tool.scrape(nq))
-                used_tools.append("github")
-            elif s["tool"] == "pdl":
-                tasks.append(tool.fetch(nq))
-                used_tools.append("pdl")
-            elif s["tool"] == "pdl_search":
-                tasks.append(tool.fetch(nq))
-                used_tools.append("pdl_search")
-            elif s["tool"] == "duckduckgo":
-                tasks.append(tool.fetch(nq))
-                used_tools.append("duckduckgo")
-            elif s["tool"] == "pdl_identify":
-                tasks.append(tool.fetch(nq))
-                used_tools.append("pdl_identify")
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Filter exceptions and collect dict results
-        clean_results = []
-        for r in results:
-            if isinstance(r, Exception):
+            call_key = (node["tool"], tuple(sorted(node_query.model_dump(exclude_none=True).items())))
+            connector = get_connector(node["tool"])
+            if connector is None or call_key in seen_calls:
                 continue
+            seen_calls.add(call_key)
+            holder: Dict[str, Any] = {"tool": node["tool"], "id": node["id"]}
+            task = asyncio.create_task(_run_step(lambda c=connector, q=node_query: c.invoke(q), node["timeout_ms"] / 1000.0, holder))
+            launched[task] = holder
+            used_tools.append(node["tool"])
+
+    launch_ready()
+    pending = set(launched)
+    while pending:
+        left = job_budget.time_left()
+        if left <= 0:
+            break
+        # Results are consumed as they complete so stream subscribers see each connector's
+        # output and a merged snapshot without waiting for the slowest one
+        done, pending = await asyncio.wait(pending, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+        for t in done:
+            holder = launched[t]
+            r = t.result() if t.exception() is None else None
+            record_failures(t, holder)
+            if holder.get("cut_off"):
+                cut_off.append({"tool": holder["tool"], "id": holder["id"], "reason": holder["cut_off"], "partial": bool(r)})
+            if r:
+                clean_results.append(r)
+                _publish_progress(job_id, holder["tool"], r, clean_results)
+                for field, value in _discover(r).items():
+                    known.setdefault(field, value)
+        if waiting and job_budget.time_left() > 0:
+            before = set(launched)
+            launch_ready()
+            pending |= set(launched) - before
+    for t in pending:
+        t.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for t in pending:
+        holder = launched[t]
+        r = holder.get("result")
+        record_failures(t, holder)
+        cut_off.append({"tool": holder["tool"], "id": holder["id"], "reason": "job_deadline", "partial": bool(r)})
+        if r:
             clean_results.append(r)
+    for node in waiting:
+        missing = [f for f in node.get("consumes", []) if f not in known]
+        skipped.append({"id": node["id"], "reason": "missing_input" if missing else "budget", "missing": missing})
+
+    aggregated = merge_results(clean_results)
+    final = judge_result({
+        "normalized_query": normalized_query,
+        **aggregated,
+    })
+
+    # Minimal deterministic result stub
+    profile: Dict[str, Any] = {
+        "names": [payload.name] if payload.name else [],
+        "emails": [payload.email] if payload.email else [],
+        "phones": [payload.phone] if payload.phone else [],
+        "usernames": [payload.username] if payload.username else [],
+        "locations": [payload.location] if payload.location else [],
+        "employment": [],
+        "education": [],
+        "links": [],
+        "bios": [],
+        "skills": [],
+        "organizations": [],
+        "websites": [],
+        "evidences": [],
+        "overall_confidence": 0.2,
+    }
 
-        aggregated = merge_results(clean_results)
-        final = judge_result({
-            "normalized_query": normalized_query,
-            **aggregated,
-        })
-
-        # Minimal deterministic result stub
-        profile: Dict[str, Any] = {
-            "names": [payload.name] if payload.name else [],
-            "emails": [payload.email] if payload.email else [],
-            "phones": [payload.phone] if payload.phone else [],
-            "usernames": [payload.username] if payload.username else [],
-            "locations": [payload.location] if payload.location else [],
-            "employment": [],
-            "education": [],
-            "links": [],
-            "bios": [],
-            "skills": [],
-            "organizations": [],
-            "websites": [],
-            "evidences": [],
-            "overall_confidence": 0.2,
-        }
-
-        # Collect candidates count before constructing metrics
-        candidates = final.get("candidates", [])
-
-        result = {
-            **final,
-            "metrics": {
-                "latency_ms": int((time.perf_counter() - start) * 1000),
-                "tools_used": used_tools,
-                "api_cost_usd": 0.0,
-                "diagnostics": {
-                    "steps": [s.get("tool") for s in steps],
-                    "llm_used": True,
-                    "num_candidates": len(candidates),
+    # Collect candidates count before constructing metrics
+    candidates = final.get("candidates", [])
+
+    result = {
+        **final,
+        "metrics": {
+            "latency_ms": int((time.perf_counter() - start) * 1000),
+            "tools_used": used_tools,
+            "api_cost_usd": round(sum(connector_cost(t) for t in used_tools), 4),
+            "diagnostics": {
+                "steps": [s.get("tool") for s in steps],
+                "dag": {
+                    "ran": [h["id"] for h in launched.values()],
+                    "skipped": skipped,
+                    "discovered": {k: v for k, v in known.items() if k not in normalized_query or not normalized_query[k]},
                 },
+                "llm_used": extract_diag.get("llm") in ("called", "cache_hit"),
+                "llm_extraction": extract_diag,
+                "num_candidates": len(candidates),
+                "circuit_breakers": breaker_stats(),
+                "cut_off": cut_off,
+                "step_failures": failures,
+                "connector_stats": {h["id"]: h["stats"] for h in launched.values() if h.get("stats")},
+                "budget": job_budget.snapshot(),
+                "result_cache": cache_diag,
             },
-        }
-
-        # Simple ambiguity heuristic: multiple candidates with close scores and low overall confidence
-        candidates = result.get("candidates", [])
-        overall = result.get("profile", {}).get("overall_confidence", 0.0)
-        needs_disamb = False
-        questions = None
-        if len(candidates) == 0:
+        },
+    }
+
+    # Simple ambiguity heuristic: multiple candidates with close scores and low overall confidence
+    candidates = result.get("candidates", [])
+    overall = result.get("profile", {}).get("overall_confidence", 0.0)
+    needs_disamb = False
+    questions = None
+    if len(candidates) == 0:
+        needs_disamb = True
+        questions = [
+            "Which company did you most recently work at?",
+            "Which school did you attend most recently?",
+            "Do you use a public username/handle we can match?",
+        ]
+    elif len(candidates) == 1 and overall < 0.7:
+        needs_disamb = True
+        questions = [
+            "Does this look like you (name/location)? If yes, confirm your recent employer.",
+            "Any other city you’re associated with?",
+        ]
+    elif len(candidates) >= 2 and overall < 0.6:
+        top = sorted((candidates), key=lambda c: c.get("score", 0), reverse=True)
+        if len(top) >= 2 and abs(top[0].get("score", 0) - top[1].get("score", 0)) < 0.15:
             needs_disamb = True
             questions = [
+                "Which of these is most correct: your current city or last known city?",
                 "Which company did you most recently work at?",
-                "Which school did you attend most recently?",
-                "Do you use a public username/handle we can match?",
             ]
-        elif len(candidates) == 1 and overall < 0.7:
-            needs_disamb = True
-            questions = [
-                "Does this look like you (name/location)? If yes, confirm your recent employer.",
-                "Any other city you’re associated with?",
-            ]
-        elif len(candidates) >= 2 and overall < 0.6:
-            top = sorted((candidates), key=lambda c: c.get("score", 0), reverse=True)
-            if len(top) >= 2 and abs(top[0].get("score", 0) - top[1].get("score", 0)) < 0.15:
-                needs_disamb = True
-                questions = [
-                    "Which of these is most correct: your current city or last known city?",
-                    "Which company did you most recently work at?",
-                ]
-
-        if needs_disamb:
-            logger.info({"event": "job_needs_disambiguation", "job_id": job_id})
-            update_job(job_id, status=JobStatus.needs_disambiguation, result=result, error=None, questions=questions)
-        else:
-            logger.info({"event": "job_completed", "job_id": job_id, "latency_ms": result["metrics"]["latency_ms"]})
-            update_job(job_id, status=JobStatus.completed, result=result, error=None)
-    except Exception as exc:  # pragma: no cover - defensive
-        logger.exception({"event": "job_failed", "job_id": job_id, "error": str(exc)})
-        update_job(job_id, status=JobStatus.failed, error=str(exc))
 
+    status = JobStatus.needs_disambiguation if needs_disamb else JobStatus.completed
+    # Results cut short by a deadline or missing a failed source are not representative;
+    # caching them would serve an outage for the whole TTL
+    if cache_key is not None and not cut_off and not failures:
+        cache = get_result_cache()
+        await cache.set(cache_key, {"status": status.value, "result": jsonable_encoder(result), "questions": questions})
+        cache_diag.update(cache.snapshot())
+    await _finish(job_id, status, result, questions)
@@ -11,6 +11,8 @@ class NormalizedQuery(BaseModel):
     username: Optional[str] = None
     location: Optional[str] = None
     context_text: Optional[str] = None
+    # Discovered mid-job (e.g. a LinkedIn URL) and fed to follow-up steps
+    profile_url: Optional[str] = None
 
 
 class SearchInput(BaseModel):
@@ -10,3 +10,7 @@ class BaseScraper(ABC):
     async def scrape(self, query: NormalizedQuery) -> Dict[str, Any]:
         raise NotImplementedError
 
+    async def invoke(self, query: NormalizedQuery) -> Dict[str, Any]:
+        """Uniform entry point used by the orchestrator."""
+        return await self.scrape(query)
+
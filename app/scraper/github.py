@@ -1,10 +1,18 @@
 from typing import Dict, Any
-from ..core.http import http_get
+from ..core.http import http_get, register_cache_policy, CachePolicy
+from ..core.config import settings
+from ..core.deadline import report_error
 from ..schemas.search import NormalizedQuery
 from ..schemas.profile import EvidenceItem, IdentityCandidate, Provenance
 from ..schemas.common import SourceMethod
 from .base import BaseScraper
 
+# Unknown usernames 404; cache that briefly instead of re-asking GitHub every job
+register_cache_policy(
+    "https://api.github.com/users/",
+    CachePolicy(negative_ttl_s=settings.http_cache_negative_ttl_s, stale_while_revalidate_s=settings.http_cache_swr_s),
+)
+
 
 class GitHubScraper(BaseScraper):
     name = "github"
@@ -31,8 +39,9 @@ class GitHubScraper(BaseScraper):
                 return {"evidences": evidences, "candidates": candidates}
             resp.raise_for_status()
             data = resp.json()
-        except Exception:
+        except Exception as exc:
             # On error, return minimal candidate
+            report_error(self.name, str(exc) or type(exc).__name__)
             prov = Provenance(source_name=self.name, method=SourceMethod.scrape, url=None)
             candidates.append(
                 IdentityCandidate(
@@ -0,0 +1,79 @@
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, AsyncIterator
+
+
+class JobEventStream:
+    """Append-only event log for one job; subscribers replay it from the start."""
+
+    def __init__(self) -> None:
+        self.events: List[Dict[str, Any]] = []
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        if self.closed:
+            return
+        self.events.append(event)
+        self._wake()
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def _wake(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self, heartbeat_s: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Yield events as they arrive; yields None every ``heartbeat_s`` of silence."""
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.closed:
+                return
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=heartbeat_s)
+            except asyncio.TimeoutError:
+                yield None
+
+
+_STREAMS: "OrderedDict[str, JobEventStream]" = OrderedDict()
+_MAX_STREAMS = 1000
+
+
+def open_stream(job_id: str) -> JobEventStream:
+    stream = _STREAMS.get(job_id)
+    if stream is None:
+        stream = JobEventStream()
+        _STREAMS[job_id] = stream
+        # Forget the oldest finished streams first
+        if len(_STREAMS) > _MAX_STREAMS:
+            for old_id in [k for k, v in _STREAMS.items() if v.closed][: len(_STREAMS) - _MAX_STREAMS]:
+                del _STREAMS[old_id]
+    return stream
+
+
+def get_stream(job_id: str) -> Optional[JobEventStream]:
+    return _STREAMS.get(job_id)
+
+
+def publish_event(job_id: str, event: str, data: Dict[str, Any]) -> None:
+    stream = _STREAMS.get(job_id)
+    if stream is not None:
+        stream.publish({"event": event, "data": data})
+
+
+def discard_stream(job_id: str) -> None:
+    stream = _STREAMS.pop(job_id, None)
+    if stream is not None:
+        stream.close()
+
+
+def close_stream(job_id: str) -> None:
+    stream = _STREAMS.get(job_id)
+    if stream is not None:
+        stream.close()
@@ -1,32 +1,481 @@
-from typing import Dict, Optional, Any
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Any, List
+import orjson
 from pydantic import BaseModel
 from ..schemas.search import SearchStatusResponse
 from ..schemas.common import JobStatus
 from ..core.config import settings
 
+# Fields a job record carries; updates patch any subset of them
+JOB_FIELDS = ("status", "result", "error", "questions")
+# Statuses a job does not leave on its own
+TERMINAL_STATUSES = frozenset({JobStatus.completed, JobStatus.failed, JobStatus.needs_disambiguation})
 
-class InMemoryJob(BaseModel):
+
+class JobRecord(BaseModel):
     job_id: str
     status: JobStatus
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     questions: Optional[list[str]] = None
+    # Bumped on every write; clients see it as the ETag
+    version: int = 0
+
+
+# Kept for callers of the original name
+InMemoryJob = JobRecord
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+def _dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default)
+
+
+def _field_value(field: str, value: Any) -> Any:
+    return value.value if field == "status" and isinstance(value, JobStatus) else value
+
+
+class JobStore(ABC):
+    """Job records keyed by id. ``update`` writes only the fields it is given."""
+
+    @abstractmethod
+    def create(self, job_id: str, status: JobStatus, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, job_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def version(self, job_id: str) -> Optional[int]:
+        """Current version without loading the record, or None if unknown."""
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryJobStore(JobStore):
+    """Process-local store with a TTL (from the last write) and a byte budget.
+
+    Records are plain dicts patched in place; sizes are tracked per field so a
+    status change does not re-measure the result. Over budget, the least
+    recently written finished jobs go first. ``get`` does not copy: returned
+    records share their values with the store, so callers write changes back
+    through ``update`` with new objects rather than mutating them.
+    """
+
+    def __init__(self, *, ttl_s: float, max_bytes: int) -> None:
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, Dict[str, int]] = {}
+        self._written_at: Dict[str, float] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"expired": 0, "evicted": 0}
+
+    def create(self, job_id, status, result=None, error=None) -> None:
+        with self._lock:
+            self._drop(job_id)
+            self._jobs[job_id] = {"job_id": job_id, "version": 0}
+            self._sizes[job_id] = {}
+            self._patch(job_id, {"status": status, "result": result, "error": error, "questions": None})
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs and not self._expired(job_id, time.monotonic()):
+                self._patch(job_id, fields)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            if self._expired(job_id, time.monotonic()):
+                self._drop(job_id)
+                self.stats["expired"] += 1
+                return None
+            return JobRecord.model_construct(**record)
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._drop(job_id)
+
+    def version(self, job_id: str) -> Optional[int]:
+        record = self._jobs.get(job_id)
+        if record is None or self._expired(job_id, time.monotonic()):
+            return None
+        return record["version"]
+
+    def _patch(self, job_id: str, fields: Dict[str, Any]) -> None:
+        record, sizes = self._jobs[job_id], self._sizes[job_id]
+        for field, value in fields.items():
+            value = _field_value(field, value)
+            record[field] = value
+            size = len(_dumps(value)) if field == "result" and value is not None else 64
+            self._bytes += size - sizes.get(field, 0)
+            sizes[field] = size
+        record["version"] += 1
+        self._written_at[job_id] = time.monotonic()
+        self._jobs.move_to_end(job_id)
+        self._evict(keep=job_id)
+
+    def _expired(self, job_id: str, now: float) -> bool:
+        return now - self._written_at[job_id] >= self.ttl_s
+
+    def _drop(self, job_id: str) -> None:
+        if self._jobs.pop(job_id, None) is not None:
+            self._bytes -= sum(self._sizes.pop(job_id).values())
+            self._written_at.pop(job_id, None)
+
+    def _evict(self, keep: str) -> None:
+        now = time.monotonic()
+        # Oldest writes sit at the front, so expired records are a prefix
+        while self._jobs:
+            oldest = next(iter(self._jobs))
+            if oldest == keep or not self._expired(oldest, now):
+                break
+            self._drop(oldest)
+            self.stats["expired"] += 1
+        while self._bytes > self.max_bytes and len(self._jobs) > 1:
+            victim = next((j for j, r in self._jobs.items() if j != keep and r.get("status") in TERMINAL_STATUSES), None)
+            if victim is None:
+                victim = next(j for j in self._jobs if j != keep)
+            self._drop(victim)
+            self.stats["evicted"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": "memory", "jobs": len(self._jobs), "bytes": self._bytes, "max_bytes": self.max_bytes, **self.stats}
+
+
+class SQLiteJobStore(JobStore):
+    """Jobs in a WAL-mode SQLite file, shared by processes on the same host."""
+
+    def __init__(self, path: str, *, ttl_s: float) -> None:
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._writes = 0
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(jobs)").fetchall()}
+        if cols and "version" not in cols:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, status TEXT NOT NULL, result BLOB, error TEXT, questions BLOB, "
+            "expires_at REAL NOT NULL, version INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs(expires_at)")
+
+    def create(self, job_id, status, result=None, error=None) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, status, result, error, questions, expires_at, version) VALUES (?, ?, ?, ?, NULL, ?, 1)",
+                (job_id, _field_value("status", status), None if result is None else _dumps(result), error, time.time() + self.ttl_s),
+            )
+            self._maybe_purge()
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        cols = [f for f in fields if f in JOB_FIELDS]
+        values = [self._encode(f, fields[f]) for f in cols]
+        sets = "".join(f"{c} = ?, " for c in cols)
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {sets}version = version + 1, expires_at = ? WHERE job_id = ? AND expires_at > ?",
+                (*values, time.time() + self.ttl_s, job_id, time.time()),
+            )
+            self._maybe_purge()
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, result, error, questions, version FROM jobs WHERE job_id = ? AND expires_at > ?",
+                (job_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        status, result, error, questions, version = row
+        return JobRecord(
+            job_id=job_id,
+            status=status,
+            result=None if result is None else orjson.loads(result),
+            error=error,
+            questions=None if questions is None else orjson.loads(questions),
+            version=version,
+        )
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def version(self, job_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._db.execute("SELECT version FROM jobs WHERE job_id = ? AND expires_at > ?", (job_id, time.time())).fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def _encode(field: str, value: Any) -> Any:
+        if field in ("result", "questions"):
+            return None if value is None else _dumps(value)
+        return _field_value(field, value)
+
+    def _maybe_purge(self) -> None:
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._db.execute("DELETE FROM jobs WHERE expires_at <= ?", (time.time(),))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()
+        return {"backend": "sqlite", "jobs": count}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
 
 
-_JOBS: Dict[str, InMemoryJob] = {}
+class RedisJobStore(JobStore):
+    """One hash per job with a TTL refreshed on every write; visible to all workers.
 
+    Uses the synchronous client: each call is a single short round trip, run
+    in the job I/O executor by the module functions below.
+    """
 
-def create_job(job_id: str, status: JobStatus, result=None, error=None) -> None:
-    _JOBS[job_id] = InMemoryJob(job_id=job_id, status=status, result=result, error=error)
+    def __init__(self, client: Any, *, ttl_s: float, prefix: str = "pds:job") -> None:
+        self.client = client
+        self.ttl_s = int(ttl_s)
+        self.prefix = prefix
 
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
 
-def update_job(job_id: str, **kwargs) -> None:
-    if job_id in _JOBS:
-        _JOBS[job_id] = _JOBS[job_id].model_copy(update=kwargs)
+    def create(self, job_id, status, result=None, error=None) -> None:
+        mapping = {"status": _field_value("status", status), "version": 1}
+        if result is not None:
+            mapping["result"] = _dumps(result)
+        if error is not None:
+            mapping["error"] = error
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self._key(job_id))
+        pipe.hset(self._key(job_id), mapping=mapping)
+        pipe.expire(self._key(job_id), self.ttl_s)
+        pipe.execute()
 
+    def update(self, job_id: str, **fields: Any) -> None:
+        key = self._key(job_id)
+        mapping: Dict[str, Any] = {}
+        cleared: List[str] = []
+        for field in JOB_FIELDS:
+            if field not in fields:
+                continue
+            value = _field_value(field, fields[field])
+            if value is None:
+                cleared.append(field)
+            else:
+                mapping[field] = _dumps(value) if field in ("result", "questions") else value
+        # Only patch jobs that still exist; an expired job stays gone
+        if not self.client.exists(key):
+            return
+        pipe = self.client.pipeline(transaction=True)
+        if mapping:
+            pipe.hset(key, mapping=mapping)
+        if cleared:
+            pipe.hdel(key, *cleared)
+        pipe.hincrby(key, "version", 1)
+        pipe.expire(key, self.ttl_s)
+        pipe.execute()
 
-def get_job(job_id: str) -> Optional[SearchStatusResponse]:
-    job = _JOBS.get(job_id)
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        raw = self.client.hgetall(self._key(job_id))
+        if not raw:
+            return None
+        data = {(k.decode() if isinstance(k, bytes) else k): v for k, v in raw.items()}
+
+        def text(v: Any) -> Optional[str]:
+            return v.decode() if isinstance(v, bytes) else v
+
+        return JobRecord(
+            job_id=job_id,
+            status=text(data["status"]),
+            result=orjson.loads(data["result"]) if "result" in data else None,
+            error=text(data.get("error")),
+            questions=orjson.loads(data["questions"]) if "questions" in data else None,
+            version=int(data.get("version", 0)),
+        )
+
+    def delete(self, job_id: str) -> None:
+        self.client.delete(self._key(job_id))
+
+    def version(self, job_id: str) -> Optional[int]:
+        value = self.client.hget(self._key(job_id), "version")
+        return None if value is None else int(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+    def close(self) -> None:
+        self.client.close()
+
+
+_STORE: Optional[JobStore] = None
+
+
+def get_job_store() -> JobStore:
+    global _STORE
+    if _STORE is None:
+        if settings.job_store == "sqlite":
+            _STORE = SQLiteJobStore(settings.job_store_path, ttl_s=settings.job_ttl_s)
+        elif settings.job_store == "redis":
+            from redis import Redis
+
+            _STORE = RedisJobStore(Redis.from_url(settings.redis_url), ttl_s=settings.job_ttl_s)
+        else:
+            _STORE = MemoryJobStore(ttl_s=settings.job_ttl_s, max_bytes=settings.job_store_max_bytes)
+    return _STORE
+
+
+def require_shared_job_store() -> None:
+    """Refuse to run the Redis queue on a job store that other processes cannot see.
+
+    With a per-process store the worker's updates never reach the API, so
+    queued jobs would read "queued" forever.
+    """
+    if settings.use_redis_queue and settings.job_store != "redis":
+        raise RuntimeError(f"use_redis_queue requires job_store='redis' (got {settings.job_store!r})")
+
+
+def close_job_store() -> None:
+    global _STORE, _IO
+    store, _STORE = _STORE, None
+    executor, _IO = _IO, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    if store is not None:
+        store.close()
+
+
+# SQLite and Redis calls block, so the module functions run them here rather than
+# on the event loop; the memory store is called inline
+_IO: Optional[ThreadPoolExecutor] = None
+
+
+async def _call(method: str, *args: Any, **kwargs: Any) -> Any:
+    global _IO
+    store = get_job_store()
+    fn = getattr(store, method)
+    if isinstance(store, MemoryJobStore):
+        return fn(*args, **kwargs)
+    if _IO is None:
+        _IO = ThreadPoolExecutor(max_workers=settings.job_store_io_threads, thread_name_prefix="job-io")
+    return await asyncio.get_running_loop().run_in_executor(_IO, functools.partial(fn, *args, **kwargs))
+
+
+async def job_store_snapshot() -> Dict[str, Any]:
+    return await _call("snapshot")
+
+
+# In-process change notification for long-polling readers: job id -> (event, waiters)
+_CHANGED: Dict[str, Any] = {}
+
+
+def _notify(job_id: str) -> None:
+    entry = _CHANGED.pop(job_id, None)
+    if entry is not None:
+        entry[0].set()
+
+
+async def wait_for_change(job_id: str, version: Optional[int], timeout_s: float) -> Optional[int]:
+    """Wait up to ``timeout_s`` for the job's version to differ from ``version``.
+
+    Writes in this process wake waiters immediately; shared stores are also
+    re-checked every ``job_wait_poll_s`` to see writes made by other workers.
+    Returns the version seen last.
+    """
+    store = get_job_store()
+    poll = None if isinstance(store, MemoryJobStore) else settings.job_wait_poll_s
+    deadline = time.monotonic() + timeout_s
+    while True:
+        current = await job_version(job_id)
+        left = deadline - time.monotonic()
+        if current != version or current is None or left <= 0:
+            return current
+        entry = _CHANGED.get(job_id)
+        if entry is None:
+            entry = _CHANGED[job_id] = [asyncio.Event(), 0]
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].wait(), timeout=min(left, poll) if poll else left)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and _CHANGED.get(job_id) is entry:
+                del _CHANGED[job_id]
+
+
+async def wait_for_terminal(job_id: str) -> Optional[JobRecord]:
+    """Block until the job reaches a terminal status; None if it disappears."""
+    while True:
+        job = await get_job_record(job_id)
+        if job is None or job.status in TERMINAL_STATUSES:
+            return job
+        await wait_for_change(job_id, job.version, settings.job_wait_max_s)
+
+
+async def create_job(job_id: str, status: JobStatus, result=None, error=None) -> None:
+    await _call("create", job_id, status, result=result, error=error)
+    _notify(job_id)
+
+
+async def update_job(job_id: str, **kwargs) -> None:
+    await _call("update", job_id, **kwargs)
+    _notify(job_id)
+
+
+async def delete_job(job_id: str) -> None:
+    await _call("delete", job_id)
+    _notify(job_id)
+
+
+async def get_job_record(job_id: str) -> Optional[JobRecord]:
+    return await _call("get", job_id)
+
+
+async def job_version(job_id: str) -> Optional[int]:
+    return await _call("version", job_id)
+
+
+async def get_job(job_id: str) -> Optional[SearchStatusResponse]:
+    job = await get_job_record(job_id)
     if not job:
         return None
     return SearchStatusResponse(
@@ -36,4 +485,3 @@ def get_job(job_id: str) -> Optional[SearchStatusResponse]:
         error=job.error,
         questions=job.questions,
     )
-
@@ -1,18 +1,146 @@
-from typing import Callable, Any
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Callable, Any, Deque, Dict, Literal, Optional, Tuple
 from ..core.config import settings
+from ..core.logging import logger
 
+Lane = Literal["interactive", "bulk"]
+# Workers drain lanes in this order
+LANES: Tuple[Lane, ...] = ("interactive", "bulk")
 
-def enqueue_background(coro_func: Callable[..., Any], *args, **kwargs) -> None:
+
+class QueueFull(Exception):
+    """The lane is at capacity; the caller should retry after ``retry_after_s``."""
+
+    def __init__(self, lane: str, retry_after_s: int) -> None:
+        super().__init__(f"{lane} job queue is full; retry in {retry_after_s}s")
+        self.lane = lane
+        self.retry_after_s = retry_after_s
+
+
+class JobScheduler:
+    """Fixed pool of worker tasks draining bounded, prioritized lanes.
+
+    A worker always takes the oldest interactive job first and only picks up
+    bulk work when the interactive lane is empty, so a large batch cannot
+    delay a user waiting on a single search. ``submit`` never blocks: a full
+    lane raises ``QueueFull`` with a Retry-After estimate instead.
+    """
+
+    def __init__(self, workers: int, capacity: Dict[str, int]) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.capacity = capacity
+        self._lanes: Dict[str, Deque[Tuple[float, Callable[..., Any], tuple, dict]]] = {lane: deque() for lane in LANES}
+        self._ready = asyncio.Semaphore(0)
+        self._durations: Deque[float] = deque(maxlen=200)
+        self._waits: Dict[str, Deque[float]] = {lane: deque(maxlen=1000) for lane in LANES}
+        self.running = 0
+        self.stats: Dict[str, int] = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0}
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, workers))]
+
+    def submit(self, lane: str, coro_func: Callable[..., Any], *args, **kwargs) -> None:
+        queue = self._lanes[lane]
+        if len(queue) >= self.capacity.get(lane, 0):
+            self.stats["rejected"] += 1
+            raise QueueFull(lane, self.retry_after(lane))
+        queue.append((time.monotonic(), coro_func, args, kwargs))
+        self.stats["submitted"] += 1
+        self._ready.release()
+
+    def retry_after(self, lane: str) -> int:
+        """Seconds until a slot in ``lane`` is likely to free up."""
+        avg = sum(self._durations) / len(self._durations) if self._durations else 1.0
+        ahead = sum(len(self._lanes[l]) for l in LANES[: LANES.index(lane) + 1])
+        return max(1, math.ceil(ahead / len(self._workers) * avg))
+
+    async def _worker(self) -> None:
+        while True:
+            await self._ready.acquire()
+            lane = next(l for l in LANES if self._lanes[l])
+            enqueued_at, coro_func, args, kwargs = self._lanes[lane].popleft()
+            started = time.monotonic()
+            self._waits[lane].append(started - enqueued_at)
+            self.running += 1
+            try:
+                await coro_func(*args, **kwargs)
+                self.stats["completed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.stats["failed"] += 1
+                logger.exception({"event": "job_worker_error", "error": str(exc)})
+            finally:
+                self.running -= 1
+                self._durations.append(time.monotonic() - started)
+
+    async def close(self) -> None:
+        for lane in self._lanes.values():
+            lane.clear()
+        for w in self._workers:
+            w.cancel()
+        if self._loop is not asyncio.get_running_loop():
+            return
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lanes = {}
+        for lane in LANES:
+            waits = sorted(self._waits[lane])
+            lanes[lane] = {
+                "depth": len(self._lanes[lane]),
+                "capacity": self.capacity.get(lane, 0),
+                "wait_p50_ms": int(waits[len(waits) // 2] * 1000) if waits else 0,
+                "wait_p95_ms": int(waits[min(len(waits) - 1, int(0.95 * len(waits)))] * 1000) if waits else 0,
+                "wait_max_ms": int(waits[-1] * 1000) if waits else 0,
+            }
+        return {"workers": len(self._workers), "running": self.running, "lanes": lanes, **self.stats}
+
+
+_SCHEDULER: Optional[JobScheduler] = None
+
+
+def get_scheduler() -> JobScheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None or _SCHEDULER._loop is not asyncio.get_running_loop():
+        # Worker tasks belong to one event loop (tests run several in turn)
+        _SCHEDULER = JobScheduler(
+            settings.job_workers,
+            {"interactive": settings.job_queue_max_interactive, "bulk": settings.job_queue_max_bulk},
+        )
+    return _SCHEDULER
+
+
+async def enqueue_background(coro_func: Callable[..., Any], *args, lane: Lane = "interactive", **kwargs) -> None:
     """Abstraction for background job enqueue.
 
-    For now, runs in-process via asyncio.create_task (called by orchestrator).
-    If settings.use_redis_queue is True, this will enqueue to Redis RQ (stub).
+    Jobs run on the in-process worker pool, or, if settings.use_redis_queue
+    is True, are pushed to Redis for separate worker processes
+    (``python -m app.worker``). Raises ``QueueFull`` when ``lane`` has no room.
     """
     if settings.use_redis_queue:
-        # Placeholder for RQ integration; we keep in-process for MVP
-        import asyncio
-        asyncio.create_task(coro_func(*args, **kwargs))
+        from .redis_queue import get_redis_queue
+
+        await get_redis_queue().submit(lane, coro_func, *args, **kwargs)
     else:
-        import asyncio
-        asyncio.create_task(coro_func(*args, **kwargs))
+        get_scheduler().submit(lane, coro_func, *args, **kwargs)
+
+
+async def queue_stats() -> Dict[str, Any]:
+    if settings.use_redis_queue:
+        from .redis_queue import get_redis_queue
+
+        return await get_redis_queue().stats()
+    return _SCHEDULER.snapshot() if _SCHEDULER is not None else {}
+
+
+async def close_job_queue() -> None:
+    global _SCHEDULER
+    scheduler, _SCHEDULER = _SCHEDULER, None
+    if scheduler is not None:
+        await scheduler.close()
+    if settings.use_redis_queue:
+        from .redis_queue import close_redis_queue
 
+        await close_redis_queue()
@@ -0,0 +1,292 @@
+import asyncio
+import math
+import pickle
+import time
+import uuid
+from typing import Callable, Any, Dict, Optional, Set, Tuple
+from ..core.config import settings
+from ..core.logging import logger
+from .queue import LANES, QueueFull
+
+# Jobs are pickled (function reference plus arguments), as RQ does: the Redis
+# instance must be trusted. Message hashes are addressed by prefix inside the
+# scripts, so the queue assumes a single (non-cluster) Redis.
+
+_SUBMIT = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[1]) then return 0 end
+redis.call('HSET', KEYS[2], 'payload', ARGV[2], 'lane', ARGV[3], 'attempts', 0, 'enqueued_at', ARGV[4])
+redis.call('RPUSH', KEYS[1], ARGV[5])
+return 1
+"""
+
+# KEYS: inflight, lanes in priority order. ARGV: lease deadline, message key prefix
+_CLAIM = """
+for i = 2, #KEYS do
+  local id = redis.call('LPOP', KEYS[i])
+  while id do
+    local key = ARGV[2] .. id
+    if redis.call('EXISTS', key) == 1 then
+      redis.call('ZADD', KEYS[1], ARGV[1], id)
+      local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+      return {id, redis.call('HGET', key, 'payload'), attempts, redis.call('HGET', key, 'enqueued_at')}
+    end
+    id = redis.call('LPOP', KEYS[i])
+  end
+end
+return false
+"""
+
+# KEYS: inflight, dead. ARGV: now, max attempts, message key prefix, lane key prefix
+_REAP = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local requeued, dead = 0, 0
+for _, id in ipairs(ids) do
+  redis.call('ZREM', KEYS[1], id)
+  local key = ARGV[3] .. id
+  if redis.call('EXISTS', key) == 1 then
+    if tonumber(redis.call('HGET', key, 'attempts')) >= tonumber(ARGV[2]) then
+      redis.call('RPUSH', KEYS[2], id)
+      dead = dead + 1
+    else
+      redis.call('LPUSH', ARGV[4] .. redis.call('HGET', key, 'lane'), id)
+      requeued = requeued + 1
+    end
+  end
+end
+return {requeued, dead}
+"""
+
+# KEYS: inflight. ARGV: id, message key prefix, lane key prefix
+_RELEASE = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+  local lane = redis.call('HGET', ARGV[2] .. ARGV[1], 'lane')
+  if lane then redis.call('LPUSH', ARGV[3] .. lane, ARGV[1]) end
+  return 1
+end
+return 0
+"""
+
+
+class ClaimedJob:
+    __slots__ = ("id", "payload", "attempts", "enqueued_at")
+
+    def __init__(self, id: str, payload: bytes, attempts: int, enqueued_at: float) -> None:
+        self.id = id
+        self.payload = payload
+        self.attempts = attempts
+        self.enqueued_at = enqueued_at
+
+
+class RedisJobQueue:
+    """Reliable job queue on Redis lists with leases.
+
+    ``claim`` atomically pops the oldest message (interactive lane first) and
+    leases it until ``now + visibility_s``; the worker extends the lease while
+    the job runs and acknowledges it when done. Leases that expire — the
+    worker crashed or hung — are put back at the front of their lane by
+    ``requeue_expired``, up to ``max_attempts`` deliveries, after which the
+    message moves to the dead list.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        *,
+        prefix: str = "pds:jobs",
+        visibility_s: float = 30.0,
+        max_attempts: int = 3,
+        capacity: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.visibility_s = visibility_s
+        self.max_attempts = max_attempts
+        self.capacity = capacity or {lane: 1000 for lane in LANES}
+        self._inflight = f"{prefix}:inflight"
+        self._dead = f"{prefix}:dead"
+        self._msg = f"{prefix}:msg:"
+        self._lane = f"{prefix}:lane:"
+        self._submit = client.register_script(_SUBMIT)
+        self._claim = client.register_script(_CLAIM)
+        self._reap = client.register_script(_REAP)
+        self._release = client.register_script(_RELEASE)
+
+    async def submit(self, lane: str, coro_func: Callable[..., Any], *args, **kwargs) -> str:
+        msg_id = uuid.uuid4().hex
+        payload = pickle.dumps((coro_func, args, kwargs))
+        ok = await self._submit(
+            keys=[self._lane + lane, self._msg + msg_id],
+            args=[self.capacity.get(lane, 0), payload, lane, time.time(), msg_id],
+        )
+        if not ok:
+            depth = await self.client.llen(self._lane + lane)
+            raise QueueFull(lane, max(1, math.ceil(depth / max(1, settings.job_workers))))
+        return msg_id
+
+    async def claim(self) -> Optional[ClaimedJob]:
+        res = await self._claim(
+            keys=[self._inflight] + [self._lane + lane for lane in LANES],
+            args=[time.time() + self.visibility_s, self._msg],
+        )
+        if not res:
+            return None
+        msg_id, payload, attempts, enqueued_at = res
+        return ClaimedJob(_text(msg_id), payload, int(attempts), float(enqueued_at))
+
+    async def extend(self, msg_id: str) -> bool:
+        """Push the lease out by another ``visibility_s``; False if it was already lost."""
+        changed = await self.client.zadd(self._inflight, {msg_id: time.time() + self.visibility_s}, xx=True, ch=True)
+        return bool(changed)
+
+    async def ack(self, msg_id: str) -> None:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._inflight, msg_id)
+            pipe.delete(self._msg + msg_id)
+            await pipe.execute()
+
+    async def release(self, msg_id: str) -> bool:
+        """Hand a leased message back to the front of its lane (used on drain)."""
+        return bool(await self._release(keys=[self._inflight], args=[msg_id, self._msg, self._lane]))
+
+    async def requeue_expired(self) -> Tuple[int, int]:
+        requeued, dead = await self._reap(
+            keys=[self._inflight, self._dead],
+            args=[time.time(), self.max_attempts, self._msg, self._lane],
+        )
+        if requeued or dead:
+            logger.warning({"event": "job_leases_expired", "requeued": requeued, "dead": dead})
+        return int(requeued), int(dead)
+
+    async def stats(self) -> Dict[str, Any]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for lane in LANES:
+                pipe.llen(self._lane + lane)
+            pipe.zcard(self._inflight)
+            pipe.llen(self._dead)
+            counts = await pipe.execute()
+        return {
+            "backend": "redis",
+            "lanes": {lane: {"depth": counts[i], "capacity": self.capacity.get(lane, 0)} for i, lane in enumerate(LANES)},
+            "inflight": counts[len(LANES)],
+            "dead": counts[len(LANES) + 1],
+        }
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+class QueueWorker:
+    """Runs claimed jobs with bounded concurrency until stopped.
+
+    ``stop`` starts a graceful drain: no new claims, running jobs get
+    ``drain_timeout_s`` to finish, and anything still running after that is
+    cancelled and released back to the queue for another worker.
+    """
+
+    def __init__(self, queue: RedisJobQueue, *, concurrency: int = 8, drain_timeout_s: float = 30.0, poll_s: float = 0.2) -> None:
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.drain_timeout_s = drain_timeout_s
+        self.poll_s = poll_s
+        self._stopping = asyncio.Event()
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self.stats: Dict[str, int] = {"claimed": 0, "completed": 0, "failed": 0, "released": 0, "lost_leases": 0}
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        slots = asyncio.Semaphore(self.concurrency)
+        reaper = asyncio.create_task(self._reap_loop())
+        try:
+            while not self._stopping.is_set():
+                await slots.acquire()
+                claimed = None if self._stopping.is_set() else await self.queue.claim()
+                if claimed is None:
+                    slots.release()
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_s)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self.stats["claimed"] += 1
+                task = asyncio.create_task(self._execute(claimed))
+                self._tasks.add(task)
+                task.add_done_callback(lambda t: (self._tasks.discard(t), slots.release()))
+        finally:
+            reaper.cancel()
+            await self._drain()
+
+    async def _drain(self) -> None:
+        if not self._tasks:
+            return
+        logger.info({"event": "worker_draining", "running": len(self._tasks)})
+        _, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout_s)
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _execute(self, job: ClaimedJob) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            coro_func, args, kwargs = pickle.loads(job.payload)
+            logger.info({"event": "job_claimed", "msg_id": job.id, "attempt": job.attempts, "waited_s": round(time.time() - job.enqueued_at, 3)})
+            await coro_func(*args, **kwargs)
+            self.stats["completed"] += 1
+        except asyncio.CancelledError:
+            # Drain timed out: give the job back instead of waiting for the lease to expire
+            await asyncio.shield(self.queue.release(job.id))
+            self.stats["released"] += 1
+            raise
+        except Exception as exc:
+            # The job recorded its own failure; retrying is reserved for lost workers
+            self.stats["failed"] += 1
+            logger.exception({"event": "job_worker_error", "msg_id": job.id, "error": str(exc)})
+        finally:
+            heartbeat.cancel()
+        await self.queue.ack(job.id)
+
+    async def _heartbeat(self, msg_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.queue.visibility_s / 3)
+            if not await self.queue.extend(msg_id):
+                self.stats["lost_leases"] += 1
+                logger.warning({"event": "job_lease_lost", "msg_id": msg_id})
+                return
+
+    async def _reap_loop(self) -> None:
+        while True:
+            try:
+                await self.queue.requeue_expired()
+            except Exception as exc:
+                logger.warning({"event": "job_reaper_error", "error": str(exc)})
+            await asyncio.sleep(self.queue.visibility_s / 2)
+
+
+_QUEUE: Optional[RedisJobQueue] = None
+
+
+def get_redis_queue() -> RedisJobQueue:
+    global _QUEUE
+    loop = asyncio.get_running_loop()
+    if _QUEUE is None or getattr(_QUEUE, "_loop", None) is not loop:
+        # redis.asyncio connections are bound to the loop that opened them
+        from redis.asyncio import Redis
+
+        _QUEUE = RedisJobQueue(
+            Redis.from_url(settings.redis_url),
+            prefix=settings.redis_queue_prefix,
+            visibility_s=settings.redis_queue_visibility_s,
+            max_attempts=settings.redis_queue_max_attempts,
+            capacity={"interactive": settings.job_queue_max_interactive, "bulk": settings.job_queue_max_bulk},
+        )
+        _QUEUE._loop = loop
+    return _QUEUE
+
+
+async def close_redis_queue() -> None:
+    global _QUEUE
+    queue, _QUEUE = _QUEUE, None
+    if queue is not None and getattr(queue, "_loop", None) is asyncio.get_running_loop():
+        await queue.client.aclose()
@@ -0,0 +1,50 @@
+"""Job worker process for ``settings.use_redis_queue``.
+
+Run one or more alongside the API (``python -m app.worker``); each claims
+search jobs from Redis and runs them with ``settings.job_workers``
+concurrency. SIGTERM/SIGINT drain in-flight jobs before exiting.
+"""
+import argparse
+import asyncio
+import signal
+from .core.config import settings
+from .core.logging import setup_logging, logger
+from .core.http import open_http_clients, close_http_clients
+from .core.llm import close_llm_client
+from .connectors.registry import close_connectors
+from .store.jobs import close_job_store, require_shared_job_store
+from .store.redis_queue import QueueWorker, get_redis_queue, close_redis_queue
+
+
+async def run_worker(concurrency: int) -> None:
+    require_shared_job_store()
+    await open_http_clients()
+    worker = QueueWorker(get_redis_queue(), concurrency=concurrency, drain_timeout_s=settings.job_drain_timeout_s)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:  # Windows
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(worker.stop))
+    logger.info({"event": "worker_started", "concurrency": concurrency})
+    try:
+        await worker.run()
+    finally:
+        logger.info({"event": "worker_stopped", **worker.stats})
+        await close_redis_queue()
+        await close_connectors()
+        await close_http_clients()
+        await close_llm_client()
+        close_job_store()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run search jobs from the Redis queue")
+    parser.add_argument("--concurrency", type=int, default=settings.job_workers)
+    args = parser.parse_args()
+    setup_logging("INFO")
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Per-record cost of turning PDL person dicts into IdentityCandidates.
+
+Compares the per-connector isinstance parsing plus a validated IdentityCandidate
+(what pdl_search.py did before the shared decoder) with decode_person plus
+build_candidate. Run from the directory that contains ``backend``:
+
+    python -m backend.scripts.bench_pdl_decode [records] [rounds]
+"""
+import sys
+import timeit
+from typing import Any, Dict, List
+from backend.app.connectors.pdl_decode import _email_domain, build_candidate, decode_people, valid_email, valid_url
+from backend.app.schemas.common import SourceMethod
+from backend.app.schemas.profile import EvidenceItem, IdentityCandidate, Provenance
+
+PROV = Provenance(source_name="bench", method=SourceMethod.api, url=None)
+
+
+def make_records(n: int) -> List[Dict[str, Any]]:
+    # A realistic mix: repeated employers/domains, a few emails and links per person
+    return [
+        {
+            "full_name": f"person {i}",
+            "first_name": "person",
+            "last_name": str(i),
+            "emails": [{"address": f"person{i}@example.com", "type": "personal"}, {"address": f"p{i}@work{i % 7}.com"}],
+            "phone_numbers": [f"+1 555 01{i % 100:02d}"],
+            "location_general": {"display": "paris, ile-de-france, france"},
+            "location_name": "paris, ile-de-france, france",
+            "links": [
+                {"network": "linkedin", "url": f"https://linkedin.com/in/person{i}"},
+                {"network": "github", "url": f"https://github.com/person{i}"},
+            ],
+            "employment": [{"title": "engineer", "name": f"company {i % 13}", "start_date": "2019-01"} for _ in range(3)],
+            "education": [{"school": f"school {i % 5}", "degree": "bsc", "start_date": "2010"}],
+            "skills": ["python", "sql"],
+            "industry": "software",
+        }
+        for i in range(n)
+    ]
+
+
+def legacy(docs: List[Any]) -> List[IdentityCandidate]:
+    candidates = []
+    for doc in docs:
+        if not isinstance(doc, dict):
+            continue
+        full_name = doc.get("full_name")
+        emails = []
+        if isinstance(doc.get("emails"), list):
+            emails = [e.get("address") if isinstance(e, dict) else e for e in doc["emails"] if e]
+            emails = [e for e in emails if isinstance(e, str)]
+        phones = []
+        if isinstance(doc.get("phone_numbers"), list):
+            phones = [p.get("number") if isinstance(p, dict) else p for p in doc["phone_numbers"] if p]
+            phones = [p for p in phones if isinstance(p, str)]
+        location = None
+        if isinstance(doc.get("location_general"), dict):
+            location = doc["location_general"].get("display")
+        links = []
+        if isinstance(doc.get("links"), list):
+            for l in doc["links"]:
+                if isinstance(l, dict) and isinstance(l.get("url"), str):
+                    links.append(l["url"])
+        candidates.append(IdentityCandidate(
+            display_name=full_name, emails=emails, phones=phones, usernames=[],
+            locations=[location] if location else [], links=links, score=0.4,
+            top_evidence=[EvidenceItem(field="full_name", value=full_name, confidence=0.6, provenance=PROV)] if full_name else [],
+        ))
+    return candidates
+
+
+def decoded(docs: List[Any]) -> List[IdentityCandidate]:
+    return [
+        build_candidate(
+            display_name=rec.full_name, emails=rec.emails, phones=rec.phones, usernames=[],
+            locations=[rec.location] if rec.location else [], links=rec.links, score=0.4,
+            top_evidence=[EvidenceItem(field="full_name", value=rec.full_name, confidence=0.6, provenance=PROV)] if rec.full_name else [],
+        )
+        for rec in decode_people(docs)
+    ]
+
+
+def decoded_cold(docs: List[Any]) -> List[IdentityCandidate]:
+    # No memoized email/URL validations: every record pays for them once
+    valid_email.cache_clear()
+    _email_domain.cache_clear()
+    valid_url.cache_clear()
+    return decoded(docs)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    docs = make_records(n)
+    assert [c.model_dump(mode="json") for c in legacy(docs)] == [c.model_dump(mode="json") for c in decoded(docs)]
+    for name, fn in (("legacy", legacy), ("decoder (cold)", decoded_cold), ("decoder (warm)", decoded)):
+        best = min(timeit.repeat(lambda: fn(docs), number=1, repeat=rounds))
+        print(f"{name:15s} {best / n * 1e6:8.1f} us/record  ({n} records, best of {rounds})")
+
+
+if __name__ == "__main__":
+    main()
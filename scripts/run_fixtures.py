@@ -5,17 +5,18 @@ from backend.app.main import app
 
 
 async def run():
-    async with AsyncClient(app=app, base_url="http://test") as ac:
-        with open("backend/fixtures/personas.jsonl", "r", encoding="utf-8") as f:
-            for line in f:
-                payload = json.loads(line)
-                r = await ac.post("/search/start", json=payload)
-                jid = r.json()["job_id"]
-                await anyio.sleep(0.3)
-                res = await ac.get(f"/search/{jid}")
-                print(json.dumps(res.json(), ensure_ascii=False)[:400] + "...")
+    async with AsyncClient(app=app, base_url="http://test", timeout=None) as ac:
+        with open("backend/fixtures/personas.jsonl", "rb") as f:
+            body = f.read()
+        # One batch for the whole fixture file; results stream back as jobs finish
+        async with ac.stream("POST", "/search/batch", content=body, headers={"Content-Type": "application/x-ndjson"}) as r:
+            batch_id = r.headers["x-batch-id"]
+            async for line in r.aiter_lines():
+                if line:
+                    print(line[:400] + "...")
+        progress = await ac.get(f"/search/batch/{batch_id}")
+        print(json.dumps(progress.json()))
 
 
 if __name__ == "__main__":
     anyio.run(run)
-
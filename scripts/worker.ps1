@@ -1,3 +1,8 @@
-Write-Host "This is a placeholder for a Redis RQ worker."
-Write-Host "For MVP, background jobs run in-process via asyncio tasks."
+param(
+    [int]$Concurrency = 8
+)
 
+# Requires USE_REDIS_QUEUE=true and REDIS_URL for both the API and the workers.
+# Start one per core; SIGINT/Ctrl+C drains in-flight jobs before exiting.
+.\.venv\Scripts\Activate.ps1
+python -m backend.app.worker --concurrency $Concurrency
@@ -0,0 +1,386 @@
+import asyncio
+import gc
+import time
+import json
+import httpx
+from backend.app.core import http
+from backend.app.core.config import settings, Budget
+from backend.app.core.deadline import charge_api_call, job_scope, step_scope
+from backend.app.connectors import attempts, pdl_bulk, search_engine
+from backend.app.connectors.pdl import PeopleDataLabsConnector
+from backend.app.connectors.pdl_decode import build_candidate, decode_person
+from backend.app.schemas.profile import IdentityCandidate
+from backend.app.connectors.pdl_search import PeopleDataLabsSearchConnector
+from backend.app.connectors.search_engine import DuckDuckGoConnector
+from backend.app.store.replay import record
+from backend.app.schemas.search import NormalizedQuery
+
+
+async def _fetch(conn, query):
+	# Connector diagnostics land in the step holder, like partial results
+	with step_scope(30.0) as holder:
+		res = await conn.fetch(query)
+	return res, holder.get("stats", {}).get(conn.name)
+
+
+def _fake_search(q, max_results):
+	if "site:" in q:
+		time.sleep(0.05)
+		site = q.split("site:")[1]
+		return [{"href": f"https://{site}/jane-doe-{i}", "title": "Jane Doe", "body": "Jane Doe, Paris"} for i in range(2)]
+	time.sleep(1.0)
+	return [{"href": "https://example.com/jane", "title": "Jane Doe", "body": "Paris"}]
+
+
+def test_ddg_runs_queries_concurrently_and_stops_early(monkeypatch):
+	monkeypatch.setattr(settings, "ddg_max_concurrency", 8)
+	monkeypatch.setattr(settings, "ddg_early_stop_hits", 3)
+	monkeypatch.setattr(search_engine, "_QUERY_CACHE", None)
+	conn = DuckDuckGoConnector()
+	monkeypatch.setattr(conn, "_search", _fake_search)
+
+	async def run():
+		t0 = time.perf_counter()
+		res, stats = await _fetch(conn, NormalizedQuery(full_name="Jane Doe", location="Paris"))
+		await conn.aclose()
+		return res, stats, time.perf_counter() - t0
+
+	res, stats, elapsed = asyncio.run(run())
+	assert res["candidates"] and elapsed < 0.9
+	assert stats["early_stop"] == "strict_hits"
+	tiers = {q["tier"]: q["status"] for q in stats["per_query"]}
+	assert tiers["strict"] == "ok" and tiers["relaxed"] == "cancelled"
+	assert all("latency_ms" in q for q in stats["per_query"]) and stats["cancelled"] >= 1
+
+
+def test_ddg_query_timeout_excludes_wait_for_a_thread(monkeypatch):
+	def slow_search(q, max_results):
+		time.sleep(0.2)
+		return []
+
+	monkeypatch.setattr(settings, "ddg_max_concurrency", 8)
+	monkeypatch.setattr(settings, "ddg_thread_pool_size", 2)
+	monkeypatch.setattr(settings, "ddg_query_timeout_s", 0.5)
+	monkeypatch.setattr(search_engine, "_QUERY_CACHE", None)
+	conn = DuckDuckGoConnector()
+	monkeypatch.setattr(conn, "_search", slow_search)
+
+	async def run():
+		_, stats = await _fetch(conn, NormalizedQuery(full_name="Jane Doe"))
+		await conn.aclose()
+		return stats
+
+	# 8 queries on 2 threads: the last ones queue for ~0.6s but each runs well within its timeout
+	stats = asyncio.run(run())
+	assert [q["status"] for q in stats["per_query"]] == ["ok"] * 8
+
+
+def test_ddg_query_cache_and_replay_mode(monkeypatch):
+	calls = []
+
+	def counting_search(q, max_results):
+		calls.append(q)
+		return [{"href": "https://github.com/janedoe", "title": "Jane Doe", "body": "Paris"}]
+
+	monkeypatch.setattr(search_engine, "_QUERY_CACHE", None)
+	conn = DuckDuckGoConnector()
+	monkeypatch.setattr(conn, "_search", counting_search)
+	query = NormalizedQuery(full_name="Jane Doe")
+
+	async def run():
+		first, _ = await _fetch(conn, query)
+		live_calls = len(calls)
+		second, stats = await _fetch(conn, query)
+		return first, second, stats, live_calls
+
+	first, second, stats, live_calls = asyncio.run(run())
+	assert live_calls > 0 and len(calls) == live_calls
+	assert stats["cached"] == stats["queries"]
+	assert stats["cache"]["hits"] == live_calls
+	assert [c.links for c in first["candidates"]] == [c.links for c in second["candidates"]]
+
+	# Replay mode never reaches the network: recorded queries are served, others come back empty
+	monkeypatch.setattr(settings, "replay_mode", True)
+	monkeypatch.setattr(search_engine, "_QUERY_CACHE", None)
+	record('ddg:4:"John Roe" site:github.com', [{"href": "https://github.com/johnroe", "title": "John Roe", "body": ""}])
+	calls.clear()
+	res, stats = asyncio.run(_fetch(conn, NormalizedQuery(full_name="John Roe")))
+	assert calls == []
+	statuses = {q["label"]: q["status"] for q in stats["per_query"]}
+	assert statuses["github.com"] == "replayed" and statuses["linkedin.com/in"] == "replay_miss"
+	assert str(res["candidates"][0].links[0]) == "https://github.com/johnroe"
+
+
+async def _fake_pdl_get(url, params=None, headers=None, timeout=10.0):
+	# strict (name + location) misses slowly, name-only hits, first-name query hangs
+	charge_api_call()
+	q = params["query"]
+	if "location_country" in q:
+		await asyncio.sleep(0.2)
+		data = []
+	elif "AND" in q:
+		await asyncio.sleep(2.0)
+		data = [{"full_name": "jane"}]
+	else:
+		await asyncio.sleep(0.05)
+		data = [{"full_name": "jane doe"}]
+	return httpx.Response(200, json={"data": data}, request=httpx.Request("GET", url))
+
+
+def test_pdl_attempt_strategies(monkeypatch):
+	monkeypatch.setattr(settings, "pdl_api_key", "test")
+	monkeypatch.setattr(attempts, "http_get", _fake_pdl_get)
+	conn = PeopleDataLabsSearchConnector()
+	query = NormalizedQuery(full_name="Jane Doe", location="Paris")
+
+	async def run(strategy, max_api_calls=10):
+		monkeypatch.setattr(settings, "pdl_attempt_strategy", strategy)
+		with job_scope(Budget(max_api_calls=max_api_calls)) as job:
+			t0 = time.perf_counter()
+			res, stats = await _fetch(conn, query)
+			return res, stats, time.perf_counter() - t0, job.api_calls
+
+	# Speculative: the name-only hit waits for the strict miss, the hanging attempt is cancelled but still charged
+	res, stats, elapsed, calls = asyncio.run(run("parallel"))
+	assert res["candidates"][0].display_name == "jane doe" and elapsed < 0.5
+	assert stats["mode"] == "parallel" and stats["winner"] == 1 and stats["cancelled"] == 1
+	assert calls == 3 and stats["api_calls"] == 3
+
+	res, stats, elapsed, calls = asyncio.run(run("sequential"))
+	assert res["candidates"][0].display_name == "jane doe"
+	assert stats["launched"] == 2 and calls == 2
+
+	# Not enough API calls left for every attempt: budget-aware falls back to sequential
+	res, stats, _, calls = asyncio.run(run("budget", max_api_calls=2))
+	assert stats["mode"] == "sequential" and calls == 2
+	assert asyncio.run(run("budget"))[1]["mode"] == "parallel"
+
+
+def test_pdl_attempt_calls_count_only_what_this_run_charged(monkeypatch):
+	async def slow_lookup_get(url, params=None, headers=None, timeout=10.0):
+		q = params["query"]
+		if "AND" in q and "location_country" not in q:
+			# Still on the cache read / limiter wait when it gets cancelled: never charged
+			await asyncio.sleep(2.0)
+		charge_api_call()
+		if "location_country" in q:
+			raise httpx.ConnectError("boom")
+		await asyncio.sleep(0.05)
+		return httpx.Response(200, json={"data": [{"full_name": "jane doe"}]}, request=httpx.Request("GET", url))
+
+	monkeypatch.setattr(settings, "pdl_api_key", "test")
+	monkeypatch.setattr(settings, "pdl_attempt_strategy", "parallel")
+	monkeypatch.setattr(attempts, "http_get", slow_lookup_get)
+	conn = PeopleDataLabsSearchConnector()
+
+	async def other_step():
+		# Another step of the same job charging at the same time
+		for _ in range(3):
+			charge_api_call()
+			await asyncio.sleep(0.01)
+
+	async def run():
+		with job_scope(Budget(max_api_calls=20)) as job:
+			with step_scope(30.0) as holder:
+				other = asyncio.create_task(other_step())
+				res = await conn.fetch(NormalizedQuery(full_name="Jane Doe", location="Paris"))
+				await other
+			return res, holder, job.api_calls
+
+	res, holder, job_calls = asyncio.run(run())
+	stats = holder["stats"][conn.name]
+	assert res["candidates"][0].display_name == "jane doe"
+	assert stats["cancelled"] == 1 and stats["api_calls"] == 2 and job_calls == 5
+
+	async def failing_get(url, params=None, headers=None, timeout=10.0):
+		raise httpx.ConnectError("boom")
+
+	async def all_fail():
+		with step_scope(30.0) as holder:
+			await conn.fetch(NormalizedQuery(full_name="Jane Doe"))
+		return holder
+
+	monkeypatch.setattr(attempts, "http_get", failing_get)
+	# Failures are reported under the connector's name, like every other step error
+	assert [e["source"] for e in asyncio.run(all_fail())["errors"]] == [conn.name]
+
+
+def test_pdl_enrich_micro_batches_concurrent_jobs(monkeypatch, tmp_path):
+	bodies = []
+
+	async def bulk_stub(request):
+		# Local stand-in for /v5/person/bulk: answers out of order, echoing metadata
+		body = json.loads(request.content)
+		bodies.append(body)
+		await asyncio.sleep(0.02)
+		items = [
+			{"status": 200, "metadata": r["metadata"], "data": {"full_name": r["params"]["email"].split("@")[0], "emails": [r["params"]["email"]]}}
+			if not r["params"]["email"].startswith("nobody") else {"status": 404, "metadata": r["metadata"], "error": {"type": "not_found"}}
+			for r in body["requests"]
+		]
+		return httpx.Response(200, json=list(reversed(items)))
+
+	monkeypatch.setattr(settings, "pdl_api_key", "test")
+	monkeypatch.setattr(settings, "rate_limit_rps_pdl", 0.0)
+	monkeypatch.setattr(settings, "pdl_bulk_max_batch", 5)
+	monkeypatch.setattr(settings, "pdl_bulk_window_ms", 50.0)
+	monkeypatch.setattr(settings, "http_cache_dir", str(tmp_path))
+	monkeypatch.setattr(pdl_bulk, "_BATCHER", None)
+	conn = PeopleDataLabsConnector()
+	emails = ["user0@example.com"] + [f"user{i}@example.com" for i in range(8)] + ["nobody@example.com"]
+
+	async def one(email):
+		with job_scope(Budget()) as job:
+			res = await conn.fetch(NormalizedQuery(email=email))
+			return res, job.api_calls
+
+	async def run():
+		http._CLIENTS[settings.proxy_url] = httpx.AsyncClient(transport=httpx.MockTransport(bulk_stub))
+		try:
+			results = await asyncio.gather(*[one(e) for e in emails])
+			stats = pdl_bulk.pdl_bulk_stats()
+			await conn.aclose()
+		finally:
+			await http.close_http_clients()
+		return results, stats
+
+	results, stats = asyncio.run(run())
+	# 9 distinct parameter sets, at most 5 per bulk call; the repeated user0 shares a slot
+	assert [len(b["requests"]) for b in bodies] == [5, 4]
+	for email, (res, calls) in zip(emails, results):
+		assert calls == 1
+		if email.startswith("nobody"):
+			assert res["candidates"] == []
+		else:
+			assert res["candidates"][0].emails == [email]
+	assert stats["requests"] == 10 and stats["batches"] == 2 and stats["deduplicated"] == 1
+	assert stats["calls_saved"] == 8 and stats["batch_size_max"] == 5
+
+
+def test_pdl_bulk_enrich_shares_the_response_cache(monkeypatch, tmp_path):
+	bodies = []
+
+	async def bulk_stub(request):
+		body = json.loads(request.content)
+		bodies.append(body)
+		return httpx.Response(200, json=[
+			{"status": 200, "metadata": r["metadata"], "data": {"full_name": "jane doe", "emails": [r["params"]["email"]]}}
+			if r["params"]["email"].startswith("jane") else {"status": 404, "metadata": r["metadata"]}
+			for r in body["requests"]
+		])
+
+	monkeypatch.setattr(settings, "pdl_api_key", "test")
+	monkeypatch.setattr(settings, "rate_limit_rps_pdl", 0.0)
+	monkeypatch.setattr(settings, "pdl_bulk_window_ms", 1.0)
+	monkeypatch.setattr(settings, "http_cache_dir", str(tmp_path))
+	monkeypatch.setattr(pdl_bulk, "_BATCHER", None)
+	conn = PeopleDataLabsConnector()
+
+	async def one(email):
+		with job_scope(Budget()) as job:
+			res = await conn.fetch(NormalizedQuery(email=email))
+			return res, job.api_calls
+
+	async def run():
+		http._CLIENTS[settings.proxy_url] = httpx.AsyncClient(transport=httpx.MockTransport(bulk_stub))
+		try:
+			first = await asyncio.gather(one("jane@example.com"), one("nobody@example.com"))
+			# Hits (and negative hits) skip the batcher and cost the job nothing
+			second = await asyncio.gather(one("jane@example.com"), one("nobody@example.com"))
+			monkeypatch.setattr(settings, "replay_mode", True)
+			replay_miss = await one("john@example.com")
+			await conn.aclose()
+		finally:
+			await http.close_http_clients()
+		return first, second, replay_miss
+
+	first, second, replay_miss = asyncio.run(run())
+	assert len(bodies) == 1
+	assert [calls for _, calls in first] == [1, 1] and [calls for _, calls in second] == [0, 0]
+	assert second[0][0]["candidates"][0].emails == ["jane@example.com"]
+	assert second[1][0]["candidates"] == []
+	# Offline: a miss is never sent upstream
+	assert replay_miss[0]["candidates"] == [] and replay_miss[1] == 0
+
+
+def test_pdl_bulk_enrich_refreshes_stale_entries_in_the_background(monkeypatch, tmp_path):
+	bodies = []
+
+	async def bulk_stub(request):
+		body = json.loads(request.content)
+		bodies.append(body)
+		name = f"jane v{len(bodies)}"
+		return httpx.Response(200, json=[{"status": 200, "data": {"full_name": name}} for _ in body["requests"]])
+
+	monkeypatch.setattr(settings, "pdl_api_key", "test")
+	monkeypatch.setattr(settings, "rate_limit_rps_pdl", 0.0)
+	monkeypatch.setattr(settings, "pdl_bulk_window_ms", 1.0)
+	monkeypatch.setattr(settings, "http_cache_dir", str(tmp_path))
+	monkeypatch.setattr(pdl_bulk, "_BATCHER", None)
+	monkeypatch.setitem(http._POLICIES, pdl_bulk.ENRICH_URL, http.CachePolicy(ttl_s=0.05, stale_while_revalidate_s=60))
+	params, headers = {"email": "jane@example.com"}, {"X-API-Key": "test"}
+
+	async def run():
+		http._CLIENTS[settings.proxy_url] = httpx.AsyncClient(transport=httpx.MockTransport(bulk_stub))
+		try:
+			first = await pdl_bulk.enrich(params, headers)
+			await asyncio.sleep(0.06)
+			with job_scope(Budget()) as job:
+				stale = await pdl_bulk.enrich(params, headers)
+			await pdl_bulk.close_enrich_batcher()
+			fresh = await pdl_bulk.enrich(params, headers)
+		finally:
+			await http.close_http_clients()
+		return first, stale, job.api_calls, fresh
+
+	first, stale, stale_calls, fresh = asyncio.run(run())
+	assert first["data"]["full_name"] == "jane v1"
+	# The stale copy is served at once, free, and refreshed behind the caller's back
+	assert stale["data"]["full_name"] == "jane v1" and stale_calls == 0
+	assert fresh["data"]["full_name"] == "jane v2" and len(bodies) == 2
+
+
+def test_pdl_batch_failure_after_caller_gave_up_is_not_logged_as_unretrieved():
+	unhandled = []
+
+	async def failing_send(requests):
+		await asyncio.sleep(0.05)
+		raise RuntimeError("bulk endpoint down")
+
+	async def run():
+		asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: unhandled.append(ctx["message"]))
+		batcher = pdl_bulk.EnrichBatcher(failing_send, window_s=0.0)
+		with step_scope(0.01):
+			try:
+				await batcher.enrich({"email": "jane@example.com"})
+				assert False, "expected the caller's deadline to pass first"
+			except asyncio.TimeoutError:
+				pass
+		await batcher.aclose()
+		del batcher
+		gc.collect()
+
+	asyncio.run(run())
+	assert not [m for m in unhandled if "never retrieved" in m]
+
+
+def test_pdl_decoder_matches_validated_candidate():
+	rec = decode_person({
+		"full_name": "jane doe",
+		"emails": [{"address": "Jane@Example.COM"}, "not-an-email", None, ""],
+		"phone_numbers": ["+1 555 0100", {"number": None}],
+		"location_general": {"display": "paris, france"},
+		"links": [{"url": "linkedin.com/in/janedoe"}, {"url": "https://github.com/janedoe"}, {"url": None}],
+		"employment": [{"title": "engineer", "company": "acme", "start_date": "2019"}, "junk"],
+		"education": "not-a-list",
+	})
+	assert rec.emails == ["Jane@example.com"] and rec.phones == ["+1 555 0100"]
+	assert [str(l) for l in rec.links] == ["https://linkedin.com/in/janedoe", "https://github.com/janedoe"]
+	assert rec.employment == [{"title": "engineer", "organization": "acme", "start": "2019", "end": None}]
+	assert rec.education == [] and rec.location == "paris, france"
+	cand = build_candidate(
+		display_name=rec.full_name, emails=rec.emails, phones=rec.phones, usernames=[],
+		locations=[rec.location], links=rec.links, score=0.4, top_evidence=[],
+	)
+	# Skipping validation must not change what a validated model would hold
+	assert IdentityCandidate.model_validate(cand.model_dump()) == cand
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import time
+import httpx
+from backend.app.core import http
+from backend.app.core import cache as response_cache
+from backend.app.core.cache import ResponseCache, AsyncResponseCache, encode_body, decode_body
+from backend.app.core.config import settings
+from backend.app.core.ratelimit import TokenBucket, parse_retry_after
+from backend.app.core.breaker import CircuitBreaker, CircuitOpenError, get_breaker
+from backend.app.core.deadline import step_scope
+
+
+def test_response_cache_ttl_and_eviction(tmp_path):
+	cache = ResponseCache(str(tmp_path / "c.sqlite3"), ttl_s=60, max_bytes=2000, hot_max_entries=2)
+	assert cache.get("missing") is None
+	cache.set("a", {"status": 200, "json": {"v": "x" * 100}})
+	assert json.loads(cache.get("a")["content"])["v"] == "x" * 100
+	for i in range(30):
+		cache.set(f"k{i}", {"status": 200, "json": {"v": "y" * 100}})
+	assert cache.size_bytes() <= 2000
+	assert cache.stats["evictions"] > 0
+	assert cache.get("a") is None
+	assert cache.get("k29") is not None
+	cache.close()
+
+	# Reopen: entries persist and the TTL is measured from the original write
+	cache = ResponseCache(str(tmp_path / "c.sqlite3"), ttl_s=0.05, max_bytes=2000)
+	time.sleep(0.06)
+	assert cache.get("k29") is None
+	assert cache.stats["expired"] == 1
+	cache.close()
+
+
+def test_hot_tier_reads_keep_entries_from_lru_eviction(tmp_path):
+	cache = ResponseCache(str(tmp_path / "c.sqlite3"), ttl_s=60, max_bytes=2000, hot_max_entries=100)
+	cache.set("a", {"status": 200, "json": {"v": "x" * 100}})
+	cache.set("b", {"status": 200, "json": {"v": "x" * 100}})
+	for i in range(30):
+		# Served from memory every time; the disk row is touched with the next write
+		assert cache.get("a") is not None
+		cache.set(f"k{i}", {"status": 200, "json": {"v": "y" * 100}})
+	assert cache.stats["evictions"] > 0
+	assert cache.get("b") is None
+	assert cache.get("a") is not None
+	cache.close()
+
+
+def test_cache_body_encoding_and_legacy_migration(tmp_path):
+	raw = json.dumps({"data": [{"full_name": "jane doe"}] * 50}).encode()
+	for codec in ("zstd", "zlib", "none"):
+		blob = encode_body(raw, codec)
+		assert blob[:3] == b"HC\x01"
+		assert decode_body(blob) == raw
+	assert len(encode_body(raw, "zlib")) < len(raw) / 5
+	# v0 rows stored plain JSON text
+	assert decode_body('{"a": 1}') == b'{"a": 1}'
+
+	legacy = tmp_path / ("ab" * 32 + ".json")
+	legacy.write_text(json.dumps({"status": 200, "json": {"login": "octocat"}}))
+	cache = ResponseCache(str(tmp_path / "c.sqlite3"), ttl_s=60, max_bytes=10**6)
+	assert json.loads(cache.get("ab" * 32)["content"]) == {"login": "octocat"}
+	assert cache.stats["legacy_migrated"] == 1
+	assert not legacy.exists()
+	cache.close()
+
+
+def test_http_get_coalesces_identical_requests():
+	calls = []
+
+	async def handler(request):
+		calls.append(str(request.url))
+		await asyncio.sleep(0.05)
+		return httpx.Response(200, json={"login": "octocat"})
+
+	async def run():
+		http._CLIENTS[settings.proxy_url] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+		before = http.FLIGHT_STATS["coalesced"]
+		try:
+			url = "https://example.test/users/octocat"
+			responses = await asyncio.gather(*[http.http_get(url, disable_cache=True) for _ in range(5)])
+		finally:
+			await http.close_http_clients()
+		assert len(calls) == 1
+		assert all(r.json() == {"login": "octocat"} for r in responses)
+		assert http.FLIGHT_STATS["coalesced"] - before == 4
+
+	asyncio.run(run())
+
+
+def test_shared_request_outlives_a_callers_deadline():
+	calls = []
+
+	async def handler(request):
+		calls.append(str(request.url))
+		# MockTransport ignores timeouts; honour the one the request was sent with
+		read_timeout = request.extensions["timeout"]["read"]
+		if read_timeout < 0.2:
+			await asyncio.sleep(read_timeout)
+			raise httpx.ReadTimeout("timed out", request=request)
+		await asyncio.sleep(0.2)
+		return httpx.Response(200, json={"login": "octocat"})
+
+	async def leader(url):
+		with step_scope(0.05):
+			try:
+				await http.http_get(url, disable_cache=True)
+			except asyncio.TimeoutError:
+				return "timeout"
+
+	async def run():
+		http._CLIENTS[settings.proxy_url] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+		url = "https://deadline.test/users/octocat"
+		try:
+			lead = asyncio.create_task(leader(url))
+			await asyncio.sleep(0)
+			follower = await http.http_get(url, disable_cache=True)
+			assert await lead == "timeout"
+		finally:
+			await http.close_http_clients()
+		# The leader's 50ms deadline neither cut the shared request short nor counted against the host
+		assert len(calls) == 1
+		assert follower.json() == {"login": "octocat"}
+		breaker = get_breaker(url)
+		if breaker is not None:
+			assert breaker.snapshot()["error_rate"] == 0.0
+
+	asyncio.run(run())
+
+
+def test_pooled_client_is_rebuilt_for_a_new_loop():
+	async def grab():
+		return http.get_http_client()
+
+	try:
+		first = asyncio.run(grab())
+		second = asyncio.run(grab())
+		assert second is not first
+	finally:
+		http._CLIENTS.clear()
+
+
+def test_token_bucket_burst_and_backoff():
+	async def run():
+		bucket = TokenBucket(rate=20, burst=2, recovery_s=60)
+		start = time.monotonic()
+		await asyncio.gather(*[bucket.acquire() for _ in range(4)])
+		# Two tokens from the burst, two more at 20/s
+		assert 0.08 <= time.monotonic() - start < 0.3
+		bucket.penalize(retry_after_s=0.1)
+		assert bucket.effective_rate == 10
+		start = time.monotonic()
+		await bucket.acquire()
+		assert time.monotonic() - start >= 0.1
+
+	asyncio.run(run())
+	assert parse_retry_after("3") == 3.0
+	assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_async_cache_write_behind_coalesces_and_flushes(tmp_path):
+	async def run():
+		cache = ResponseCache(str(tmp_path / "c.sqlite3"), ttl_s=60, max_bytes=10**6)
+		facade = AsyncResponseCache(cache, batch_size=10, flush_interval_s=0.01)
+		facade.put("k", {"status": 200, "json": {"v": 1}})
+		facade.put("k", {"status": 200, "json": {"v": 2}})
+		assert json.loads((await facade.get("k"))["content"]) == {"v": 2}
+		await facade.close()
+		assert facade.stats["writes_coalesced"] == 1
+		assert json.loads(cache.get("k")["content"]) == {"v": 2}
+		cache.close()
+
+	asyncio.run(run())
+
+
+def test_async_cache_hands_queued_writes_to_the_next_loop(tmp_path, monkeypatch):
+	monkeypatch.setattr(settings, "http_cache_dir", str(tmp_path))
+	monkeypatch.setattr(settings, "http_cache_flush_interval_s", 60.0)
+
+	async def put():
+		facade = response_cache.get_async_cache()
+		facade.put("k", {"status": 200, "json": {"v": 1}})
+		return facade
+
+	async def next_loop():
+		facade = response_cache.get_async_cache()
+		queued = dict(facade._pending)
+		await response_cache.close_response_cache()
+		return facade, queued
+
+	old = asyncio.run(put())
+	new, queued = asyncio.run(next_loop())
+	assert new is not old and "k" in queued
+	assert old._executor._shutdown
+	cache = ResponseCache(str(tmp_path / "responses.sqlite3"), ttl_s=60, max_bytes=10**6)
+	assert json.loads(cache.get("k")["content"]) == {"v": 1}
+	cache.close()
+
+
+def test_negative_caching_and_stale_while_revalidate(tmp_path, monkeypatch):
+	monkeypatch.setattr(settings, "http_cache_dir", str(tmp_path))
+	calls = []
+
+	async def handler(request):
+		calls.append(request.url.path)
+		if request.url.path.endswith("/ghost"):
+			return httpx.Response(404, json={"message": "Not Found"})
+		return httpx.Response(200, json={"n": len(calls)})
+
+	async def run():
+		http._CLIENTS[settings.proxy_url] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+		http.register_cache_policy("https://neg.test/", http.CachePolicy(ttl_s=0.05, negative_ttl_s=60, stale_while_revalidate_s=60))
+		try:
+			assert (await http.http_get("https://neg.test/ghost")).status_code == 404
+			again = await http.http_get("https://neg.test/ghost")
+			assert again.status_code == 404 and again.headers["x-cache"] == "hit"
+			assert calls == ["/ghost"]
+
+			assert (await http.http_get("https://neg.test/octocat")).json() == {"n": 2}
+			await asyncio.sleep(0.06)
+			stale = await http.http_get("https://neg.test/octocat")
+			assert stale.headers["x-cache"] == "stale" and stale.json() == {"n": 2}
+			await asyncio.sleep(0.02)
+			assert len(calls) == 3
+		finally:
+			http._POLICIES.pop("https://neg.test/", None)
+			await http.close_http_clients()
+
+	asyncio.run(run())
+
+
+def test_circuit_breaker_opens_and_recovers():
+	breaker = CircuitBreaker("api.test", min_requests=4, error_rate=0.5, open_s=0.05)
+	for ok in (True, False, False, True):
+		breaker.before_call()
+		breaker.record(ok, 0.01)
+	assert breaker.state == CircuitBreaker.OPEN
+	try:
+		breaker.before_call()
+		assert False, "expected fail-fast"
+	except CircuitOpenError:
+		pass
+	time.sleep(0.06)
+	breaker.before_call()
+	assert breaker.state == CircuitBreaker.HALF_OPEN
+	breaker.record(True, 0.01)
+	assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+import pytest
+from httpx import AsyncClient
+from backend.app.main import app
+from backend.app.schemas.common import JobStatus
+from backend.app.store import jobs
+from backend.app.store.jobs import MemoryJobStore, SQLiteJobStore, RedisJobStore, create_job, job_version, update_job
+
+
+def _store(kind, tmp_path):
+	if kind == "memory":
+		return MemoryJobStore(ttl_s=60, max_bytes=1 << 20)
+	if kind == "sqlite":
+		return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"), ttl_s=60)
+	fakeredis = pytest.importorskip("fakeredis")
+	return RedisJobStore(fakeredis.FakeRedis(), ttl_s=60)
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "redis"])
+def test_updates_patch_only_given_fields(kind, tmp_path):
+	store = _store(kind, tmp_path)
+	store.create("j1", JobStatus.queued)
+	store.update("j1", status=JobStatus.running)
+	store.update("j1", result={"candidates": [{"display_name": "Jane"}]}, questions=["Which city?"])
+	store.update("j1", status=JobStatus.needs_disambiguation)
+	job = store.get("j1")
+	assert job.status == JobStatus.needs_disambiguation
+	assert job.result["candidates"][0]["display_name"] == "Jane"
+	assert job.questions == ["Which city?"] and job.error is None
+	store.update("missing", status=JobStatus.failed)
+	assert store.get("missing") is None
+	store.close()
+
+
+def test_memory_store_expires_and_evicts_finished_jobs_first():
+	store = MemoryJobStore(ttl_s=0.05, max_bytes=10_000)
+	store.create("old", JobStatus.queued)
+	time.sleep(0.06)
+	store.create("a", JobStatus.completed, result={"blob": "x" * 4000})
+	assert store.get("old") is None and store.snapshot()["expired"] == 1
+
+	store = MemoryJobStore(ttl_s=60, max_bytes=10_000)
+	store.create("running", JobStatus.running, result={"blob": "x" * 4000})
+	store.create("done", JobStatus.completed, result={"blob": "x" * 4000})
+	store.create("new", JobStatus.queued, result={"blob": "x" * 4000})
+	assert store.get("done") is None
+	assert store.get("running") is not None and store.get("new") is not None
+	assert store.snapshot()["bytes"] <= 10_000
+
+
+def test_status_etag_304_and_long_poll():
+	async def run():
+		await create_job("poll-job", status=JobStatus.running)
+		async with AsyncClient(app=app, base_url="http://test") as ac:
+			first = await ac.get("/search/poll-job")
+			etag = first.headers["etag"]
+			same = await ac.get("/search/poll-job", headers={"If-None-Match": etag})
+
+			async def finish():
+				await asyncio.sleep(0.1)
+				await update_job("poll-job", status=JobStatus.completed, result={"candidates": []})
+
+			asyncio.get_running_loop().create_task(finish())
+			t0 = time.monotonic()
+			changed = await ac.get("/search/poll-job", params={"wait": 5}, headers={"If-None-Match": etag})
+			elapsed = time.monotonic() - t0
+			idle = await ac.get("/search/poll-job", params={"wait": 0.1}, headers={"If-None-Match": changed.headers["etag"]})
+		return first, same, changed, elapsed, idle
+
+	first, same, changed, elapsed, idle = asyncio.run(run())
+	assert first.status_code == 200 and first.json()["status"] == "running"
+	assert same.status_code == 304 and same.headers["etag"] == first.headers["etag"]
+	assert changed.status_code == 200 and changed.json()["status"] == "completed"
+	assert changed.headers["etag"] != first.headers["etag"] and elapsed < 2
+	assert idle.status_code == 304
+
+
+def test_choose_candidate_and_answer_leave_the_stored_result_alone():
+	result = {
+		"candidates": [{"display_name": "Jane Doe", "emails": ["jane@example.com"]}],
+		"profile": {"emails": ["old@example.com"]},
+		"normalized_query": {"full_name": "jane"},
+	}
+
+	async def run():
+		await create_job("choose-job", status=JobStatus.needs_disambiguation, result=result)
+		async with AsyncClient(app=app, base_url="http://test") as ac:
+			answered = await ac.post("/search/choose-job/answer", json={"location": "paris"})
+			chosen = await ac.post("/search/choose-job/choose-candidate", json={"index": 0})
+		return answered, chosen
+
+	answered, chosen = asyncio.run(run())
+	assert answered.status_code == 200 and chosen.status_code == 200
+	assert chosen.json()["status"] == "completed"
+	profile = chosen.json()["result"]["profile"]
+	assert profile["names"] == ["Jane Doe"]
+	assert sorted(profile["emails"]) == ["jane@example.com", "old@example.com"]
+	assert chosen.json()["result"]["normalized_query"]["location"] == "paris"
+	# The dicts the record was created from (and that other readers may hold) are untouched
+	assert result["profile"] == {"emails": ["old@example.com"]}
+	assert result["normalized_query"] == {"full_name": "jane"}
+
+
+def test_shared_job_store_calls_run_off_the_event_loop(tmp_path, monkeypatch):
+	class SlowStore(SQLiteJobStore):
+		def version(self, job_id):
+			threads.append(threading.get_ident())
+			time.sleep(0.2)
+			return super().version(job_id)
+
+	threads = []
+	store = SlowStore(str(tmp_path / "jobs.sqlite3"), ttl_s=60)
+	monkeypatch.setattr(jobs, "_STORE", store)
+
+	async def run():
+		ticks = 0
+
+		async def tick():
+			nonlocal ticks
+			while True:
+				await asyncio.sleep(0.01)
+				ticks += 1
+
+		ticker = asyncio.create_task(tick())
+		await create_job("slow-job", status=JobStatus.running)
+		version = await job_version("slow-job")
+		ticker.cancel()
+		return version, ticks, threading.get_ident()
+
+	try:
+		version, ticks, loop_thread = asyncio.run(run())
+	finally:
+		jobs.close_job_store()
+	assert version == 1
+	# The loop kept running while the store call blocked its thread
+	assert threads and loop_thread not in threads and ticks >= 5
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from backend.app.core import llm
+from backend.app.core.config import settings, Budget
+from backend.app.agent.extractor import extract_with_llm_fallback, get_llm_memo
+from backend.app.schemas.search import SearchInput
+
+
+class _StubState:
+	calls = 0
+	in_flight = 0
+	max_in_flight = 0
+	fail_first = 0
+	lock = threading.Lock()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+	def log_message(self, *args):
+		pass
+
+	def do_POST(self):
+		self.rfile.read(int(self.headers.get("content-length", 0)))
+		with _StubState.lock:
+			_StubState.calls += 1
+			_StubState.in_flight += 1
+			_StubState.max_in_flight = max(_StubState.max_in_flight, _StubState.in_flight)
+			fail = _StubState.fail_first > 0
+			_StubState.fail_first -= 1
+		time.sleep(0.05)
+		with _StubState.lock:
+			_StubState.in_flight -= 1
+		if fail:
+			self.send_response(503)
+			self.send_header("content-type", "application/json")
+			self.end_headers()
+			self.wfile.write(b'{"error": {"message": "overloaded"}}')
+			return
+		content = json.dumps({"full_name": "Jane Doe", "location": "Srinagar"})
+		body = json.dumps({
+			"id": "x", "object": "chat.completion", "created": 0, "model": "stub",
+			"choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+		}).encode()
+		self.send_response(200)
+		self.send_header("content-type", "application/json")
+		self.send_header("content-length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+
+def test_async_llm_client_retries_and_limits_concurrency(monkeypatch):
+	server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+	monkeypatch.setattr(settings, "openai_base_url", f"http://127.0.0.1:{server.server_port}/v1")
+	monkeypatch.setattr(settings, "llm_max_concurrency", 2)
+	monkeypatch.setattr(settings, "llm_backoff_base_s", 0.01)
+	get_llm_memo().clear()
+	_StubState.calls, _StubState.max_in_flight, _StubState.fail_first = 0, 0, 1
+
+	async def run():
+		try:
+			nq = await extract_with_llm_fallback(SearchInput(context_text="a developer in srinagar"), Budget(llm_call_timeout_ms=2000))
+			assert nq.full_name == "Jane Doe"
+			assert _StubState.calls == 2  # one 503, one retry
+			await asyncio.gather(*[llm.chat_completion([{"role": "user", "content": "hi"}]) for _ in range(6)])
+			assert _StubState.max_in_flight <= 2
+
+			# Same context modulo whitespace: served from the memo cache
+			diag = {}
+			nq = await extract_with_llm_fallback(SearchInput(context_text="  a developer   in srinagar"), diagnostics=diag)
+			assert nq.full_name == "Jane Doe" and diag["llm"] == "cache_hit"
+			# Deterministic fields already sufficient: no LLM call at all
+			calls = _StubState.calls
+			diag = {}
+			await extract_with_llm_fallback(SearchInput(email="jane@example.com", context_text="something new"), diagnostics=diag)
+			assert diag["llm"] == "skipped" and _StubState.calls == calls
+		finally:
+			await llm.close_llm_client()
+
+	try:
+		asyncio.run(run())
+	finally:
+		server.shutdown()
+
+
+def test_async_llm_client_closes_the_one_it_replaces(monkeypatch):
+	monkeypatch.setattr(settings, "openai_base_url", "http://127.0.0.1:9/v1")
+
+	async def grab():
+		return llm.get_async_openai_client()
+
+	async def replace():
+		client = llm.get_async_openai_client()
+		await llm.close_llm_client()
+		return client
+
+	old = asyncio.run(grab())
+	new = asyncio.run(replace())
+	assert new is not old
+	assert old.is_closed() and new.is_closed()
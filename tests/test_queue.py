@@ -0,0 +1,195 @@
+import asyncio
+import pickle
+import pytest
+from httpx import AsyncClient
+from backend.app.main import app, lifespan
+from backend.app.core.config import settings
+from backend.app.worker import run_worker
+from backend.app.store import queue
+from backend.app.store import redis_queue
+from backend.app.store.queue import QueueFull, get_scheduler
+from backend.app.store.redis_queue import RedisJobQueue, QueueWorker
+from backend.app.store.events import get_stream
+from backend.app.store.jobs import get_job_store, update_job
+from backend.app.schemas.common import JobStatus
+
+
+def test_interactive_lane_runs_before_bulk(monkeypatch):
+	monkeypatch.setattr(settings, "job_workers", 1)
+	order = []
+
+	async def job(name):
+		order.append(name)
+
+	async def run():
+		scheduler = get_scheduler()
+		scheduler.submit("bulk", job, "b1")
+		scheduler.submit("bulk", job, "b2")
+		scheduler.submit("interactive", job, "i1")
+		await asyncio.sleep(0.05)
+		snap = scheduler.snapshot()
+		await queue.close_job_queue()
+		return snap
+
+	snap = asyncio.run(run())
+	assert order == ["i1", "b1", "b2"]
+	assert snap["completed"] == 3 and snap["lanes"]["bulk"]["depth"] == 0
+
+
+def test_full_queue_returns_429_with_retry_after(monkeypatch):
+	monkeypatch.setattr(settings, "job_workers", 1)
+	monkeypatch.setattr(settings, "job_queue_max_interactive", 1)
+	gate = None
+
+	async def blocker():
+		await gate.wait()
+
+	async def run():
+		nonlocal gate
+		gate = asyncio.Event()
+		scheduler = get_scheduler()
+		scheduler.submit("interactive", blocker)
+		await asyncio.sleep(0)
+		scheduler.submit("interactive", blocker)
+		try:
+			scheduler.submit("interactive", blocker)
+		except QueueFull as exc:
+			assert exc.retry_after_s >= 1
+		else:
+			raise AssertionError("expected QueueFull")
+		async with AsyncClient(app=app, base_url="http://test") as ac:
+			r = await ac.post("/search/start", json={"context_text": "someone"})
+			m = await ac.get("/metrics")
+		gate.set()
+		await queue.close_job_queue()
+		return r, m.json()
+
+	r, metrics = asyncio.run(run())
+	assert r.status_code == 429
+	assert int(r.headers["retry-after"]) >= 1
+	assert metrics["job_queue"]["rejected"] == 2
+	assert metrics["job_queue"]["lanes"]["interactive"]["depth"] == 1
+
+
+_RAN = []
+
+
+async def _record(name, delay=0.0):
+	await asyncio.sleep(delay)
+	_RAN.append(name)
+
+
+def _redis_queue(**kw):
+	fakeredis = pytest.importorskip("fakeredis")
+	return RedisJobQueue(fakeredis.aioredis.FakeRedis(), **kw)
+
+
+def test_redis_queue_priority_ack_and_capacity(monkeypatch):
+	async def run():
+		q = _redis_queue(capacity={"interactive": 1, "bulk": 5})
+		monkeypatch.setattr(settings, "use_redis_queue", True)
+		monkeypatch.setattr(redis_queue, "_QUEUE", q)
+		q._loop = asyncio.get_running_loop()
+		await queue.enqueue_background(_record, "b1", lane="bulk")
+		await queue.enqueue_background(_record, "i1")
+		with pytest.raises(QueueFull):
+			await queue.enqueue_background(_record, "i2")
+		first = await q.claim()
+		assert pickle.loads(first.payload)[1] == ("i1",) and first.attempts == 1
+		await q.ack(first.id)
+		second = await q.claim()
+		assert pickle.loads(second.payload)[1] == ("b1",)
+		stats = await queue.queue_stats()
+		assert stats["inflight"] == 1 and stats["lanes"]["interactive"]["depth"] == 0
+		assert await q.claim() is None
+
+	asyncio.run(run())
+
+
+def test_redis_queue_redelivers_lost_jobs_then_dead_letters():
+	async def run():
+		q = _redis_queue(visibility_s=0.05, max_attempts=2)
+		await q.submit("interactive", _record, "lost")
+		first = await q.claim()
+		await asyncio.sleep(0.1)
+		assert await q.requeue_expired() == (1, 0)
+		second = await q.claim()
+		assert second.id == first.id and second.attempts == 2
+		await asyncio.sleep(0.1)
+		assert await q.requeue_expired() == (0, 1)
+		return await q.stats()
+
+	stats = asyncio.run(run())
+	assert stats["dead"] == 1 and stats["inflight"] == 0
+
+
+def test_redis_mode_writes_job_first_and_streams_from_store(monkeypatch):
+	async def run():
+		q = _redis_queue(capacity={"interactive": 1, "bulk": 0})
+		monkeypatch.setattr(settings, "use_redis_queue", True)
+		monkeypatch.setattr(redis_queue, "_QUEUE", q)
+		q._loop = asyncio.get_running_loop()
+		jobs_before = get_job_store().snapshot()["jobs"]
+		async with AsyncClient(app=app, base_url="http://test") as ac:
+			# A rejected job leaves no record behind
+			full = await ac.post("/search/start", params={"priority": "bulk"}, json={"context_text": "someone"})
+			assert full.status_code == 429 and get_job_store().snapshot()["jobs"] == jobs_before
+			jid = (await ac.post("/search/start", json={"context_text": "someone"})).json()["job_id"]
+			# The record exists before a worker can claim the message, and no local stream is opened
+			claimed = await q.claim()
+			assert pickle.loads(claimed.payload)[1][0] == jid and get_stream(jid) is None
+
+			async def worker():
+				await asyncio.sleep(0.05)
+				await update_job(jid, status=JobStatus.running)
+				await asyncio.sleep(0.05)
+				await update_job(jid, status=JobStatus.completed, result={"candidates": []})
+
+			task = asyncio.create_task(worker())
+			events = []
+			async with ac.stream("GET", f"/search/{jid}/stream") as resp:
+				async for line in resp.aiter_lines():
+					if line.startswith("event: "):
+						events.append(line[len("event: "):])
+			await task
+		return events
+
+	events = asyncio.run(run())
+	assert events == ["status", "status", "final"]
+
+
+def test_worker_runs_jobs_and_releases_on_drain_timeout():
+	_RAN.clear()
+
+	async def run():
+		q = _redis_queue(visibility_s=5)
+		worker = QueueWorker(q, concurrency=2, drain_timeout_s=0.1, poll_s=0.01)
+		await q.submit("interactive", _record, "fast")
+		await q.submit("bulk", _record, "slow", 10)
+		task = asyncio.create_task(worker.run())
+		# Stop only once the fast job is done and the slow one is running
+		while worker.stats["claimed"] < 2 or worker.stats["completed"] < 1:
+			await asyncio.sleep(0.01)
+		worker.stop()
+		await task
+		return worker.stats, await q.stats()
+
+	stats, qstats = asyncio.run(asyncio.wait_for(run(), timeout=5))
+	assert _RAN == ["fast"]
+	assert stats["completed"] == 1 and stats["released"] == 1
+	# The unfinished job is back on its lane for another worker
+	assert qstats["lanes"]["bulk"]["depth"] == 1 and qstats["inflight"] == 0
+
+
+def test_redis_queue_refuses_a_per_process_job_store(monkeypatch):
+	monkeypatch.setattr(settings, "use_redis_queue", True)
+	monkeypatch.setattr(settings, "job_store", "memory")
+
+	async def start_api():
+		async with lifespan(app):
+			pass
+
+	# Neither side starts: the worker's updates would never reach the API's records
+	for start in (start_api, lambda: run_worker(1)):
+		with pytest.raises(RuntimeError, match="job_store='redis'"):
+			asyncio.run(start())
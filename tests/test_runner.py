@@ -0,0 +1,290 @@
+import asyncio
+import json
+from httpx import AsyncClient
+from backend.app.main import app
+from backend.app.orchestrator import batch, runner
+from backend.app.connectors import registry
+from backend.app.core.config import Budget, settings
+from backend.app.core.deadline import report_error, report_partial, report_stats
+from backend.app.connectors.base import make_result
+from backend.app.schemas.profile import IdentityCandidate
+from backend.app.schemas.search import SearchInput, NormalizedQuery
+from backend.app.schemas.common import JobStatus
+from backend.app.store.jobs import create_job, get_job_store
+
+
+class _SlowConnector:
+	name = "duckduckgo"
+
+	async def invoke(self, query):
+		report_partial(make_result(candidates=[IdentityCandidate(display_name="Partial Hit", score=0.5)]))
+		await asyncio.sleep(10)
+		return make_result()
+
+
+def test_job_deadline_keeps_partial_results(monkeypatch):
+	monkeypatch.setattr(runner, "_RESULT_CACHE", None)
+	monkeypatch.setattr(settings, "result_cache_enabled", False)
+	monkeypatch.setitem(registry._INSTANCES, "duckduckgo", _SlowConnector())
+
+	async def run():
+		await create_job("deadline-job", status=JobStatus.queued)
+		await asyncio.wait_for(runner._run_job("deadline-job", SearchInput(context_text="someone"), Budget(max_wall_time_ms=600)), timeout=2)
+
+	asyncio.run(run())
+	job = get_job_store().get("deadline-job")
+	assert job.status in (JobStatus.completed, JobStatus.needs_disambiguation)
+	diag = job.result["metrics"]["diagnostics"]
+	# The only step's timeout equals the remaining job budget, so either limit may fire first
+	assert len(diag["cut_off"]) == 1
+	assert diag["cut_off"][0]["tool"] == "duckduckgo" and diag["cut_off"][0]["partial"] is True
+	assert diag["cut_off"][0]["reason"] in ("step_timeout", "job_deadline")
+	assert job.result["candidates"][0]["display_name"] == "Partial Hit"
+
+
+class _FastConnector:
+	name = "duckduckgo"
+
+	async def invoke(self, query):
+		return make_result(candidates=[IdentityCandidate(display_name="Fast Hit", score=0.9)])
+
+
+def test_stream_endpoint_emits_partial_snapshot_and_final(monkeypatch):
+	monkeypatch.setattr(runner, "_RESULT_CACHE", None)
+	monkeypatch.setattr(settings, "result_cache_enabled", False)
+	monkeypatch.setitem(registry._INSTANCES, "duckduckgo", _FastConnector())
+
+	async def run():
+		async with AsyncClient(app=app, base_url="http://test") as ac:
+			r = await ac.post("/search/start", json={"context_text": "someone"})
+			jid = r.json()["job_id"]
+			events = []
+			async with ac.stream("GET", f"/search/{jid}/stream") as resp:
+				assert resp.headers["content-type"].startswith("text/event-stream")
+				async for line in resp.aiter_lines():
+					if line.startswith("event: "):
+						events.append(line[len("event: "):])
+		return events
+
+	events = asyncio.run(run())
+	assert events == ["status", "partial", "snapshot", "final"]
+
+
+def test_registry_is_lazy_and_shares_instances(monkeypatch):
+	assert registry.get_connector("clearbit") is None
+	assert "clearbit" not in registry.enabled_connectors()
+	monkeypatch.setitem(settings.connectors_enabled, "clearbit", True)
+	monkeypatch.delitem(registry._INSTANCES, "clearbit", raising=False)
+	first = registry.get_connector("clearbit")
+	assert first is registry.get_connector("clearbit")
+	assert registry.get_spec("github").accepts(NormalizedQuery(username="octocat"))
+	assert not registry.get_spec("github").accepts(NormalizedQuery(full_name="Jane Doe"))
+
+
+class _LinkConnector:
+	name = "duckduckgo"
+
+	async def invoke(self, query):
+		return make_result(candidates=[IdentityCandidate(display_name="Jane Doe", score=0.6, links=["https://github.com/janedoe"])])
+
+
+class _GitHubConnector:
+	name = "github"
+
+	def __init__(self):
+		self.seen = []
+
+	async def invoke(self, query):
+		self.seen.append(query.username)
+		return make_result(candidates=[IdentityCandidate(display_name="Jane Doe", score=0.8, usernames=[query.username])])
+
+
+def test_follow_up_step_runs_on_discovered_username(monkeypatch):
+	monkeypatch.setattr(runner, "_RESULT_CACHE", None)
+	monkeypatch.setattr(settings, "result_cache_enabled", False)
+	gh = _GitHubConnector()
+	monkeypatch.setitem(registry._INSTANCES, "duckduckgo", _LinkConnector())
+	monkeypatch.setitem(registry._INSTANCES, "github", gh)
+
+	async def run():
+		await create_job("dag-job", status=JobStatus.queued)
+		await runner._run_job("dag-job", SearchInput(context_text="jane doe engineer"), Budget(max_wall_time_ms=20000))
+
+	asyncio.run(run())
+	dag = get_job_store().get("dag-job").result["metrics"]["diagnostics"]["dag"]
+	assert gh.seen == ["janedoe"]
+	assert dag["ran"] == ["duckduckgo", "github:username"]
+	assert dag["discovered"]["username"] == "janedoe"
+
+
+def test_batch_dedupes_and_streams_ndjson(monkeypatch):
+	monkeypatch.setattr(runner, "_RESULT_CACHE", None)
+	monkeypatch.setattr(settings, "result_cache_enabled", False)
+	monkeypatch.setitem(registry._INSTANCES, "duckduckgo", _FastConnector())
+	extractions = []
+	extract = runner.extract_normalized_query
+
+	async def counting_extract(payload, **kwargs):
+		extractions.append(payload.context_text)
+		return await extract(payload, **kwargs)
+
+	monkeypatch.setattr(runner, "extract_normalized_query", counting_extract)
+	body = "\n".join([
+		json.dumps({"context_text": "ada lovelace analyst"}),
+		json.dumps({"context_text": "grace hopper admiral"}),
+		"{not json",
+		json.dumps({"context_text": "ada lovelace analyst"}),
+	]) + "\n"
+
+	async def run():
+		async with AsyncClient(app=app, base_url="http://test") as ac:
+			r = await ac.post("/search/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+			progress = await ac.get(f"/search/batch/{r.headers['x-batch-id']}")
+		return r, progress.json()
+
+	r, progress = asyncio.run(run())
+	assert r.headers["content-type"].startswith("application/x-ndjson")
+	lines = {line["index"]: line for line in map(json.loads, r.text.splitlines())}
+	assert sorted(lines) == [0, 1, 2, 3]
+	assert "error" in lines[2]
+	assert lines[3]["duplicate_of"] == 0 and lines[3]["job_id"] == lines[0]["job_id"]
+	assert lines[0]["job_id"] != lines[1]["job_id"]
+	assert lines[0]["status"] in ("completed", "needs_disambiguation")
+	assert progress["unique"] == 2 and progress["deduplicated"] == 1 and progress["invalid"] == 1
+	assert progress["done"] is True and progress["emitted"] == 4
+	# Full extraction runs once per job, not once more per input line
+	assert sorted(extractions) == ["ada lovelace analyst", "grace hopper admiral"]
+
+
+def test_batch_reads_the_whole_upload_while_the_client_is_not_reading(monkeypatch):
+	monkeypatch.setattr(runner, "_RESULT_CACHE", None)
+	monkeypatch.setattr(settings, "result_cache_enabled", False)
+	monkeypatch.setattr(settings, "batch_max_in_flight", 1)
+	monkeypatch.setitem(registry._INSTANCES, "duckduckgo", _FastConnector())
+	chunks = [json.dumps({"context_text": f"person number {i}"}).encode() + b"\n" for i in range(8)]
+	sent = []
+
+	async def run():
+		uploaded = asyncio.Event()
+		pending = list(chunks)
+
+		async def receive():
+			if pending:
+				body = pending.pop(0)
+				if not pending:
+					uploaded.set()
+				return {"type": "http.request", "body": body, "more_body": bool(pending)}
+			await asyncio.Event().wait()
+
+		async def send(message):
+			# Like an HTTP/1.1 client that writes its whole body before reading the response
+			await uploaded.wait()
+			sent.append(message)
+
+		scope = {
+			"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "http_version": "1.1",
+			"method": "POST", "scheme": "http", "path": "/search/batch", "raw_path": b"/search/batch",
+			"root_path": "", "query_string": b"", "headers": [(b"content-type", b"application/x-ndjson")],
+			"server": ("test", 80), "client": ("test", 1234),
+		}
+		await asyncio.wait_for(app(scope, receive, send), 10)
+
+	asyncio.run(run())
+	body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+	lines = [json.loads(line) for line in body.splitlines()]
+	assert sorted(line["index"] for line in lines) == list(range(8))
+
+
+def test_ndjson_lines_split_across_chunks(monkeypatch):
+	monkeypatch.setattr(settings, "batch_max_line_bytes", 16)
+	pulled = []
+
+	async def chunks(parts):
+		for part in parts:
+			pulled.append(part)
+			yield part
+
+	async def collect(parts):
+		out = []
+		async for line in batch.ndjson_lines(chunks(parts)):
+			# Each line is handed over before the rest of the body is read
+			out.append((line, len(pulled)))
+		return out
+
+	assert asyncio.run(collect([b'{"a"', b': 1}\n\n{"b": 2}\n{"c"', b": 3}"])) == [
+		('{"a": 1}', 2), ('{"b": 2}', 2), ('{"c": 3}', 3),
+	]
+	try:
+		asyncio.run(collect([b"x" * 10, b"y" * 10]))
+		assert False, "expected the oversized line to be rejected"
+	except ValueError:
+		pass
+
+
+class _CountingConnector:
+	name = "duckduckgo"
+
+	def __init__(self):
+		self.calls = 0
+
+	async def invoke(self, query):
+		self.calls += 1
+		return make_result(candidates=[IdentityCandidate(display_name="Cached Hit", score=0.9)])
+
+
+def test_result_cache_serves_repeats_and_fresh_bypasses(monkeypatch):
+	ddg = _CountingConnector()
+	monkeypatch.setitem(registry._INSTANCES, "duckduckgo", ddg)
+	monkeypatch.setattr(runner, "_RESULT_CACHE", None)
+	payload = SearchInput(context_text="result cache probe")
+
+	async def run():
+		for job_id, fresh in (("rc-1", False), ("rc-2", False), ("rc-3", True)):
+			await create_job(job_id, status=JobStatus.queued)
+			await runner._run_job(job_id, payload, fresh=fresh)
+
+	asyncio.run(run())
+	diags = [get_job_store().get(j).result["metrics"]["diagnostics"]["result_cache"] for j in ("rc-1", "rc-2", "rc-3")]
+	assert [d["status"] for d in diags] == ["miss", "hit", "bypass"]
+	assert ddg.calls == 2
+	hit = get_job_store().get("rc-2")
+	assert hit.status == get_job_store().get("rc-1").status
+	assert hit.result["candidates"][0]["display_name"] == "Cached Hit"
+	assert hit.result["metrics"]["tools_used"] == [] and diags[1]["hits"] == 1
+
+
+class _FailingConnector:
+	name = "duckduckgo"
+
+	def __init__(self):
+		self.calls = 0
+
+	async def invoke(self, query):
+		self.calls += 1
+		if self.calls == 1:
+			raise RuntimeError("boom")
+		report_error("duckduckgo", "1 of 4 queries failed")
+		report_stats("duckduckgo", {"queries": 4, "job": self.calls})
+		return make_result()
+
+
+def test_failed_steps_are_reported_and_not_cached(monkeypatch):
+	ddg = _FailingConnector()
+	monkeypatch.setitem(registry._INSTANCES, "duckduckgo", ddg)
+	monkeypatch.setattr(runner, "_RESULT_CACHE", None)
+	payload = SearchInput(context_text="outage probe")
+
+	async def run():
+		for job_id in ("fail-1", "fail-2", "fail-3"):
+			await create_job(job_id, status=JobStatus.queued)
+			await runner._run_job(job_id, payload)
+
+	asyncio.run(run())
+	# An exception and a reported upstream error both keep the (empty) result out of the cache
+	assert ddg.calls == 3
+	failures = [get_job_store().get(j).result["metrics"]["diagnostics"]["step_failures"] for j in ("fail-1", "fail-2")]
+	assert failures[0] == [{"tool": "duckduckgo", "id": "duckduckgo", "source": "duckduckgo", "error": "boom"}]
+	assert failures[1][0]["error"] == "1 of 4 queries failed"
+	# Per-job connector stats, keyed by DAG node then source
+	assert get_job_store().get("fail-2").result["metrics"]["diagnostics"]["connector_stats"] == {"duckduckgo": {"duckduckgo": {"queries": 4, "job": 2}}}
+	assert get_job_store().get("fail-3").result["metrics"]["diagnostics"]["connector_stats"]["duckduckgo"]["duckduckgo"]["job"] == 3